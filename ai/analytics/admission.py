@@ -0,0 +1,153 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Kolejność obsługi pasów: interaktywne (panel użytkownika) przed tłem (auto_analysis, zadania async)
+PRIORITY_LANES = ('interactive', 'background')
+
+
+class Overloaded(Exception):
+    """Żądanie odrzucone przez bramkę - klient powinien ponowić po retry_after sekundach"""
+
+    def __init__(self, gate, lane, retry_after):
+        super().__init__(f"{gate} is overloaded ({lane} lane)")
+        self.gate = gate
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class ThreadBudget:
+    """
+    Wspólny dla bramek limit wątków procesu roboczego zajętych analizami i oczekiwaniem w kolejkach.
+    Bez wolnego miejsca żądanie jest odrzucane od razu - pozostałe wątki obsługują lekkie endpointy.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._used = 0
+        self._rejected = 0
+
+    def try_acquire(self):
+        with self._lock:
+            if self._used >= self.size:
+                self._rejected += 1
+                return False
+            self._used += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._used -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'size': self.size, 'used': self._used, 'rejected': self._rejected}
+
+
+class AdmissionGate:
+    """
+    Limit równoczesnych analiz jednego endpointu w procesie roboczym z ograniczoną kolejką oczekujących.
+    Wolne miejsce dostaje najpierw pas 'interactive', potem 'background' (w pasie - kolejność przybycia).
+    Pełna kolejka pasa, brak miejsca we wspólnym budżecie wątków (budget) lub oczekiwanie dłuższe
+    niż max_wait - Overloaded z szacowanym Retry-After.
+    """
+
+    def __init__(self, name, limit=2, max_queue=None, max_wait=30, budget=None):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue or {lane: 4 * limit for lane in PRIORITY_LANES}
+        self.max_wait = max_wait
+        self.budget = budget
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._queued = {lane: 0 for lane in PRIORITY_LANES}
+        # Średni czas obsługi (EWMA) - podstawa szacowania Retry-After
+        self._avg_seconds = 1.0
+        self._stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0}
+
+    @contextmanager
+    def admit(self, lane='interactive', bounded=True):
+        """Blok wykonywany po uzyskaniu miejsca; bounded=False - czekanie bez limitu kolejki i czasu (zadania w tle)"""
+        lane = lane if lane in PRIORITY_LANES else 'interactive'
+        # Budżet dotyczy wątków żądań; zadania w tle (bounded=False) działają na własnych wątkach
+        reserved = bounded and self.budget is not None
+        if reserved and not self.budget.try_acquire():
+            with self._condition:
+                self._stats['rejected'] += 1
+                raise Overloaded(self.name, lane, self._retry_after(lane))
+
+        try:
+            self._acquire(lane, bounded)
+            started = time.time()
+            try:
+                yield
+            finally:
+                self._release(time.time() - started)
+        finally:
+            if reserved:
+                self.budget.release()
+
+    def _acquire(self, lane, bounded):
+        with self._condition:
+            if self._active < self.limit and not self._waiting:
+                self._active += 1
+                self._stats['admitted'] += 1
+                return
+
+            if bounded and self._queued[lane] >= self.max_queue[lane]:
+                self._stats['rejected'] += 1
+                raise Overloaded(self.name, lane, self._retry_after(lane))
+
+            ticket = (PRIORITY_LANES.index(lane), next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            self._queued[lane] += 1
+            self._stats['queued'] += 1
+
+            deadline = time.time() + self.max_wait if bounded and self.max_wait else None
+            try:
+                while not (self._active < self.limit and self._waiting[0] == ticket):
+                    timeout = deadline - time.time() if deadline else None
+                    if timeout is not None and timeout <= 0:
+                        self._waiting.remove(ticket)
+                        heapq.heapify(self._waiting)
+                        self._stats['timed_out'] += 1
+                        # Kolejny w kolejce mógł czekać tylko na ten bilet
+                        self._condition.notify_all()
+                        raise Overloaded(self.name, lane, self._retry_after(lane))
+                    self._condition.wait(timeout)
+
+                heapq.heappop(self._waiting)
+                self._active += 1
+                self._stats['admitted'] += 1
+                # Zwolnienie kilku miejsc budzi wszystkich, ale przejść może tylko czoło kolejki -
+                # następny w kolejce musi sprawdzić warunek ponownie, póki są wolne miejsca
+                if self._active < self.limit and self._waiting:
+                    self._condition.notify_all()
+            finally:
+                self._queued[lane] -= 1
+
+    def _release(self, seconds):
+        with self._condition:
+            self._active -= 1
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * seconds
+            self._condition.notify_all()
+
+    def _retry_after(self, lane):
+        """Czas (s) potrzebny na obsłużenie kolejki przed tym pasem i w nim"""
+        rank = PRIORITY_LANES.index(lane)
+        ahead = sum(self._queued[other] for other in PRIORITY_LANES[:rank + 1])
+        return max(1, math.ceil(self._avg_seconds * (ahead + 1) / self.limit))
+
+    def stats(self):
+        with self._condition:
+            return dict(self._stats, name=self.name, limit=self.limit, active=self._active,
+                        waiting=dict(self._queued), avg_seconds=round(self._avg_seconds, 3))
@@ -1,27 +1,174 @@
 import numpy as np
-from scipy import ndimage
+import threading
+from collections import OrderedDict
+from scipy import ndimage, sparse
 from sklearn.cluster import DBSCAN
 import logging
 from .utils import convert_numpy_types, safe_float, safe_int, safe_bool
+from .raster_tiles import open_raster, iter_tiles, finite_values, RunningStats, HistogramQuantiles, ClusterStitcher
 
 
 logger = logging.getLogger(__name__)
 
+# Wagi sąsiedztwa wg odległości Manhattan w gridzie
+# (typowe odległości sprzętu rolniczego): 1 -> 1.0, 2 -> 0.5, 3-4 -> 0.2
+AGRICULTURAL_WEIGHTS = {1: 1.0, 2: 0.5, 3: 0.2, 4: 0.2}
+
+
+def _agricultural_neighbour_offsets():
+    """Przesunięcia (dr, dc) i wagi sąsiadów w zasięgu AGRICULTURAL_WEIGHTS"""
+    max_dist = max(AGRICULTURAL_WEIGHTS)
+    return [
+        (dr, dc, AGRICULTURAL_WEIGHTS[abs(dr) + abs(dc)])
+        for dr in range(-max_dist, max_dist + 1)
+        for dc in range(-max_dist, max_dist + 1)
+        if abs(dr) + abs(dc) in AGRICULTURAL_WEIGHTS
+    ]
+
+
+def _shift_slices(length, shift):
+    """Zakresy (komórki, ich sąsiedzi przesunięci o shift) w jednym wymiarze gridu"""
+    target = slice(max(0, -shift), max(0, length - max(0, shift)))
+    source = slice(max(0, shift), max(0, length + min(0, shift)))
+    return target, source
+
+
+# Cache macierzy wag per kształt gridu, ograniczony rozmiarem w bajtach (LRU)
+WEIGHT_MATRIX_CACHE_BYTES = 32 * 1024 * 1024
+_weight_matrix_cache = OrderedDict()
+_weight_matrix_cache_lock = threading.Lock()
+
+
+def _matrix_nbytes(W):
+    return W.data.nbytes + W.indices.nbytes + W.indptr.nbytes
+
+
+def _agricultural_weight_matrix(rows, cols):
+    """
+    Rzadka (CSR) macierz wag dla gridu rows x cols, normalizowana wierszowo.
+    Budowana raz dla danego kształtu gridu i cache'owana (łącznie najwyżej WEIGHT_MATRIX_CACHE_BYTES).
+    """
+    key = (rows, cols)
+    with _weight_matrix_cache_lock:
+        W = _weight_matrix_cache.get(key)
+        if W is not None:
+            _weight_matrix_cache.move_to_end(key)
+            return W
+
+    W = _build_agricultural_weight_matrix(rows, cols)
+
+    with _weight_matrix_cache_lock:
+        _weight_matrix_cache[key] = W
+        _weight_matrix_cache.move_to_end(key)
+        total = sum(_matrix_nbytes(cached) for cached in _weight_matrix_cache.values())
+        while total > WEIGHT_MATRIX_CACHE_BYTES and len(_weight_matrix_cache) > 1:
+            _, evicted = _weight_matrix_cache.popitem(last=False)
+            total -= _matrix_nbytes(evicted)
+    return W
+
+
+def _build_agricultural_weight_matrix(rows, cols):
+    """Macierz wag CSR (~40 niezerowych elementów na komórkę) normalizowana wierszowo"""
+    n = rows * cols
+    index = np.arange(n).reshape(rows, cols)
+
+    row_idx = []
+    col_idx = []
+    data = []
+
+    for dr, dc, weight in _agricultural_neighbour_offsets():
+        # Komórki, których sąsiad (r + dr, c + dc) mieści się w gridzie
+        row_target, _ = _shift_slices(rows, dr)
+        col_target, _ = _shift_slices(cols, dc)
+        src = index[row_target, col_target].ravel()
+        if src.size == 0:
+            continue
+
+        row_idx.append(src)
+        col_idx.append(src + dr * cols + dc)
+        data.append(np.full(src.size, weight))
+
+    if not data:
+        return sparse.csr_matrix((n, n))
+
+    W = sparse.csr_matrix(
+        (np.concatenate(data), (np.concatenate(row_idx), np.concatenate(col_idx))),
+        shape=(n, n)
+    )
+
+    # Normalizacja wierszowa
+    row_sums = np.asarray(W.sum(axis=1)).ravel()
+    scale = np.divide(1.0, row_sums, out=np.zeros_like(row_sums), where=row_sums != 0)
+    return (sparse.diags(scale) @ W).tocsr()
+
+
+def _agricultural_neighbour_sums(grid):
+    """
+    Ważone sumy sąsiadów (W·z przed normalizacją) i sumy wag wierszy
+    liczone przesunięciami tablic - O(komórki) pamięci, bez macierzy wag.
+    """
+    rows, cols = grid.shape
+    weighted_sum = np.zeros_like(grid, dtype=float)
+    row_sums = np.zeros_like(grid, dtype=float)
+
+    for dr, dc, weight in _agricultural_neighbour_offsets():
+        row_target, row_source = _shift_slices(rows, dr)
+        col_target, col_source = _shift_slices(cols, dc)
+        weighted_sum[row_target, col_target] += weight * grid[row_source, col_source]
+        row_sums[row_target, col_target] += weight
+
+    return weighted_sum, row_sums
+
+
+def _label_cluster_stats(mask, values, origin=(0, 0)):
+    """
+    Etykiety 8-spójnych składowych maski i statystyki każdej etykiety w jednym przebiegu:
+    size, sum_row, sum_col (współrzędne przesunięte o origin) i sum_ndvi, indeksowane etykietą
+    """
+    labels, count = ndimage.label(mask, structure=np.ones((3, 3), dtype=int))
+
+    flat_labels = labels.ravel()
+    row_index, col_index = np.indices(labels.shape)
+    stats = {
+        'size': np.bincount(flat_labels, minlength=count + 1).astype(float),
+        'sum_row': np.bincount(flat_labels, weights=(row_index + origin[0]).ravel(), minlength=count + 1),
+        'sum_col': np.bincount(flat_labels, weights=(col_index + origin[1]).ravel(), minlength=count + 1),
+        'sum_ndvi': np.bincount(flat_labels, weights=values.ravel(), minlength=count + 1)
+    }
+
+    return labels, count, stats
+
+
+def _local_slice(core, region):
+    """Część wspólna zakresu kafelka i regionu rastra, we współrzędnych kafelka"""
+    start = max(core.start, region.start)
+    stop = min(core.stop, region.stop)
+    if stop <= start:
+        return slice(0, 0)
+    return slice(start - core.start, stop - core.start)
+
+
 class AdvancedNDVIAnalyzer:
-    def __init__(self):
-        self.grid_size = 10  # 10x10 grid dla 100 punktów NDVI
+    # Powyżej tej liczby komórek Moran's I liczony jest stencilem zamiast macierzą CSR
+    # (macierz wag ma ~40 niezerowych elementów na komórkę - 10 000 komórek to ~5 MB)
+    MAX_SPARSE_CELLS = 10_000
+
+    # Raport klastrów problemowych (grid i raster kafelkowy): cluster_count wszystkich klastrów,
+    # lista najwyżej tylu największych - malejąco po rozmiarze, remisy po środku
+    MAX_REPORTED_CLUSTERS = 100
 
-    def analyze_advanced_ndvi(self, ndvi_data):
+    def analyze_advanced_ndvi(self, ndvi_data, grid_shape=None):
         """
         Zaawansowana analiza NDVI wykraczająca poza podstawowe statystyki
-        Wykorzystuje 100-punktowy grid do analizy przestrzennej
+        Analiza przestrzenna na gridzie dowolnego rozmiaru (rows x cols z payloadu lub metadanych)
         """
         try:
-            # Konwersja do grid 10x10
             ndvi_values = []
             for data_point in ndvi_data:
                 if 'data' in data_point and 'ndvi_values' in data_point['data']:
-                    ndvi_values.extend(data_point['data']['ndvi_values'])
+                    ndvi_values.append(np.asarray(data_point['data']['ndvi_values'], dtype=float).ravel())
+
+            ndvi_values = np.concatenate(ndvi_values) if ndvi_values else np.empty(0)
 
             if len(ndvi_values) == 0:
                 return self._empty_result()
@@ -29,10 +176,10 @@ class AdvancedNDVIAnalyzer:
             # Podstawowe statystyki
             basic_stats = self._calculate_basic_stats(ndvi_values)
 
-            # Analiza przestrzenna (jeśli mamy dokładnie 100 punktów)
+            # Analiza przestrzenna (jeśli da się ustalić kształt gridu)
             spatial_analysis = {}
-            if len(ndvi_values) >= 100:
-                ndvi_grid = np.array(ndvi_values[:100]).reshape(10, 10)
+            ndvi_grid = self._build_ndvi_grid(ndvi_data, grid_shape)
+            if ndvi_grid is not None:
                 spatial_analysis = self._analyze_spatial_patterns(ndvi_grid)
 
             # Analiza trendów czasowych
@@ -60,19 +207,244 @@ class AdvancedNDVIAnalyzer:
             logger.error(f"Błąd zaawansowanej analizy NDVI: {e}")
             return self._empty_result()
 
+    def _build_ndvi_grid(self, ndvi_data, grid_shape=None):
+        """
+        Grid NDVI z najnowszego pomiaru.
+        Kształt: argument grid_shape, pola rows/cols w data lub metadata,
+        a w ostateczności kwadrat (jeśli liczba punktów jest kwadratem liczby całkowitej)
+        """
+        readings = [d for d in ndvi_data if 'data' in d and 'ndvi_values' in d['data']]
+        if not readings:
+            return None
+
+        latest = max(readings, key=lambda x: x.get('collection_date') or '')
+        values = np.asarray(latest['data']['ndvi_values'], dtype=float).ravel()
+
+        if grid_shape is None:
+            for source in (latest['data'], latest.get('metadata') or {}):
+                if source.get('rows') and source.get('cols'):
+                    grid_shape = (int(source['rows']), int(source['cols']))
+                    break
+
+        if grid_shape is None:
+            side = int(np.sqrt(len(values)))
+            if side < 2 or side * side != len(values):
+                return None
+            grid_shape = (side, side)
+
+        rows, cols = grid_shape
+        if rows < 2 or cols < 2 or rows * cols != len(values):
+            logger.warning(f"Niezgodny kształt gridu NDVI {grid_shape} dla {len(values)} punktów")
+            return None
+
+        return values.reshape(rows, cols)
+
+    def analyze_ndvi_raster(self, path, rows=None, cols=None, dtype='float32', tile_size=1024):
+        """
+        Analiza dużego rastra NDVI kafelkami (tryb out-of-core).
+        Raster czytany jako memory-map spod Config.DATA_PATH, operacje sąsiedztwa
+        liczone na kafelkach z marginesem (halo), statystyki kafelków łączone dokładnie.
+        Pamięć ograniczona rozmiarem kafelka niezależnie od rozmiaru pola.
+        """
+        try:
+            raster = open_raster(path, rows, cols, dtype)
+            shape = raster.shape
+            if min(shape) < 2:
+                raise ValueError(f"Raster too small for spatial analysis: {shape}")
+
+            # Przebieg 1: statystyki, histogram wartości, brzegi i środek pola
+            stats = RunningStats()
+            value_quantiles = HistogramQuantiles(-1.0, 1.0)
+            center = (self._center_slice(shape[0]), self._center_slice(shape[1]))
+            edge_sum = edge_count = center_sum = center_count = 0
+
+            for _, _, core, _, _ in iter_tiles(shape, tile_size):
+                tile = np.asarray(raster[core], dtype=float)
+                stats.update(tile)
+                value_quantiles.add(tile)
+
+                edges = tile[self._tile_border_mask(core, shape)]
+                edges = edges[edges > 0]  # NaN (brak danych) odpada w porównaniu
+                edge_sum += edges.sum()
+                edge_count += edges.size
+
+                center_tile = finite_values(tile[_local_slice(core[0], center[0]), _local_slice(core[1], center[1])])
+                center_sum += center_tile.sum()
+                center_count += center_tile.size
+
+            mean, std = stats.mean, stats.std
+            threshold = mean - std
+            if not stats.count:
+                raise ValueError("Raster has no valid NDVI values")
+            value_quantiles.prepare([25, 50, 75])
+            gradient_quantiles = HistogramQuantiles(0.0, np.sqrt(2) * (stats.max - stats.min))
+
+            # Przebieg 2: Moran's I, gradienty, klastry (margines = zasięg wag sąsiedztwa)
+            numerator = denominator = w_sum = 0.0
+            gradient_stats = RunningStats()
+            stitcher = ClusterStitcher(max_reported=self.MAX_REPORTED_CLUSTERS)
+            problem_count = 0
+
+            for tile_row, tile_col, core, padded, inner in iter_tiles(shape, tile_size, max(AGRICULTURAL_WEIGHTS)):
+                block = np.asarray(raster[padded], dtype=float)
+                tile = block[inner]
+                value_quantiles.collect(tile)
+
+                # Piksele bez danych (NaN) jako średnia - nie wnoszą nic do licznika ani mianownika
+                valid = np.isfinite(tile)
+                z_block = np.where(np.isfinite(block), block - mean, 0.0)
+                weighted_sum, row_sums = _agricultural_neighbour_sums(z_block)
+                weighted_sum, row_sums, z = weighted_sum[inner], row_sums[inner], z_block[inner]
+                has_neighbours = (row_sums > 0) & valid
+                numerator += np.sum(z * np.divide(weighted_sum, row_sums, out=np.zeros_like(z), where=has_neighbours))
+                denominator += np.sum(z * z)
+                w_sum += np.count_nonzero(has_neighbours)
+
+                gradient = self._gradient_magnitude(block)[inner]
+                gradient_stats.update(gradient)
+                gradient_quantiles.add(gradient)
+
+                low_ndvi_mask = tile < threshold
+                problem_count += int(np.count_nonzero(low_ndvi_mask))
+                self._add_tile_clusters(stitcher, tile_row, tile_col, core, tile, low_ndvi_mask)
+
+            # Kolejne przebiegi tylko, gdy okno kwantyla było zbyt liczne i nie rozstrzygnęło się drobniejszym histogramem
+            self._resolve_quantiles(value_quantiles, lambda: (raster[core] for _, _, core, _, _ in iter_tiles(shape, tile_size)))
+            q25, median, q75 = value_quantiles.quantiles()
+            iqr = q75 - q25
+            lower_bound, upper_bound = q25 - 1.5 * iqr, q75 + 1.5 * iqr
+            gradient_quantiles.prepare([90])
+
+            # Przebieg 3: percentyl gradientu i outliery IQR
+            anomaly_count = 0
+            for _, _, _, padded, inner in iter_tiles(shape, tile_size, 1):
+                block = np.asarray(raster[padded], dtype=float)
+                gradient_quantiles.collect(self._gradient_magnitude(block)[inner])
+                tile = block[inner]
+                anomaly_count += int(np.count_nonzero((tile < lower_bound) | (tile > upper_bound)))
+
+            self._resolve_quantiles(gradient_quantiles, lambda: (
+                self._gradient_magnitude(np.asarray(raster[padded], dtype=float))[inner]
+                for _, _, _, padded, inner in iter_tiles(shape, tile_size, 1)
+            ))
+            gradient_p90 = gradient_quantiles.quantiles()[0]
+            cluster_count, clusters = stitcher.finish()
+
+            basic_stats = {
+                'mean': float(mean),
+                'std': float(std),
+                'min': float(stats.min),
+                'max': float(stats.max),
+                'median': median,
+                'q25': q25,
+                'q75': q75,
+                'coefficient_of_variation': float(std / mean) if mean > 0 else 0
+            }
+
+            spatial_analysis = {
+                'spatial_autocorrelation': self._moran_result(stats.count, numerator, denominator, w_sum),
+                'edge_effects': self._edge_effects_result(
+                    edge_sum / edge_count if edge_count else 0.0,
+                    center_sum / center_count if center_count else 0.0
+                ),
+                'problem_clusters': {
+                    'cluster_count': cluster_count,
+                    'clusters': [
+                        {
+                            'cluster_id': i,
+                            'size': cluster['size'],
+                            'center': [safe_float(c) for c in cluster['center']],
+                            'severity': self._cluster_severity(cluster['mean_ndvi'])
+                        }
+                        for i, cluster in enumerate(clusters)
+                    ],
+                    'total_problem_area': safe_float(problem_count / stats.count)
+                },
+                'gradient_analysis': {
+                    'mean_gradient': float(gradient_stats.mean),
+                    'max_gradient': float(gradient_stats.max),
+                    'gradient_std': float(gradient_stats.std),
+                    'high_gradient_areas': gradient_quantiles.count_above(gradient_p90)
+                },
+                'spatial_homogeneity': self._homogeneity_result(std / mean if mean > 0 else 0)
+            }
+
+            anomaly_analysis = self._anomaly_result(anomaly_count, stats.count, lower_bound, upper_bound)
+
+            result = {
+                'basic_stats': basic_stats,
+                'spatial_analysis': spatial_analysis,
+                'temporal_analysis': {'trend': 'insufficient_data', 'trend_strength': 0.0},
+                'anomaly_analysis': anomaly_analysis,
+                'health_classification': self._classify_vegetation_health(basic_stats, spatial_analysis),
+                'recommendations': self._generate_ndvi_recommendations(
+                    basic_stats, spatial_analysis, anomaly_analysis
+                ),
+                'raster': {
+                    'rows': shape[0],
+                    'cols': shape[1],
+                    'tile_size': tile_size
+                }
+            }
+
+            return convert_numpy_types(result)
+
+        except (ValueError, FileNotFoundError):
+            # Błędy żądania (ścieżka, kształt, dane) - obsługuje endpoint (400/404)
+            raise
+        except Exception as e:
+            logger.error(f"Błąd analizy rastra NDVI: {e}")
+            return self._empty_result()
+
+    @staticmethod
+    def _resolve_quantiles(quantiles, tile_values):
+        """Dodatkowe przebiegi collect po kafelkach (tile_values() - wartości kolejnych kafelków), aż kwantyle są znane"""
+        while not quantiles.resolve():
+            for values in tile_values():
+                quantiles.collect(values)
+
+    @staticmethod
+    def _tile_border_mask(core, shape):
+        """Maska komórek kafelka leżących na obwodzie całego rastra"""
+        rows, cols = core
+        mask = np.zeros((rows.stop - rows.start, cols.stop - cols.start), dtype=bool)
+        if rows.start == 0:
+            mask[0, :] = True
+        if rows.stop == shape[0]:
+            mask[-1, :] = True
+        if cols.start == 0:
+            mask[:, 0] = True
+        if cols.stop == shape[1]:
+            mask[:, -1] = True
+        return mask
+
+    def _add_tile_clusters(self, stitcher, tile_row, tile_col, core, tile, low_ndvi_mask):
+        """Etykietowanie 8-spójnych klastrów kafelka i przekazanie ich statystyk do zszycia"""
+        labels, count, stats = _label_cluster_stats(low_ndvi_mask, tile, origin=(core[0].start, core[1].start))
+
+        touches_border = np.zeros(count + 1, dtype=bool)
+        touches_border[np.concatenate([labels[0, :], labels[-1, :], labels[:, 0], labels[:, -1]])] = True
+        touches_border[0] = False
+
+        stitcher.add_tile(tile_row, tile_col, labels, count, stats, touches_border)
+
     def _calculate_basic_stats(self, ndvi_values):
         """Obliczanie podstawowych statystyk NDVI"""
-        ndvi_array = np.array(ndvi_values)
+        ndvi_array = np.asarray(ndvi_values, dtype=float)
+
+        mean = np.mean(ndvi_array)
+        std = np.std(ndvi_array)
+        q25, median, q75 = np.percentile(ndvi_array, [25, 50, 75])
 
         return {
-            'mean': float(np.mean(ndvi_array)),
-            'std': float(np.std(ndvi_array)),
+            'mean': float(mean),
+            'std': float(std),
             'min': float(np.min(ndvi_array)),
             'max': float(np.max(ndvi_array)),
-            'median': float(np.median(ndvi_array)),
-            'q25': float(np.percentile(ndvi_array, 25)),
-            'q75': float(np.percentile(ndvi_array, 75)),
-            'coefficient_of_variation': float(np.std(ndvi_array) / np.mean(ndvi_array)) if np.mean(ndvi_array) > 0 else 0
+            'median': float(median),
+            'q25': float(q25),
+            'q75': float(q75),
+            'coefficient_of_variation': float(std / mean) if mean > 0 else 0
         }
 
     def _analyze_spatial_patterns(self, ndvi_grid):
@@ -106,92 +478,75 @@ class AdvancedNDVIAnalyzer:
             if n < 10:
                 return {'moran_i': 0.0, 'interpretation': 'insufficient_data'}
 
-            # Tworzenie macierzy wag dla grid 10x10
-            W = self._create_agricultural_weight_matrix()
-
-            # Obliczanie Moran's I
-            mean_ndvi = np.mean(flat_values)
-            numerator = 0
-            denominator = 0
-
-            for i in range(n):
-                for j in range(n):
-                    if i != j:
-                        numerator += W[i,j] * (flat_values[i] - mean_ndvi) * (flat_values[j] - mean_ndvi)
-                denominator += (flat_values[i] - mean_ndvi) ** 2
-
-            W_sum = np.sum(W)
-            moran_i = (n / W_sum) * (numerator / denominator) if denominator > 0 else 0
+            z = flat_values - np.mean(flat_values)
+            denominator = z @ z
 
-            # Interpretacja dla rolnictwa
-            if moran_i > 0.3:
-                interpretation = 'high_clustering'  # Czynniki systemowe
-            elif moran_i < -0.1:
-                interpretation = 'high_dispersion'  # Problemy losowe
+            if n <= self.MAX_SPARSE_CELLS:
+                # Rzadka macierz wag dla kształtu gridu (cache)
+                W = self._create_agricultural_weight_matrix(ndvi_grid.shape)
+                numerator = z @ (W @ z)
+                W_sum = W.sum()
             else:
-                interpretation = 'moderate_pattern'  # Czynniki mieszane
+                # Duże gridy - te same wagi liczone przesunięciami tablic, bez macierzy n x n
+                weighted_sum, row_sums = _agricultural_neighbour_sums(z.reshape(ndvi_grid.shape))
+                has_neighbours = row_sums > 0
+                numerator = z @ np.divide(weighted_sum, row_sums, out=np.zeros_like(weighted_sum),
+                                          where=has_neighbours).ravel()
+                W_sum = np.count_nonzero(has_neighbours)
 
-            return {
-                'moran_i': float(moran_i),
-                'interpretation': interpretation,
-                'confidence': 'high' if n >= 50 else 'medium'
-            }
+            return self._moran_result(n, numerator, denominator, W_sum)
 
         except Exception as e:
             logger.error(f"Błąd obliczania autokorelacji: {e}")
             return {'moran_i': 0.0, 'interpretation': 'error'}
 
-    def _create_agricultural_weight_matrix(self):
+    def _moran_result(self, n, numerator, denominator, W_sum):
+        """Moran's I = (n / W_sum) * (z·Wz / z·z) z interpretacją rolniczą"""
+        moran_i = (n / W_sum) * (numerator / denominator) if denominator > 0 and W_sum > 0 else 0
+
+        # Interpretacja dla rolnictwa
+        if moran_i > 0.3:
+            interpretation = 'high_clustering'  # Czynniki systemowe
+        elif moran_i < -0.1:
+            interpretation = 'high_dispersion'  # Problemy losowe
+        else:
+            interpretation = 'moderate_pattern'  # Czynniki mieszane
+
+        return {
+            'moran_i': float(moran_i),
+            'interpretation': interpretation,
+            'confidence': 'high' if n >= 50 else 'medium'
+        }
+
+    def _create_agricultural_weight_matrix(self, shape):
         """
         Macierz wag dostosowana do wzorców rolniczych
         Uwzględnia typowe odległości sprzętu rolniczego
         """
-        n = 100  # 10x10 grid
-        W = np.zeros((n, n))
-
-        for i in range(10):
-            for j in range(10):
-                idx1 = i * 10 + j
-
-                for ii in range(10):
-                    for jj in range(10):
-                        idx2 = ii * 10 + jj
-
-                        if idx1 != idx2:
-                            # Odległość Manhattan w gridzie
-                            dist = abs(i - ii) + abs(j - jj)
-
-                            # Wagi specyficzne dla rolnictwa
-                            if dist == 1:  # Sąsiedzi bezpośredni
-                                W[idx1, idx2] = 1.0
-                            elif dist == 2:  # Sąsiedzi drugiego rzędu
-                                W[idx1, idx2] = 0.5
-                            elif dist <= 4:  # Odległe punkty w zasięgu sprzętu
-                                W[idx1, idx2] = 0.2
-                            else:
-                                W[idx1, idx2] = 0.0
-
-        # Normalizacja wierszowa
-        row_sums = W.sum(axis=1)
-        W = np.divide(W, row_sums[:, np.newaxis], out=np.zeros_like(W), where=row_sums[:, np.newaxis]!=0)
-
-        return W
+        return _agricultural_weight_matrix(*shape)
 
     def _analyze_edge_effects(self, ndvi_grid):
         """Analiza efektów brzegowych w polu"""
-        # Wyodrębnienie brzegów
-        edges = np.zeros_like(ndvi_grid)
-        edges[0, :] = ndvi_grid[0, :]  # górny brzeg
-        edges[-1, :] = ndvi_grid[-1, :] # dolny brzeg
-        edges[:, 0] = ndvi_grid[:, 0]  # lewy brzeg
-        edges[:, -1] = ndvi_grid[:, -1] # prawy brzeg
+        rows, cols = ndvi_grid.shape
+
+        # Wyodrębnienie brzegów (każda komórka obwodu raz)
+        edges = np.concatenate([
+            ndvi_grid[0, :],        # górny brzeg
+            ndvi_grid[-1, :],       # dolny brzeg
+            ndvi_grid[1:-1, 0],     # lewy brzeg
+            ndvi_grid[1:-1, -1]     # prawy brzeg
+        ])
 
-        # Środek pola
-        center = ndvi_grid[2:8, 2:8]
+        # Środek pola (wewnętrzne 60% w każdym wymiarze)
+        center = ndvi_grid[self._center_slice(rows), self._center_slice(cols)]
 
-        edge_mean = np.mean(edges[edges > 0])
+        edge_mean = np.mean(edges[edges > 0]) if np.any(edges > 0) else 0.0
         center_mean = np.mean(center)
 
+        return self._edge_effects_result(edge_mean, center_mean)
+
+    def _edge_effects_result(self, edge_mean, center_mean):
+        """Porównanie średniego NDVI brzegów i środka pola"""
         edge_effect_ratio = edge_mean / center_mean if center_mean > 0 else 1.0
 
         return {
@@ -201,54 +556,105 @@ class AdvancedNDVIAnalyzer:
             'has_edge_effects': safe_bool(edge_effect_ratio < 0.9)  # ZMIENIONE
         }
 
-    def _detect_problem_clusters(self, ndvi_grid):
-        """Wykrywanie klastrów problemowych używając DBSCAN"""
+    @staticmethod
+    def _center_slice(length):
+        """Zakres środka pola w jednym wymiarze (20%-80%, dla 10 komórek: 2:8)"""
+        margin = int(round(length * 0.2))
+        if length - 2 * margin < 1:
+            return slice(0, length)
+        return slice(margin, length - margin)
+
+    def _detect_problem_clusters(self, ndvi_grid, method='label'):
+        """
+        Wykrywanie klastrów problemowych.
+        method='label' - spójne składowe gridu (8-sąsiedztwo), method='dbscan' - DBSCAN na współrzędnych
+        """
         try:
             # Znajdowanie punktów o niskim NDVI
             threshold = np.mean(ndvi_grid) - np.std(ndvi_grid)
             low_ndvi_mask = ndvi_grid < threshold
+            problem_count = int(np.count_nonzero(low_ndvi_mask))
 
-            # Współrzędne punktów problemowych
-            problem_coords = np.column_stack(np.where(low_ndvi_mask))
-
-            if len(problem_coords) < 2:
+            if problem_count < 2:
                 return {
                     'cluster_count': 0,
                     'clusters': [],
                     'total_problem_area': 0.0
                 }
 
-            # Clustering DBSCAN
-            clustering = DBSCAN(eps=1.5, min_samples=2).fit(problem_coords)
-
-            clusters = []
-            for cluster_id in set(clustering.labels_):
-                if cluster_id != -1:  # Pomijamy szum (-1)
-                    cluster_points = problem_coords[clustering.labels_ == cluster_id]
+            if method == 'dbscan':
+                clusters = self._dbscan_clusters(low_ndvi_mask, ndvi_grid)
+            else:
+                clusters = self._label_clusters(low_ndvi_mask, ndvi_grid)
 
-                    clusters.append({
-                        'cluster_id': safe_int(cluster_id),
-                        'size': safe_int(len(cluster_points)),
-                        'center': [safe_float(np.mean(cluster_points[:, 0])),
-                                 safe_float(np.mean(cluster_points[:, 1]))],
-                        'severity': self._assess_cluster_severity(cluster_points, ndvi_grid)
-                    })
+            reported = sorted(clusters, key=lambda cluster: (-cluster['size'], cluster['center']))[:self.MAX_REPORTED_CLUSTERS]
+            for i, cluster in enumerate(reported):
+                cluster['cluster_id'] = i
 
             return {
                 'cluster_count': safe_int(len(clusters)),
-                'clusters': clusters,
-                'total_problem_area': safe_float(len(problem_coords) / 100.0)
+                'clusters': reported,
+                'total_problem_area': safe_float(problem_count / ndvi_grid.size)
             }
 
         except Exception as e:
             logger.error(f"Błąd wykrywania klastrów: {e}")
             return {'cluster_count': 0, 'clusters': [], 'total_problem_area': 0.0}
 
+    def _label_clusters(self, low_ndvi_mask, ndvi_grid):
+        """
+        Klastry jako 8-spójne składowe maski - dla punktów na regularnym gridzie
+        odpowiada to DBSCAN(eps=1.5, min_samples=2), bez wyszukiwania sąsiadów
+        """
+        labels, count, stats = _label_cluster_stats(low_ndvi_mask, ndvi_grid)
+
+        # Pojedyncze punkty to szum (jak etykieta -1 w DBSCAN)
+        cluster_labels = np.flatnonzero(stats['size'][1:] >= 2) + 1
+        sizes = stats['size'][cluster_labels]
+        centers_row = stats['sum_row'][cluster_labels] / sizes
+        centers_col = stats['sum_col'][cluster_labels] / sizes
+        mean_ndvi = stats['sum_ndvi'][cluster_labels] / sizes
+
+        return [
+            {
+                'cluster_id': cluster_id,
+                'size': safe_int(sizes[cluster_id]),
+                'center': [safe_float(centers_row[cluster_id]), safe_float(centers_col[cluster_id])],
+                'severity': self._cluster_severity(mean_ndvi[cluster_id])
+            }
+            for cluster_id in range(len(cluster_labels))
+        ]
+
+    def _dbscan_clusters(self, low_ndvi_mask, ndvi_grid):
+        """Klastry DBSCAN - dla nieregularnych chmur punktów"""
+        # Współrzędne punktów problemowych
+        problem_coords = np.column_stack(np.where(low_ndvi_mask))
+
+        # Clustering DBSCAN
+        clustering = DBSCAN(eps=1.5, min_samples=2).fit(problem_coords)
+
+        clusters = []
+        for cluster_id in set(clustering.labels_):
+            if cluster_id != -1:  # Pomijamy szum (-1)
+                cluster_points = problem_coords[clustering.labels_ == cluster_id]
+
+                clusters.append({
+                    'cluster_id': safe_int(cluster_id),
+                    'size': safe_int(len(cluster_points)),
+                    'center': [safe_float(np.mean(cluster_points[:, 0])),
+                             safe_float(np.mean(cluster_points[:, 1]))],
+                    'severity': self._assess_cluster_severity(cluster_points, ndvi_grid)
+                })
+
+        return clusters
+
     def _assess_cluster_severity(self, cluster_points, ndvi_grid):
         """Ocena dotkliwości klastra problemowego"""
-        cluster_ndvi_values = [ndvi_grid[int(point[0]), int(point[1])] for point in cluster_points]
-        mean_cluster_ndvi = np.mean(cluster_ndvi_values)
+        mean_cluster_ndvi = np.mean(ndvi_grid[cluster_points[:, 0], cluster_points[:, 1]])
+        return self._cluster_severity(mean_cluster_ndvi)
 
+    def _cluster_severity(self, mean_cluster_ndvi):
+        """Dotkliwość klastra na podstawie jego średniego NDVI"""
         if mean_cluster_ndvi < 0.3:
             return 'critical'
         elif mean_cluster_ndvi < 0.5:
@@ -260,12 +666,7 @@ class AdvancedNDVIAnalyzer:
 
     def _analyze_spatial_gradients(self, ndvi_grid):
         """Analiza gradientów przestrzennych"""
-        # Gradient w kierunku X i Y
-        grad_x = np.gradient(ndvi_grid, axis=1)
-        grad_y = np.gradient(ndvi_grid, axis=0)
-
-        # Magnitude gradientu
-        grad_magnitude = np.sqrt(grad_x**2 + grad_y**2)
+        grad_magnitude = self._gradient_magnitude(ndvi_grid)
 
         return {
             'mean_gradient': float(np.mean(grad_magnitude)),
@@ -274,11 +675,23 @@ class AdvancedNDVIAnalyzer:
             'high_gradient_areas': int(np.sum(grad_magnitude > np.percentile(grad_magnitude, 90)))
         }
 
+    @staticmethod
+    def _gradient_magnitude(ndvi_grid):
+        """Magnitude gradientu z gradientów w kierunku X i Y"""
+        grad_x = np.gradient(ndvi_grid, axis=1)
+        grad_y = np.gradient(ndvi_grid, axis=0)
+        return np.hypot(grad_x, grad_y)
+
     def _calculate_spatial_homogeneity(self, ndvi_grid):
         """Obliczanie jednorodności przestrzennej"""
         # Coefficient of variation jako miara homogeniczności
-        cv = np.std(ndvi_grid) / np.mean(ndvi_grid) if np.mean(ndvi_grid) > 0 else 0
+        mean = np.mean(ndvi_grid)
+        cv = np.std(ndvi_grid) / mean if mean > 0 else 0
+
+        return self._homogeneity_result(cv)
 
+    def _homogeneity_result(self, cv):
+        """Interpretacja współczynnika zmienności jako jednorodności"""
         # Interpretacja
         if cv < 0.1:
             homogeneity = 'very_high'
@@ -356,8 +769,12 @@ class AdvancedNDVIAnalyzer:
         upper_bound = q3 + 1.5 * iqr
 
         anomalies = (ndvi_array < lower_bound) | (ndvi_array > upper_bound)
-        anomaly_count = int(np.sum(anomalies))
-        anomaly_percentage = (anomaly_count / len(ndvi_values)) * 100
+
+        return self._anomaly_result(int(np.sum(anomalies)), len(ndvi_values), lower_bound, upper_bound)
+
+    def _anomaly_result(self, anomaly_count, total_count, lower_bound, upper_bound):
+        """Podsumowanie outlierów IQR"""
+        anomaly_percentage = (anomaly_count / total_count) * 100
 
         # Ocena dotkliwości anomalii
         if anomaly_percentage > 20:
@@ -1,80 +1,351 @@
 import numpy as np
 from sklearn.ensemble import IsolationForest
-import pandas as pd
+from collections import OrderedDict
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import joblib
+import os
+import threading
+import uuid
+import logging
 
+from preprocessing.field_data import decode_field_data
 
-def detect_anomalies(field_data, sensitivity='medium'):
-    if not field_data or len(field_data) < 10:
+logger = logging.getLogger(__name__)
+
+# Cechy analizowane pod kątem anomalii: (nazwa cechy, data_type, klucz listy wartości)
+ANOMALY_FEATURES = [
+    ('ndvi', 'ndvi', 'ndvi_values'),
+    ('moisture', 'soil_moisture', 'moisture_values')
+]
+
+# Odsetek anomalii zależnie od czułości
+CONTAMINATION = {
+    'low': 0.1,
+    'medium': 0.05,
+    'high': 0.01
+}
+
+
+class AnomalyModelStore:
+    """
+    Modele IsolationForest trzymane per (field_id, feature) między żądaniami.
+    Model jest trenowany raz; nowe odczyty od razu trafiają do historii i statystyk,
+    a las jest przetrenowywany gdy od ostatniego treningu dojdzie refit_ratio nowych odczytów
+    (względem rozmiaru zbioru treningowego). W czasie żądania odczyty są tylko oceniane.
+    Średnia i odchylenie dotyczą okna historii (najwyżej max_history odczytów najnowszych wg daty).
+    Blokada per wpis - trening modelu jednego pola nie wstrzymuje oceny innych pól.
+
+    Z `path` wpisy zapisywane są pod <path>/<klucz>.state.joblib (historia, statystyki) i .model.joblib (las),
+    pod blokadą plikową wpisu - każdy proces roboczy widzi ten sam model i historię pola,
+    a wpis zmieniony przez inny proces jest wczytywany ponownie. Na dysku najwyżej max_entries wpisów.
+    """
+
+    STATE_KEYS = ('history', 'order', 'count', 'mean', 'm2', 'fitted_size', 'added_since_fit', 'train_scores', 'model_id')
+    PRUNE_EVERY = 100
+
+    def __init__(self, refit_ratio=0.2, max_history=5000, max_entries=2000, path=None):
+        self.refit_ratio = refit_ratio
+        self.max_history = max_history
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._saves = 0
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def configure(self, path):
+        """Włącz wspólny magazyn wpisów w katalogu path (serwis z wieloma procesami roboczymi)"""
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _entry(self, field_id, feature):
+        with self._lock:
+            entry = self._entries.get((field_id, feature))
+            if entry is None:
+                key = hashlib.sha1(f"{field_id!r}:{feature}".encode()).hexdigest()
+                entry = {'key': key, 'lock': threading.Lock(), 'model': None, 'model_id': None,
+                         'history': {}, 'order': {}, 'scores': {}, 'fitted_size': 0, 'added_since_fit': 0,
+                         'count': 0, 'mean': 0.0, 'm2': 0.0, 'signature': None}
+                self._entries[(field_id, feature)] = entry
+            self._entries.move_to_end((field_id, feature))
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    def score(self, field_id, feature, keys, values, contamination, dates=None):
+        """
+        Oceń odczyty; zwraca (maska anomalii, średnia historii, odchylenie historii).
+        dates - daty odczytów (collection_date): okno historii to max_history najnowszych odczytów
+        wg (data, klucz); odczyty starsze niż pełne okno są tylko oceniane, bez dołączania.
+        """
+        entry = self._entry(field_id, feature)
+        dates = dates if dates is not None else [None] * len(keys)
+
+        with entry['lock'], self._file_lock(entry):
+            self._sync(entry)
+
+            # Dołącz tylko nowe odczyty (inkrementalna średnia/wariancja - Welford)
+            history, order = entry['history'], entry['order']
+            oldest = min(order.values()) if len(history) >= self.max_history else None
+            added = 0
+            for key, value, date in zip(keys, values, dates):
+                position = (date or '', str(key))
+                if key in history or (oldest is not None and position < oldest):
+                    continue
+                history[key] = value
+                order[key] = position
+                added += 1
+                entry['count'] += 1
+                delta = value - entry['mean']
+                entry['mean'] += delta / entry['count']
+                entry['m2'] += delta * (value - entry['mean'])
+            entry['added_since_fit'] += added
+
+            # Okno wg dat - najstarsze odczyty usuwane także ze statystyk (odwrotny krok Welforda)
+            if len(history) > self.max_history:
+                for evicted in sorted(history, key=order.get)[:len(history) - self.max_history]:
+                    value = history.pop(evicted)
+                    del order[evicted]
+                    entry['scores'].pop(evicted, None)
+                    entry['count'] -= 1
+                    delta = value - entry['mean']
+                    entry['mean'] -= delta / entry['count']
+                    entry['m2'] = max(0.0, entry['m2'] - delta * (value - entry['mean']))
+
+            refit = entry['model'] is None or entry['added_since_fit'] > self.refit_ratio * entry['fitted_size']
+            if refit:
+                self._fit(entry)
+            if added or refit:
+                self._save(entry, refit)
+
+            # Oceniane są tylko odczyty bez zapamiętanego wyniku; wyniki spoza okna nie są zapamiętywane
+            scores = entry['scores']
+            request_values = dict(zip(keys, values))
+            missing = [key for key in request_values if key not in scores]
+            if missing:
+                X = np.fromiter((request_values[key] for key in missing), dtype=float, count=len(missing))
+                missing_scores = dict(zip(missing, entry['model'].score_samples(X.reshape(-1, 1))))
+                scores.update((key, score) for key, score in missing_scores.items() if key in history)
+            else:
+                missing_scores = {}
+
+            threshold = np.percentile(entry['train_scores'], 100 * contamination)
+            is_anomaly = np.fromiter((scores[key] if key in scores else missing_scores[key] for key in keys),
+                                     dtype=float, count=len(keys)) < threshold
+            mean_value = entry['mean']
+            std_value = np.sqrt(entry['m2'] / (entry['count'] - 1)) if entry['count'] > 1 else 0.0
+
+        return is_anomaly, mean_value, std_value
+
+    def _fit(self, entry):
+        keys = list(entry['history'])
+        X = np.fromiter(entry['history'].values(), dtype=float, count=len(keys)).reshape(-1, 1)
+        model = IsolationForest(random_state=42).fit(X)
+
+        # Próg dla dowolnej czułości wyznaczany z wyników próbek treningowych
+        # (jak offset_ IsolationForest dla danego contamination)
+        entry['model'] = model
+        entry['model_id'] = uuid.uuid4().hex
+        entry['train_scores'] = model.score_samples(X)
+        entry['scores'] = dict(zip(keys, entry['train_scores']))
+        entry['fitted_size'] = len(keys)
+        entry['added_since_fit'] = 0
+        logger.debug(f"IsolationForest fitted on {entry['fitted_size']} readings")
+
+    def _files(self, entry):
+        base = os.path.join(self.path, entry['key'])
+        return f"{base}.state.joblib", f"{base}.model.joblib", f"{base}.lock"
+
+    @contextmanager
+    def _file_lock(self, entry):
+        """Blokada wpisu między procesami (bez `path` - tylko blokada wątków wpisu)"""
+        if not self.path:
+            yield
+            return
+        lock_path = self._files(entry)[2]
+        while True:
+            lock_file = open(lock_path, 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Plik blokady mógł zostać usunięty przez _prune w trakcie oczekiwania - wtedy od nowa
+            try:
+                if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+        try:
+            yield
+        finally:
+            lock_file.close()
+
+    def _sync(self, entry):
+        """Wczytaj wpis zapisany przez inny proces (zmiana pliku stanu od ostatniego odczytu/zapisu)"""
+        if not self.path:
+            return
+        state_path, model_path, _ = self._files(entry)
+        try:
+            stat = os.stat(state_path)
+            if (stat.st_ino, stat.st_mtime_ns) == entry['signature']:
+                return
+
+            state = joblib.load(state_path)
+            if state['model_id'] != entry['model_id']:
+                entry['model'] = joblib.load(model_path)
+                entry['scores'] = {}
+            entry.update(state)
+            entry['scores'] = {key: score for key, score in entry['scores'].items() if key in entry['history']}
+            entry['signature'] = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Anomaly model entry {entry['key']} could not be loaded: {e}")
+
+    def _save(self, entry, model_changed):
+        """Atomowy zapis wpisu (las tylko po ponownym treningu)"""
+        if not self.path:
+            return
+        state_path, model_path, _ = self._files(entry)
+        try:
+            if model_changed:
+                self._dump(entry['model'], model_path)
+            self._dump({key: entry[key] for key in self.STATE_KEYS}, state_path)
+            stat = os.stat(state_path)
+            entry['signature'] = (stat.st_ino, stat.st_mtime_ns)
+        except OSError as e:
+            logger.warning(f"Anomaly model entry {entry['key']} write failed: {e}")
+            return
+
+        with self._lock:
+            self._saves += 1
+            prune = self._saves % self.PRUNE_EVERY == 0
+        if prune:
+            self._prune()
+
+    @staticmethod
+    def _dump(obj, path):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            joblib.dump(obj, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _prune(self):
+        """Usuń najdawniej zmieniane wpisy ponad max_entries (wraz z plikiem blokady; wpisy w użyciu pomijane)"""
+        states = []
+        for name in os.listdir(self.path):
+            if name.endswith('.state.joblib'):
+                try:
+                    states.append((os.path.getmtime(os.path.join(self.path, name)), name[:-len('.state.joblib')]))
+                except OSError:
+                    pass
+
+        for _, key in sorted(states)[:max(0, len(states) - self.max_entries)]:
+            base = os.path.join(self.path, key)
+            with open(f"{base}.lock", 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                for suffix in ('.state.joblib', '.model.joblib', '.lock'):
+                    try:
+                        os.remove(base + suffix)
+                    except OSError:
+                        pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+anomaly_model_store = AnomalyModelStore()
+
+
+def reading_value(item):
+    """Cecha i średnia wartość pojedynczego odczytu (ndvi/moisture) lub None"""
+    data_type = item.get('data_type')
+    # Pole data jako dict lub JSON w stringu - ten sam dekoder co dla całego field_data
+    data = decode_field_data([item]).series(data_type).latest()
+
+    if data_type == 'ndvi' and 'ndvi_values' in data:
+        feature, values = 'ndvi', data['ndvi_values']
+    elif data_type == 'soil_moisture' and 'moisture_values' in data:
+        feature, values = 'moisture', data['moisture_values']
+    else:
+        return None
+
+    if not values:
+        return None
+
+    return feature, float(np.mean(values))
+
+
+def detect_anomalies(field_data, sensitivity='medium', field_id=None):
+    """Anomalie NDVI i wilgotności; field_data jako lista odczytów lub FieldData"""
+    field_data = decode_field_data(field_data)
+    if len(field_data) < 10:
         return []
 
     # Set threshold based on sensitivity
-    contamination = 0.05  # Default medium
-    if sensitivity == 'low':
-        contamination = 0.1
-    elif sensitivity == 'high':
-        contamination = 0.01
-
-    # Prepare data for analysis
-    df = pd.DataFrame()
-    rows = []
-
-    for item in field_data:
-        data_type = item.get('data_type')
-        data = item.get('data', {})
-
-        # Data już jest dict z Laravel - NIE dekoduj JSON!
-        # Usuń: if isinstance(data, str): try: data = json.loads(data)
-
-        row = {
-            'date': item.get('collection_date'),
-            'data_type': data_type
-        }
+    contamination = CONTAMINATION.get(sensitivity, 0.05)
 
-        if data_type == 'ndvi' and 'ndvi_values' in data:
-            row['value'] = np.mean(data['ndvi_values'])
-            row['feature'] = 'ndvi'
-            rows.append(row)
-        elif data_type == 'soil_moisture' and 'moisture_values' in data:
-            row['value'] = np.mean(data['moisture_values'])
-            row['feature'] = 'moisture'
-            rows.append(row)
+    # Prepare data for analysis - średnie odczytów ze zdekodowanych serii
+    series = {}
 
-    if not rows:
-        return []
+    for feature, data_type, key in ANOMALY_FEATURES:
+        readings = field_data.series(data_type)
+        if not readings:
+            continue
+
+        means = readings.means(key)
+        valid = np.flatnonzero(~np.isnan(means))
+        if not valid.size:
+            continue
 
-    df = pd.DataFrame(rows)
+        dates = readings.dates
+        series[feature] = {
+            'dates': [dates[i] for i in valid],
+            'values': means[valid].tolist(),
+            'keys': [readings.items[i].get('id', (dates[i], float(means[i]))) for i in valid]
+        }
 
     # Detect anomalies for each feature separately
     anomalies = []
 
-    for feature in df['feature'].unique():
-        feature_df = df[df['feature'] == feature].copy()
-
-        if len(feature_df) < 5:  # Need enough data points
+    for feature, rows in series.items():
+        if len(rows['values']) < 5:  # Need enough data points
             continue
 
-        # Use only numerical values for anomaly detection
-        X = feature_df[['value']].values
-
-        # Apply Isolation Forest
-        model = IsolationForest(contamination=contamination, random_state=42)
-        feature_df['anomaly'] = model.fit_predict(X)
+        values = np.asarray(rows['values'])
 
-        # Extract anomalies
-        anomaly_df = feature_df[feature_df['anomaly'] == -1]
+        if field_id is not None:
+            # Model z magazynu - tylko ocena odczytów
+            is_anomaly, mean_value, std_value = anomaly_model_store.score(
+                field_id, feature, rows['keys'], rows['values'], contamination, rows['dates']
+            )
+        else:
+            # Apply Isolation Forest
+            model = IsolationForest(contamination=contamination, random_state=42)
+            is_anomaly = model.fit_predict(values.reshape(-1, 1)) == -1
+            mean_value = values.mean()
+            std_value = values.std(ddof=1)
 
-        for _, row in anomaly_df.iterrows():
-            # Calculate deviation from mean
-            mean_value = feature_df['value'].mean()
-            std_value = feature_df['value'].std()
-            deviation = abs(row['value'] - mean_value) / (std_value if std_value > 0 else 1)
+        # Calculate deviation from mean
+        deviation = np.abs(values - mean_value) / (std_value if std_value > 0 else 1)
 
+        for i in np.flatnonzero(is_anomaly):
             anomalies.append({
-                'date': row['date'],
-                'type': f"{row['feature']}_anomaly",
-                'description': f"Anomalous {row['feature']} value detected ({row['value']:.2f})",
-                'severity': 'high' if deviation > 3 else 'medium',
-                'value': float(row['value']),
+                'date': rows['dates'][i],
+                'type': f"{feature}_anomaly",
+                'description': f"Anomalous {feature} value detected ({values[i]:.2f})",
+                'severity': 'high' if deviation[i] > 3 else 'medium',
+                'value': float(values[i]),
                 'expected': float(mean_value)
             })
 
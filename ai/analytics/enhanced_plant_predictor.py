@@ -1,5 +1,6 @@
 import numpy as np
 import pandas as pd
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import mean_absolute_error, r2_score
@@ -8,12 +9,17 @@ import logging
 import os
 from datetime import datetime
 
+from config import Config
+from .model_registry import ModelRegistry
+from .utils import tree_predictions
+from .synthetic_data import ensemble_training_data
+
 logger = logging.getLogger(__name__)
 
 class EnhancedPlantGrowthPredictor:
-    def __init__(self):
-        self.models = {}
-        self.model_weights = {}
+    def __init__(self, registry=None):
+        # Modele zespołu i wagi w jednym słowniku - podmieniany atomowo przy zmianie wersji
+        self.bundle = None
         self.performance_history = {}
         self.feature_names = [
             'ndvi_mean', 'ndvi_std', 'ndvi_min', 'ndvi_max',
@@ -47,8 +53,19 @@ class EnhancedPlantGrowthPredictor:
             'random_state': 42
         }
 
-        self.model_path = '/app/models/'
-        os.makedirs(self.model_path, exist_ok=True)
+        self.registry = registry or ModelRegistry('growth_ensemble')
+
+    @property
+    def models(self):
+        return self.bundle['models'] if self.bundle else {}
+
+    @property
+    def model_weights(self):
+        return self.bundle['model_weights'] if self.bundle else {}
+
+    @property
+    def model_version(self):
+        return self.bundle['model_version'] if self.bundle else None
 
     def load_or_train(self):
         """
@@ -68,42 +85,71 @@ class EnhancedPlantGrowthPredictor:
             logger.error(f"Błąd inicjalizacji modeli: {e}")
             return False
 
-    def _load_existing_models(self):
-        """Ładowanie wytrenowanych modeli z dysku"""
+    def _load_existing_models(self, version=None):
+        """Ładowanie wersji modeli z rejestru (domyślnie aktywnej)"""
         try:
-            rf_path = os.path.join(self.model_path, 'rf_model.joblib')
-            gb_path = os.path.join(self.model_path, 'gb_model.joblib')
-            weights_path = os.path.join(self.model_path, 'model_weights.joblib')
-
-            if all(os.path.exists(p) for p in [rf_path, gb_path, weights_path]):
-                self.models['rf'] = joblib.load(rf_path)
-                self.models['gb'] = joblib.load(gb_path)
-                self.model_weights = joblib.load(weights_path)
-                return True
-            return False
+            self._import_legacy_models()
+
+            loaded = self.registry.load(version)
+            if loaded is None:
+                return False
+
+            manifest, artifacts = loaded
+            self.bundle = {
+                'models': {'rf': artifacts['rf'], 'gb': artifacts['gb']},
+                'model_weights': artifacts['model_weights'],
+                'model_version': manifest['version']
+            }
+            return True
         except Exception as e:
             logger.error(f"Błąd ładowania modeli: {e}")
             return False
 
-    def _train_with_synthetic_data(self):
+    def load_model(self, version=None):
+        """Wczytaj wersję modeli z rejestru i podmień ją atomowo (bez restartu serwisu)"""
+        return self._load_existing_models(version)
+
+    def train(self, n_samples=1000, activate=True):
+        """Wytrenuj modele zespołu i opublikuj je jako nową wersję w rejestrze"""
+        return self._train_with_synthetic_data(n_samples, activate)
+
+    def _import_legacy_models(self):
+        """Jednorazowe przeniesienie starych plików rf/gb/weights do pustego rejestru"""
+        paths = {key: os.path.join(Config.MODEL_PATH, f"{filename}.joblib")
+                 for key, filename in (('rf', 'rf_model'), ('gb', 'gb_model'), ('model_weights', 'model_weights'))}
+
+        if self.registry.active_version() or not all(os.path.exists(p) for p in paths.values()):
+            return
+
+        self.registry.publish({key: joblib.load(path) for key, path in paths.items()}, {
+            'feature_columns': self.feature_names,
+            'training_date': 'unknown',
+            'metrics': {},
+            'imported_from': Config.MODEL_PATH
+        })
+        logger.info("Przeniesiono stare modele zespołowe do rejestru")
+
+    def _train_with_synthetic_data(self, n_samples=1000, activate=True):
         """Trenowanie modeli z syntetycznymi danymi rolniczymi"""
         try:
             # Generowanie syntetycznych danych treningowych
-            X_train, y_train = self._generate_synthetic_training_data(1000)
+            X_train, y_train = self._generate_synthetic_training_data(n_samples)
+
+            models = {}
 
             # Trenowanie Random Forest
-            self.models['rf'] = RandomForestRegressor(**self.rf_params)
-            self.models['rf'].fit(X_train, y_train)
+            models['rf'] = RandomForestRegressor(**self.rf_params)
+            models['rf'].fit(X_train, y_train)
 
             # Trenowanie Gradient Boosting
-            self.models['gb'] = GradientBoostingRegressor(**self.gb_params)
-            self.models['gb'].fit(X_train, y_train)
+            models['gb'] = GradientBoostingRegressor(**self.gb_params)
+            models['gb'].fit(X_train, y_train)
 
             # Obliczanie wag na podstawie wydajności
-            self._calculate_adaptive_weights(X_train, y_train)
+            model_weights = self._calculate_adaptive_weights(models, X_train, y_train)
 
             # Zapisywanie modeli
-            self._save_models()
+            self._save_models(models, model_weights, activate)
 
             logger.info("Pomyślnie wytrenowano i zapisano modele zespołowe")
             return True
@@ -112,59 +158,20 @@ class EnhancedPlantGrowthPredictor:
             logger.error(f"Błąd trenowania modeli: {e}")
             return False
 
-    def _generate_synthetic_training_data(self, n_samples):
-        """Generowanie realistycznych danych treningowych dla rolnictwa"""
-        np.random.seed(42)
-
-        # Generowanie cech podstawowych
-        ndvi_mean = np.random.beta(2, 2, n_samples) * 0.8 + 0.1  # NDVI 0.1-0.9
-        ndvi_std = np.random.exponential(0.1, n_samples)
-
-        # Korelowane cechy środowiskowe
-        temp_avg = np.random.normal(22, 5, n_samples)
-        rainfall = np.random.gamma(2, 10, n_samples)
-        soil_moisture = np.clip(np.random.normal(0.4, 0.15, n_samples), 0.1, 0.8)
-
-        # Cechy czasowe
-        days_since_planting = np.random.randint(1, 120, n_samples)
-        growth_stage = np.clip(days_since_planting // 30, 0, 3)
-
-        # Nowe cechy przestrzenne (symulowane)
-        spatial_autocorr = np.random.normal(0.3, 0.2, n_samples)
-        cluster_count = np.random.poisson(2, n_samples)
-
-        X = np.column_stack([
-            ndvi_mean, ndvi_std, ndvi_mean - ndvi_std, ndvi_mean + ndvi_std,
-            soil_moisture, np.random.normal(0.05, 0.02, n_samples),
-            temp_avg, temp_avg + 5, temp_avg - 3,
-            np.random.normal(65, 10, n_samples), rainfall,
-            days_since_planting, growth_stage,
-            spatial_autocorr, np.random.normal(0.02, 0.01, n_samples),
-            np.random.poisson(1, n_samples), cluster_count,
-            np.random.beta(2, 3, n_samples)
-        ])
-
-        # Generowanie target variable (biomass prediction)
-        # Złożona funkcja uwzględniająca interakcje między cechami
-        y = (ndvi_mean * 10 +
-             soil_moisture * 3 +
-             (temp_avg - 15) * 0.2 +
-             np.log1p(rainfall) * 0.5 +
-             spatial_autocorr * 2 +
-             np.random.normal(0, 0.5, n_samples))  # szum
-
-        y = np.clip(y, 0, 15)  # Realistyczny zakres biomasy
-
-        return X, y
-
-    def _calculate_adaptive_weights(self, X, y):
+    def _generate_synthetic_training_data(self, n_samples, rng=None):
+        """Generowanie realistycznych danych treningowych dla rolnictwa (wspólny generator sezonów)"""
+        return ensemble_training_data(n_samples, rng)
+
+    def _calculate_adaptive_weights(self, models, X, y):
         """
         Dynamiczne obliczanie wag na podstawie wydajności modeli
         Wykorzystuje walidację krzyżową dla objektywnej oceny
         """
-        # Cross-validation dla objektywnej oceny
-        rf_scores = cross_val_score(self.models['rf'], X, y, cv=5, scoring='r2')
-        gb_scores = cross_val_score(self.models['gb'], X, y, cv=5, scoring='r2')
+        # Cross-validation dla objektywnej oceny - podziały równolegle (TRAINING_WORKERS),
+        # las w każdym podziale jednowątkowo, by nie mnożyć wątków ponad liczbę rdzeni
+        n_jobs = Config.TRAINING_WORKERS or -1
+        rf_scores = cross_val_score(clone(models['rf']).set_params(n_jobs=1), X, y, cv=5, scoring='r2', n_jobs=n_jobs)
+        gb_scores = cross_val_score(models['gb'], X, y, cv=5, scoring='r2', n_jobs=n_jobs)
 
         rf_performance = np.mean(rf_scores)
         gb_performance = np.mean(gb_scores)
@@ -172,6 +179,8 @@ class EnhancedPlantGrowthPredictor:
         logger.info(f"RF R² score: {rf_performance:.3f}")
         logger.info(f"GB R² score: {gb_performance:.3f}")
 
+        self.performance_history = {'rf_r2': float(rf_performance), 'gb_r2': float(gb_performance)}
+
         # Obliczanie wag na podstawie względnej wydajności
         total_performance = rf_performance + gb_performance
 
@@ -184,18 +193,22 @@ class EnhancedPlantGrowthPredictor:
 
         # Normalizacja wag
         total_weight = rf_weight + gb_weight
-        self.model_weights = {
+        model_weights = {
             'rf': rf_weight / total_weight,
             'gb': gb_weight / total_weight
         }
 
-        logger.info(f"Adaptive weights - RF: {self.model_weights['rf']:.3f}, GB: {self.model_weights['gb']:.3f}")
+        logger.info(f"Adaptive weights - RF: {model_weights['rf']:.3f}, GB: {model_weights['gb']:.3f}")
+        return model_weights
 
     def predict_ensemble(self, features):
         """Predykcja zespołowa z adaptacyjnymi wagami"""
         try:
-            if not self.models or not self.model_weights:
+            # Migawka modeli - podmiana wersji w trakcie nie wpływa na to żądanie
+            bundle = self.bundle
+            if not bundle:
                 return None
+            models, model_weights = bundle['models'], bundle['model_weights']
 
             # Konwersja do numpy array jeśli potrzeba
             if isinstance(features, list):
@@ -203,13 +216,15 @@ class EnhancedPlantGrowthPredictor:
             elif len(features.shape) == 1:
                 features = features.reshape(1, -1)
 
-            # Predykcje z poszczególnych modeli
-            rf_pred = self.models['rf'].predict(features)
-            gb_pred = self.models['gb'].predict(features)
+            # Predykcje z poszczególnych modeli - las oceniany drzewo po drzewie w jednym przejściu,
+            # średnia drzew to predykcja RF, a ich rozrzut daje przedział predykcji
+            rf_trees = tree_predictions(models['rf'], features)
+            rf_pred = rf_trees.mean(axis=0)
+            gb_pred = models['gb'].predict(features)
 
             # Zespołowa predykcja z wagami
-            ensemble_pred = (self.model_weights['rf'] * rf_pred +
-                           self.model_weights['gb'] * gb_pred)
+            ensemble_pred = (model_weights['rf'] * rf_pred +
+                           model_weights['gb'] * gb_pred)
 
             # Metryki pewności
             rf_confidence = np.abs(rf_pred - ensemble_pred)
@@ -217,12 +232,22 @@ class EnhancedPlantGrowthPredictor:
             confidence_score = 1.0 - np.mean([rf_confidence, gb_confidence]) / np.std([rf_pred, gb_pred])
             confidence_score = np.clip(confidence_score, 0.0, 1.0)
 
+            # Przedział: kwantyle 10/90 drzew RF przesunięte do predykcji zespołowej
+            lower, upper = np.quantile(rf_trees, (0.1, 0.9), axis=0) - rf_pred + ensemble_pred
+
             return {
                 'growth_prediction': float(ensemble_pred[0]),
                 'rf_prediction': float(rf_pred[0]),
                 'gb_prediction': float(gb_pred[0]),
                 'confidence_score': float(confidence_score[0]) if hasattr(confidence_score, '__len__') else float(confidence_score),
-                'model_weights': self.model_weights.copy()
+                'prediction_interval': {
+                    'lower': float(min(lower[0], ensemble_pred[0])),
+                    'upper': float(max(upper[0], ensemble_pred[0])),
+                    'quantiles': [0.1, 0.9],
+                    'method': 'forest_tree_spread'
+                },
+                'model_weights': model_weights.copy(),
+                'model_version': bundle['model_version']
             }
 
         except Exception as e:
@@ -231,16 +256,17 @@ class EnhancedPlantGrowthPredictor:
 
     def get_feature_importance(self):
         """Pobieranie ważności cech z modeli zespołowych"""
-        if not self.models:
+        bundle = self.bundle
+        if not bundle:
             return {}
 
         try:
-            rf_importance = self.models['rf'].feature_importances_
-            gb_importance = self.models['gb'].feature_importances_
+            rf_importance = bundle['models']['rf'].feature_importances_
+            gb_importance = bundle['models']['gb'].feature_importances_
 
             # Ważona kombinacja ważności cech
-            combined_importance = (self.model_weights['rf'] * rf_importance +
-                                 self.model_weights['gb'] * gb_importance)
+            combined_importance = (bundle['model_weights']['rf'] * rf_importance +
+                                 bundle['model_weights']['gb'] * gb_importance)
 
             feature_importance = {}
             for i, name in enumerate(self.feature_names):
@@ -253,16 +279,22 @@ class EnhancedPlantGrowthPredictor:
             logger.error(f"Błąd pobierania ważności cech: {e}")
             return {}
 
-    def _save_models(self):
-        """Zapisywanie wytrenowanych modeli"""
+    def _save_models(self, models, model_weights, activate=True):
+        """Zapisywanie wytrenowanych modeli jako nowej wersji w rejestrze"""
+        version = None
         try:
-            joblib.dump(self.models['rf'], os.path.join(self.model_path, 'rf_model.joblib'))
-            joblib.dump(self.models['gb'], os.path.join(self.model_path, 'gb_model.joblib'))
-            joblib.dump(self.model_weights, os.path.join(self.model_path, 'model_weights.joblib'))
-            logger.info("Modele zapisane pomyślnie")
+            version = self.registry.publish({'rf': models['rf'], 'gb': models['gb'], 'model_weights': model_weights}, {
+                'feature_columns': self.feature_names,
+                'training_date': datetime.now().isoformat(),
+                'metrics': self.performance_history,
+                'model_weights': model_weights
+            }, activate=activate)
+            logger.info(f"Modele zapisane pomyślnie (wersja {version})")
         except Exception as e:
             logger.error(f"Błąd zapisywania modeli: {e}")
 
+        self.bundle = {'models': models, 'model_weights': model_weights, 'model_version': version}
+
     def load_fallback_model(self):
         """Prosty model zapasowy w przypadku błędu głównych modeli"""
         from sklearn.linear_model import LinearRegression
@@ -0,0 +1,230 @@
+import ipaddress
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+UNFINISHED_STATUSES = ('queued', 'running')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Callback bez przekierowań - przekierowanie mogłoby ominąć sprawdzenie adresu docelowego"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    """
+    Zadania w tle (np. długie analizy pól) wykonywane w puli wątków serwisu.
+    Stan zadania zapisywany jako JSON pod `path` - status odczyta dowolny proces roboczy gunicorna.
+    Pula tworzona leniwie w każdym procesie (wątki nie przetrwają fork).
+    Po zakończeniu opcjonalnie POST dokumentu zadania na callback_url - do hostów z callback_hosts
+    lub innych hostów rozwiązywanych wyłącznie na publiczne adresy IP.
+    Zadania procesu, który zakończył się przed ich wykonaniem (restart), oznaczane są jako 'failed'.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, max_workers=2, ttl=86400, callback_timeout=10, callback_hosts=None, stale_after=3600):
+        self.path = path
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.callback_timeout = callback_timeout
+        self.callback_hosts = set(callback_hosts or [])
+        self.stale_after = stale_after
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._pending = 0
+
+        os.makedirs(path, exist_ok=True)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, kind, func, callback_url=None, **meta):
+        """Zakolejkuj func() jako zadanie; zwraca dokument zadania (status 'queued')"""
+        self.check_callback_url(callback_url)
+        job = dict(meta, id=uuid.uuid4().hex, kind=kind, status='queued', created_at=datetime.now().isoformat(),
+                   worker_pid=os.getpid())
+        if callback_url:
+            job['callback_url'] = callback_url
+        self._write(job)
+
+        with self._lock:
+            self._submitted += 1
+            self._pending += 1
+            prune = self._submitted % self.PRUNE_EVERY == 0
+
+        self._get_executor().submit(self._run, job, func)
+        if prune:
+            self._prune()
+
+        return job
+
+    def check_callback_url(self, callback_url):
+        """
+        ValueError gdy callback_url nie jest adresem http(s) albo jego host nie jest na liście callback_hosts
+        i rozwiązuje się na adres niepubliczny (loopback, sieć prywatna, link-local, zarezerwowany)
+        """
+        if not callback_url:
+            return
+        url = urllib.parse.urlparse(str(callback_url))
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise ValueError('callback_url must be an http(s) URL')
+
+        host = url.hostname.lower()
+        if host in self.callback_hosts:
+            return
+
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, url.port or None, proto=socket.IPPROTO_TCP)}
+        except (socket.gaierror, UnicodeError, ValueError):
+            raise ValueError(f"callback_url host {url.hostname} cannot be resolved")
+        for address in addresses:
+            if not ipaddress.ip_address(address.split('%')[0]).is_global:
+                raise ValueError(f"callback_url host {url.hostname} is not allowed")
+
+    def pending(self):
+        """Zadania tego procesu oczekujące lub wykonywane"""
+        with self._lock:
+            return self._pending
+
+    def get(self, job_id):
+        """Dokument zadania lub None (nieznane / wygasłe / niepoprawne id)"""
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        job = self._read(self._job_file(job_id))
+        if job and self._is_lost(job):
+            job = self._fail_lost(job, 'Job was lost: its worker process exited before the job finished')
+        return job
+
+    def fail_unfinished(self):
+        """
+        Przy starcie serwisu (przed uruchomieniem procesów roboczych) zadania 'queued' / 'running'
+        nie mają już wykonawcy - oznaczane jako 'failed'. Zwraca liczbę takich zadań.
+        """
+        failed = 0
+        for name in os.listdir(self.path):
+            if not name.endswith('.json'):
+                continue
+            job = self._read(os.path.join(self.path, name))
+            if job and job.get('status') in UNFINISHED_STATUSES:
+                self._fail_lost(job, 'Job was lost: the service restarted before the job finished')
+                failed += 1
+        if failed:
+            logger.warning(f"⚠️ Marked {failed} unfinished jobs as failed after restart")
+        return failed
+
+    def _is_lost(self, job):
+        """Zadanie niezakończone, którego proces już nie działa lub które trwa dłużej niż stale_after"""
+        if job.get('status') not in UNFINISHED_STATUSES:
+            return False
+        if not _pid_alive(job.get('worker_pid')):
+            return True
+        try:
+            age = (datetime.now() - datetime.fromisoformat(job['created_at'])).total_seconds()
+        except (KeyError, TypeError, ValueError):
+            return False
+        return bool(self.stale_after) and age > self.stale_after
+
+    def _fail_lost(self, job, error):
+        job = dict(job, status='failed', error=error, finished_at=datetime.now().isoformat())
+        self._write(job)
+        return job
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _run(self, job, func):
+        job = dict(job, status='running', started_at=datetime.now().isoformat())
+        self._write(job)
+
+        started = time.time()
+        try:
+            job['result'] = func()
+            job['status'] = 'done'
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            job['status'] = 'failed'
+            job['error'] = str(e)
+
+        job['finished_at'] = datetime.now().isoformat()
+        job['duration_seconds'] = round(time.time() - started, 3)
+        self._write(job)
+
+        with self._lock:
+            self._pending -= 1
+
+        if job.get('callback_url'):
+            self._callback(job)
+
+    def _callback(self, job):
+        """Powiadomienie o zakończeniu zadania - błąd callbacku zapisywany w dokumencie zadania"""
+        body = json.dumps(job, default=str).encode('utf-8')
+        callback = urllib.request.Request(job['callback_url'], data=body, method='POST',
+                                          headers={'Content-Type': 'application/json'})
+        try:
+            # Adres sprawdzany ponownie - rekord DNS mógł się zmienić od przyjęcia zadania
+            self.check_callback_url(job['callback_url'])
+            with urllib.request.build_opener(_NoRedirect).open(callback, timeout=self.callback_timeout) as response:
+                job['callback_status'] = response.status
+        except Exception as e:
+            logger.warning(f"Job {job['id']} callback to {job['callback_url']} failed: {e}")
+            job['callback_error'] = str(e)
+        self._write(job)
+
+    def _job_file(self, job_id):
+        return os.path.join(self.path, f"{job_id}.json")
+
+    def _write(self, job):
+        """Atomowy zapis dokumentu zadania"""
+        path = self._job_file(job['id'])
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f, default=str)
+        os.replace(tmp_path, path)
+
+    def _prune(self):
+        """Usuń dokumenty zadań starsze niż ttl"""
+        now = time.time()
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            try:
+                if os.path.getmtime(path) + self.ttl <= now:
+                    os.remove(path)
+            except OSError:
+                pass
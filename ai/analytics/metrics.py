@@ -0,0 +1,191 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Przedziały histogramów: czas (s) i rozmiar (bajty)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Opisy metryk w formacie ekspozycji Prometheusa: nazwa -> (typ, opis, przedziały histogramu)
+METRICS = {
+    'ai_requests_total': ('counter', 'HTTP requests by route, method and status', None),
+    'ai_request_duration_seconds': ('histogram', 'HTTP request latency by route', LATENCY_BUCKETS),
+    'ai_request_size_bytes': ('histogram', 'HTTP request payload size by route', SIZE_BUCKETS),
+    'ai_response_size_bytes': ('histogram', 'HTTP response payload size by route', SIZE_BUCKETS),
+    'ai_stage_duration_seconds': ('histogram', 'Analysis stage latency', LATENCY_BUCKETS),
+    'ai_model_load_seconds': ('histogram', 'Model version load time', LATENCY_BUCKETS),
+    'ai_result_cache_requests_total': ('counter', 'Result cache lookups by outcome (memory_hit, disk_hit, miss)', None)
+}
+
+# Czasy etapów bieżącego żądania (blok 'timings' w odpowiedzi JSON) - kontekst kopiowany do wątków etapów
+request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class Metrics:
+    """
+    Liczniki i histogramy procesu z ekspozycją w formacie tekstowym Prometheusa.
+    Z `path` każdy proces roboczy zapisuje migawkę do <path>/<pid>.json (co flush_interval s),
+    a render() sumuje migawki wszystkich procesów - /metrics z dowolnego procesu pokazuje cały serwis.
+    """
+
+    def __init__(self, path=None, flush_interval=5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def configure(self, path, flush_interval=5):
+        """Włącz migawki procesów w katalogu path (serwis z wieloma procesami roboczymi)"""
+        self.path = path
+        self.flush_interval = flush_interval
+        os.makedirs(path, exist_ok=True)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = METRICS[name][2]
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Liczności przedziałów (ostatni: +Inf), suma, liczba obserwacji
+                histogram = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            histogram[0][bisect.bisect_left(buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(counts), total, count]
+                               for (name, labels), (counts, total, count) in self._histograms.items()]
+            }
+
+    def maybe_flush(self):
+        """Zapis migawki procesu, najwyżej raz na flush_interval sekund"""
+        if self.path and time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.path:
+            return
+        self._last_flush = time.time()
+
+        path = os.path.join(self.path, f"{os.getpid()}.json")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Metrics snapshot write failed: {e}")
+
+    def reset(self):
+        """Wyzeruj liczniki procesu (proces roboczy po fork - wartości procesu głównego są w jego migawce)"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def clear(self):
+        """Usuń migawki poprzedniego uruchomienia (start serwisu, przed uruchomieniem procesów roboczych)"""
+        if not self.path:
+            return
+        for name in os.listdir(self.path):
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    def render(self):
+        """Metryki wszystkich procesów w formacie tekstowym Prometheusa"""
+        snapshots = [self.snapshot()]
+        if self.path:
+            self.flush()
+            own = f"{os.getpid()}.json"
+            for name in os.listdir(self.path):
+                if name == own or not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.path, name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, counts, total, count in snapshot['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+
+        lines = []
+        for name, (kind, description, buckets) in METRICS.items():
+            series = counters if kind == 'counter' else histograms
+            keys = sorted(key for key in series if key[0] == name)
+            if not keys:
+                continue
+
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key in keys:
+                labels = key[1]
+                if kind == 'counter':
+                    lines.append(f"{name}{_format_labels(labels)} {series[key]}")
+                    continue
+
+                counts, total, count = series[key]
+                cumulative = 0
+                for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {round(total, 6)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+# Rejestr metryk serwisu - katalog migawek ustawia app.py (metrics.configure)
+metrics = Metrics()
+
+
+@contextmanager
+def stage_timer(stage):
+    """Czas etapu analizy: histogram ai_stage_duration_seconds i blok timings bieżącego żądania"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        metrics.observe('ai_stage_duration_seconds', seconds, stage=stage)
+        timings = request_timings.get()
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + seconds, 4)
@@ -0,0 +1,214 @@
+import fcntl
+import joblib
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+import logging
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Wersjonowane artefakty modeli pod Config.MODEL_PATH/<name>/.
+    Każda wersja to katalog versions/<version>/ z plikami artefaktów i manifest.json;
+    aktywna wersja wskazywana jest przez active.json podmieniany atomowo (os.replace).
+    """
+
+    MANIFEST_FILE = 'manifest.json'
+    ACTIVE_FILE = 'active.json'
+
+    def __init__(self, name, base_path=None):
+        self.name = name
+        self.path = os.path.join(base_path or Config.MODEL_PATH, name)
+        self.versions_path = os.path.join(self.path, 'versions')
+        self._lock = threading.Lock()
+
+    def publish(self, artifacts, manifest, activate=True):
+        """Zapisz nową wersję (artefakty joblib + manifest) i opcjonalnie ją aktywuj"""
+        version = datetime.now().strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+        version_path = os.path.join(self.versions_path, version)
+        staging_path = os.path.join(self.versions_path, f".{version}.tmp")
+
+        os.makedirs(staging_path, exist_ok=True)
+        try:
+            for key, artifact in artifacts.items():
+                joblib.dump(artifact, os.path.join(staging_path, f"{key}.joblib"))
+
+            manifest = dict(manifest, name=self.name, version=version,
+                            artifacts=sorted(artifacts), created_at=datetime.now().isoformat())
+            with open(os.path.join(staging_path, self.MANIFEST_FILE), 'w') as f:
+                json.dump(manifest, f, indent=2, default=str)
+
+            # Wersja pojawia się w rejestrze dopiero kompletna
+            os.rename(staging_path, version_path)
+        except Exception:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+
+        logger.info(f"📦 Model {self.name} version {version} published")
+
+        if activate:
+            self.promote(version)
+
+        return version
+
+    def list_versions(self):
+        """Manifesty wszystkich wersji, od najstarszej"""
+        if not os.path.isdir(self.versions_path):
+            return []
+
+        manifests = []
+        for version in sorted(os.listdir(self.versions_path)):
+            if version.startswith('.'):
+                continue
+            try:
+                manifests.append(self.manifest(version))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping broken model version {version}: {e}")
+        return manifests
+
+    def manifest(self, version):
+        with open(os.path.join(self.versions_path, version, self.MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    def _read_active(self):
+        try:
+            with open(os.path.join(self.path, self.ACTIVE_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': None, 'history': []}
+
+    def _write_active(self, active):
+        """Atomowa podmiana wskaźnika aktywnej wersji"""
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, f".{self.ACTIVE_FILE}.{uuid.uuid4().hex}")
+        with open(tmp_path, 'w') as f:
+            json.dump(active, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, self.ACTIVE_FILE))
+
+    def active_version(self):
+        return self._read_active()['version']
+
+    def promote(self, version):
+        """Ustaw wersję jako aktywną; poprzednia trafia do historii (dla rollback)"""
+        if not os.path.isfile(os.path.join(self.versions_path, version, self.MANIFEST_FILE)):
+            raise ValueError(f"Unknown model version: {version}")
+
+        with self._lock:
+            lock_file = self.try_lock('active', blocking=True)
+            try:
+                active = self._read_active()
+                if active['version'] == version:
+                    return active
+
+                history = active['history'] + ([active['version']] if active['version'] else [])
+                active = {'version': version, 'history': history, 'promoted_at': datetime.now().isoformat()}
+                self._write_active(active)
+            finally:
+                lock_file.close()
+
+        logger.info(f"🔀 Model {self.name} version {version} is now active")
+        return active
+
+    def previous_version(self):
+        """Wersja, do której cofnie rollback() - do wczytania i sprawdzenia przed podmianą wskaźnika"""
+        history = self._read_active()['history']
+        if not history:
+            raise ValueError(f"No previous version of {self.name} to roll back to")
+        return history[-1]
+
+    def rollback(self, expected=None):
+        """Przywróć poprzednio aktywną wersję; expected - wersja sprawdzona przez wywołującego (previous_version)"""
+        with self._lock:
+            lock_file = self.try_lock('active', blocking=True)
+            try:
+                active = self._read_active()
+                if not active['history']:
+                    raise ValueError(f"No previous version of {self.name} to roll back to")
+
+                history = list(active['history'])
+                version = history.pop()
+                if expected and version != expected:
+                    raise ValueError(f"Active version of {self.name} changed during rollback, retry")
+
+                active = {'version': version, 'history': history, 'promoted_at': datetime.now().isoformat()}
+                self._write_active(active)
+            finally:
+                lock_file.close()
+
+        logger.info(f"↩️  Model {self.name} rolled back to version {version}")
+        return active
+
+    def load(self, version=None):
+        """Wczytaj artefakty wersji (domyślnie aktywnej); zwraca (manifest, artefakty) lub None"""
+        version = version or self.active_version()
+        if not version:
+            return None
+
+        manifest = self.manifest(version)
+        artifacts = {
+            key: joblib.load(os.path.join(self.versions_path, version, f"{key}.joblib"))
+            for key in manifest['artifacts']
+        }
+        return manifest, artifacts
+
+    def try_lock(self, name, blocking=False):
+        """
+        Blokada plikowa między procesami (np. trening, podmiana aktywnej wersji);
+        zwraca otwarty plik (zamknięcie zwalnia) lub None. blocking=True - czekanie na zwolnienie.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        lock_file = open(os.path.join(self.path, f".{name}.lock"), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+
+class RegistryWatcher:
+    """
+    Wątek w tle przeładowujący modele, gdy w rejestrze zmieni się aktywna wersja
+    (promote w innym procesie roboczym, model wytrenowany przez 'python -m train').
+    `models` to nazwa -> obiekt z .registry, .model_version i .load_model(version).
+    """
+
+    def __init__(self, models, interval=30):
+        self.models = models
+        self.interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+
+    def check(self):
+        for name, model in self.models.items():
+            active = model.registry.active_version()
+            if active and active != model.model_version:
+                logger.info(f"🔄 Model {name}: active version changed to {active}, reloading")
+                model.load_model(active)
+
+    def start(self):
+        """Uruchom wątek (w każdym procesie osobno - wątki nie przetrwają fork)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='model-registry-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning(f"Model registry check failed: {e}")
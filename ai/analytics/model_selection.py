@@ -0,0 +1,129 @@
+import os
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+import logging
+
+import numpy as np
+from joblib.externals.loky import get_reusable_executor
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import KFold
+
+logger = logging.getLogger(__name__)
+
+ESTIMATORS = {
+    'RandomForest': RandomForestRegressor,
+    'GradientBoosting': GradientBoostingRegressor
+}
+
+# Domyślna siatka kandydatów - boosting z wczesnym zatrzymaniem na wydzielonej części zbioru uczącego
+DEFAULT_CANDIDATES = [
+    {'estimator': 'RandomForest', 'params': {'n_estimators': 150, 'max_depth': 12, 'min_samples_split': 5}},
+    {'estimator': 'RandomForest', 'params': {'n_estimators': 300, 'max_depth': 16, 'min_samples_split': 3}},
+    {'estimator': 'RandomForest', 'params': {'n_estimators': 200, 'max_depth': None, 'min_samples_leaf': 2, 'max_features': 0.5}},
+    {'estimator': 'GradientBoosting', 'params': {'n_estimators': 500, 'max_depth': 8, 'learning_rate': 0.1,
+                                                 'validation_fraction': 0.1, 'n_iter_no_change': 10}},
+    {'estimator': 'GradientBoosting', 'params': {'n_estimators': 800, 'max_depth': 5, 'learning_rate': 0.05, 'subsample': 0.8,
+                                                 'validation_fraction': 0.1, 'n_iter_no_change': 15}},
+    {'estimator': 'GradientBoosting', 'params': {'n_estimators': 500, 'max_depth': 3, 'learning_rate': 0.1,
+                                                 'validation_fraction': 0.1, 'n_iter_no_change': 10}}
+]
+
+
+def build_estimator(candidate, n_jobs=None):
+    """Estymator kandydata (random_state stały - wyniki powtarzalne)"""
+    estimator = ESTIMATORS[candidate['estimator']]
+    params = dict(candidate['params'], random_state=42)
+    if n_jobs is not None and 'n_jobs' in estimator().get_params():
+        params['n_jobs'] = n_jobs
+    return estimator(**params)
+
+
+def candidate_name(candidate):
+    params = ', '.join(f"{key}={value}" for key, value in sorted(candidate['params'].items()))
+    return f"{candidate['estimator']}({params})"
+
+
+def evaluate_candidate(candidate, X, y, cv=3):
+    """Walidacja krzyżowa jednego kandydata (w procesie roboczym - estymator jednowątkowy)"""
+    started = time.time()
+    r2_scores, maes, iterations = [], [], []
+
+    for train_index, test_index in KFold(n_splits=cv, shuffle=True, random_state=42).split(X):
+        model = build_estimator(candidate, n_jobs=1)
+        model.fit(X[train_index], y[train_index])
+        y_pred = model.predict(X[test_index])
+        r2_scores.append(r2_score(y[test_index], y_pred))
+        maes.append(mean_absolute_error(y[test_index], y_pred))
+        if hasattr(model, 'n_estimators_'):
+            iterations.append(int(model.n_estimators_))
+
+    result = {
+        'name': candidate_name(candidate),
+        'estimator': candidate['estimator'],
+        'params': candidate['params'],
+        'status': 'done',
+        'r2': float(np.mean(r2_scores)),
+        'r2_std': float(np.std(r2_scores)),
+        'mae': float(np.mean(maes)),
+        'seconds': round(time.time() - started, 2)
+    }
+    if iterations:
+        # Liczba iteracji boostingu po wczesnym zatrzymaniu
+        result['n_estimators_used'] = int(np.median(iterations))
+    return result
+
+
+def select_model(X, y, candidates=None, cv=3, time_budget=None, max_workers=None):
+    """
+    Ocena siatki kandydatów walidacją krzyżową w puli procesów (domyślnie wszystkie rdzenie).
+    Kandydaci nieukończeni w time_budget sekund trafiają do rankingu ze statusem 'timeout'.
+    Zwraca ranking posortowany malejąco po średnim R² (ukończeni na początku).
+    """
+    candidates = candidates or DEFAULT_CANDIDATES
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    max_workers = max_workers or os.cpu_count() or 1
+    deadline = time.time() + time_budget if time_budget else None
+
+    leaderboard = []
+    max_workers = min(max_workers, len(candidates))
+    queued = list(candidates)
+    # Pula loky (joblib, jak w sklearn): procesy bez fork z wątków serwera i bez importu __main__
+    executor = get_reusable_executor(max_workers=max_workers)
+    try:
+        pending = {}
+        while queued or pending:
+            # W puli najwyżej max_workers kandydatów - po przekroczeniu budżetu nie ma zaległej kolejki
+            while queued and len(pending) < max_workers:
+                candidate = queued.pop(0)
+                pending[executor.submit(evaluate_candidate, candidate, X, y, cv)] = candidate
+
+            timeout = max(0, deadline - time.time()) if deadline else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+
+            for future in done:
+                candidate = pending.pop(future)
+                try:
+                    result = future.result()
+                    logger.info(f"📊 {result['name']} - CV R²: {result['r2']:.4f} ± {result['r2_std']:.4f}, "
+                                f"MAE: {result['mae']:.2f} ({result['seconds']}s)")
+                except Exception as e:
+                    logger.warning(f"Candidate {candidate_name(candidate)} failed: {e}")
+                    result = {'name': candidate_name(candidate), 'estimator': candidate['estimator'],
+                              'params': candidate['params'], 'status': 'failed', 'error': str(e)}
+                leaderboard.append(result)
+
+        for candidate in list(pending.values()) + queued:
+            logger.warning(f"⏱️ Candidate {candidate_name(candidate)} exceeded the training time budget")
+            leaderboard.append({'name': candidate_name(candidate), 'estimator': candidate['estimator'],
+                                'params': candidate['params'], 'status': 'timeout'})
+    finally:
+        # Po przekroczeniu budżetu przerwij kandydatów jeszcze trenowanych
+        if pending:
+            executor.shutdown(wait=False, kill_workers=True)
+
+    leaderboard.sort(key=lambda result: (result['status'] != 'done', -result.get('r2', 0.0)))
+    return leaderboard
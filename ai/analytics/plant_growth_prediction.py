@@ -5,18 +5,41 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import joblib
+import hashlib
 import json
 import os
 from datetime import datetime, timedelta
 import logging
+import threading
+import time
+
+from config import Config
+from .model_registry import ModelRegistry
+from .utils import tree_predictions
+from .metrics import metrics, stage_timer
+from .synthetic_data import generate_seasons
+from .model_selection import select_model, build_estimator
+from preprocessing.field_data import decode_field_data
 
 logger = logging.getLogger(__name__)
 
 
 class PlantGrowthPredictor:
-    def __init__(self, model_path='/app/models/growth_model.pkl'):
-        self.model = None
-        self.scaler = StandardScaler()
+    # Granice dni od sadzenia dla faz wzrostu 0-5 (patrz _determine_growth_stage)
+    GROWTH_STAGE_BOUNDS = [14, 30, 60, 90, 110]
+    # Tryb scenariuszy: percentyle pasm i górny limit liczby trajektorii na żądanie
+    SCENARIO_PERCENTILES = (10, 50, 90)
+    MAX_SCENARIOS = 5000
+    # Kwantyle przedziału predykcji (głowice kwantylowe GB lub rozrzut drzew RF)
+    INTERVAL_QUANTILES = (0.1, 0.9)
+    # Część zbioru uczącego wydzielona do kalibracji konformalnej głowic kwantylowych
+    CALIBRATION_SIZE = 0.25
+    # Liczba symulowanych pól (każde to pełne sezony wszystkich upraw) w danych treningowych
+    TRAINING_FIELDS = 10
+
+    def __init__(self, registry=None, auto_init=True, background=True):
+        # Model, scaler i metadane w jednym słowniku - podmieniany atomowo przy zmianie wersji
+        self.bundle = None
         self.feature_columns = [
             'avg_ndvi', 'min_ndvi', 'max_ndvi',
             'avg_moisture', 'min_moisture', 'max_moisture',
@@ -25,45 +48,93 @@ class PlantGrowthPredictor:
             'fertilizer_nitrogen', 'fertilizer_phosphorus', 'fertilizer_potassium',
             'field_size', 'plant_height', 'plant_density'
         ]
-        self.model_path = model_path
-        self.model_version = "1.0"
-        self.training_date = None
+        self.registry = registry or ModelRegistry('growth_model')
 
-        # Automatyczna inicjalizacja
-        self.auto_initialize()
+        # Stan modelu: not_loaded / loading / training / loaded / failed
+        self.status = 'not_loaded'
+        self.training_thread = None
+        self.training_lock = None
 
-    def auto_initialize(self):
-        """Automatyczna inicjalizacja - wczytaj lub stwórz model"""
+        # Automatyczna inicjalizacja
+        if auto_init:
+            self.auto_initialize(background=background)
+
+    def auto_initialize(self, background=True):
+        """
+        Automatyczna inicjalizacja - wczytaj lub stwórz model.
+        Istniejący model wczytywany jest od razu; trenowanie nowego (background=True)
+        odbywa się w wątku w tle, żeby start serwisu nie czekał na trening.
+        """
         logger.info("🚀 Initializing PlantGrowthPredictor...")
+        self.status = 'loading'
 
-        # Stwórz katalog na modele jeśli nie istnieje
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+        if self.load_model():
+            logger.info("✅ Existing growth prediction model loaded successfully")
+            return True
 
-        if os.path.exists(self.model_path):
-            try:
-                self.load_model()
-                logger.info("✅ Existing growth prediction model loaded successfully")
-                return True
-            except Exception as e:
-                logger.warning(f"⚠️  Error loading existing model: {e}")
-                logger.info("🔄 Will create new model...")
+        if not Config.TRAIN_ON_STARTUP:
+            # Modele trenowane offline (python -m train growth) - serwis czeka na wersję w rejestrze
+            logger.warning("⚠️ No growth model in registry and startup training is disabled - run 'python -m train growth'")
+            self.status = 'not_loaded'
+            return False
+
+        logger.info("🔄 Will create new model...")
+        self.status = 'training'
 
+        # Jeden trenujący proces na rejestr - pozostałe procesy robocze wczytają jego wersję z rejestru
+        self.training_lock = self.registry.try_lock('training')
+        if self.training_lock is None:
+            logger.info("⏳ Growth model is being trained by another process - waiting for the registry")
+            return False
+
+        if background:
+            self.training_thread = threading.Thread(target=self._train_new_model, name='growth-model-training', daemon=True)
+            self.training_thread.start()
+            logger.info("⏳ Growth model training started in background")
+            return False
+
+        return self._train_new_model()
+
+    def _train_new_model(self):
+        """Trening nowego modelu (lub fallback) i ustawienie stanu"""
         # Jeśli model nie istnieje lub nie można go wczytać, stwórz nowy
         logger.info("🔧 Creating new growth prediction model...")
 
-        if self.create_and_train_model():
-            logger.info("✅ New growth prediction model created and trained successfully")
-            return True
-        else:
+        try:
+            if self.create_and_train_model():
+                logger.info("✅ New growth prediction model created and trained successfully")
+                self.status = 'loaded'
+                return True
+
             logger.error("❌ Failed to create growth prediction model")
-            self.create_fallback_model()
+            self.status = 'loaded' if self.create_fallback_model() else 'failed'
             return False
+        finally:
+            if self.training_lock is not None:
+                self.training_lock.close()
+                self.training_lock = None
+
+    @property
+    def model(self):
+        return self.bundle['model'] if self.bundle else None
+
+    @property
+    def scaler(self):
+        return self.bundle['scaler'] if self.bundle else None
+
+    @property
+    def training_date(self):
+        return self.bundle['training_date'] if self.bundle else None
 
-    def create_and_train_model(self):
-        """Stwórz i wytrenuj model automatycznie"""
+    @property
+    def model_version(self):
+        return self.bundle['model_version'] if self.bundle else None
+
+    def create_and_train_model(self, candidates=None, n_fields=None, activate=True):
+        """Stwórz i wytrenuj model automatycznie (candidates - siatka kandydatów, domyślnie DEFAULT_CANDIDATES)"""
         try:
             logger.info("📊 Generating training data...")
-            training_data = self.generate_comprehensive_training_data()
+            training_data = self.generate_comprehensive_training_data(n_fields)
 
             if len(training_data) < 200:
                 logger.error(f"❌ Not enough training data: {len(training_data)} samples")
@@ -71,10 +142,8 @@ class PlantGrowthPredictor:
 
             logger.info(f"📈 Training model with {len(training_data)} samples...")
 
-            # Przygotuj DataFrame
-            df = pd.DataFrame(training_data)
-            X = df[self.feature_columns]
-            y = df['biomass_target']
+            X = training_data[self.feature_columns]
+            y = training_data['biomass_target']
 
             # Wypełnij brakujące wartości
             X = X.fillna(X.mean())
@@ -83,54 +152,42 @@ class PlantGrowthPredictor:
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
             # Skalowanie
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
-
-            # Trenuj różne modele i wybierz najlepszy
-            models = {
-                'RandomForest': RandomForestRegressor(
-                    n_estimators=150,
-                    max_depth=12,
-                    min_samples_split=5,
-                    random_state=42,
-                    n_jobs=-1
-                ),
-                'GradientBoosting': GradientBoostingRegressor(
-                    n_estimators=150,
-                    max_depth=8,
-                    learning_rate=0.1,
-                    random_state=42
-                )
-            }
-
-            best_model = None
-            best_score = -float('inf')
-            best_name = ""
-
-            for name, model in models.items():
-                # Trenuj model
-                model.fit(X_train_scaled, y_train)
-
-                # Ewaluacja
-                y_pred = model.predict(X_test_scaled)
-                r2 = r2_score(y_test, y_pred)
-                mae = mean_absolute_error(y_test, y_pred)
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
+
+            # Ranking kandydatów (walidacja krzyżowa w puli procesów, z budżetem czasu)
+            leaderboard = select_model(X_train_scaled, y_train.to_numpy(), candidates,
+                                       cv=Config.TRAINING_CV_FOLDS, time_budget=Config.TRAINING_TIME_BUDGET,
+                                       max_workers=Config.TRAINING_WORKERS)
+            if not leaderboard or leaderboard[0]['status'] != 'done':
+                logger.error("❌ No model candidate finished cross-validation")
+                return False
 
-                logger.info(f"📊 {name} - R²: {r2:.4f}, MAE: {mae:.2f}")
+            # Zwycięzca trenowany na całym zbiorze uczącym i oceniany na zbiorze testowym
+            winner = leaderboard[0]
+            best_model = build_estimator(winner, n_jobs=-1)
+            best_model.fit(X_train_scaled, y_train)
 
-                if r2 > best_score:
-                    best_score = r2
-                    best_model = model
-                    best_name = name
+            y_pred = best_model.predict(X_test_scaled)
+            best_score = r2_score(y_test, y_pred)
+            best_mae = mean_absolute_error(y_test, y_pred)
 
             if best_score > 0.7:  # Próg akceptacji
-                self.model = best_model
-                self.training_date = datetime.now().isoformat()
+                logger.info(f"🏆 Selected {winner['name']} as best model (test R²: {best_score:.4f}, MAE: {best_mae:.2f})")
 
-                logger.info(f"🏆 Selected {best_name} as best model (R²: {best_score:.4f})")
+                # Głowice kwantylowe - przedziały predykcji trenowane razem z modelem punktowym
+                quantile_models, margin, coverage = self.train_quantile_models(X_train_scaled, y_train, X_test_scaled, y_test)
 
-                # Zapisz model
-                self.save_model()
+                # Trening na wszystkich rdzeniach, predykcja w serwisie jednowątkowo (równoległe żądania, wiele procesów)
+                if 'n_jobs' in best_model.get_params():
+                    best_model.set_params(n_jobs=1)
+                model_metrics = {'r2': best_score, 'mae': best_mae, 'cv_r2': winner['r2'], 'samples': len(training_data),
+                                 'interval_margin': margin, 'interval_coverage': coverage}
+
+                # Zapisz model w rejestrze i aktywuj
+                if not self.save_model(best_model, scaler, model_metrics, quantile_models, leaderboard, activate):
+                    return False
 
                 # Wyświetl ważność cech
                 if hasattr(self.model, 'feature_importances_'):
@@ -145,49 +202,64 @@ class PlantGrowthPredictor:
             logger.error(f"❌ Error during model training: {e}")
             return False
 
+    def train_quantile_models(self, X_train, y_train, X_test, y_test):
+        """
+        Głowice GradientBoosting (loss='quantile') dla dolnej i górnej granicy przedziału,
+        skalibrowane konformalnie (CQR) na wydzielonej części zbioru uczącego: margines poszerza
+        przedział tak, by pokrycie odpowiadało nominalnemu. Pokrycie raportowane na zbiorze testowym,
+        którego kalibracja nie widziała. Zwraca (modele, margines, pokrycie na zbiorze testowym).
+        """
+        X_fit, X_calib, y_fit, y_calib = train_test_split(
+            X_train, np.asarray(y_train, dtype=float), test_size=self.CALIBRATION_SIZE, random_state=42
+        )
+
+        quantile_models = {}
+        for key, alpha in zip(('quantile_low', 'quantile_high'), self.INTERVAL_QUANTILES):
+            quantile_models[key] = GradientBoostingRegressor(
+                loss='quantile',
+                alpha=alpha,
+                n_estimators=100,
+                max_depth=5,
+                learning_rate=0.1,
+                random_state=42
+            ).fit(X_fit, y_fit)
+
+        # Kalibracja: kwantyl wyników zgodności na zbiorze kalibracyjnym
+        nominal = self.INTERVAL_QUANTILES[1] - self.INTERVAL_QUANTILES[0]
+        scores = np.maximum(quantile_models['quantile_low'].predict(X_calib) - y_calib,
+                            y_calib - quantile_models['quantile_high'].predict(X_calib))
+        level = min(1.0, np.ceil((len(scores) + 1) * nominal) / len(scores))
+        margin = float(np.quantile(scores, level))
+
+        y_test = np.asarray(y_test, dtype=float)
+        lower = quantile_models['quantile_low'].predict(X_test) - margin
+        upper = quantile_models['quantile_high'].predict(X_test) + margin
+        coverage = float(np.mean((y_test >= lower) & (y_test <= upper)))
+        logger.info(f"📏 Prediction interval margin {margin:.1f}, coverage on test set: {coverage:.2%} (nominal {nominal:.0%})")
+
+        return quantile_models, margin, coverage
+
     def create_fallback_model(self):
         """Stwórz prosty model fallback jeśli główne trenowanie nie powiedzie się"""
         logger.info("🆘 Creating fallback model...")
 
         try:
-            # Minimalne dane treningowe
-            np.random.seed(42)
-            n_samples = 300
-
-            # Podstawowe syntetyczne dane
-            X_data = {}
-            for feature in self.feature_columns:
-                if feature == 'days_since_planting':
-                    X_data[feature] = np.random.randint(1, 120, n_samples)
-                elif feature == 'growth_stage_encoded':
-                    X_data[feature] = np.random.randint(0, 6, n_samples)
-                elif 'ndvi' in feature:
-                    X_data[feature] = np.random.uniform(0.2, 0.9, n_samples)
-                elif 'moisture' in feature:
-                    X_data[feature] = np.random.uniform(0.1, 0.8, n_samples)
-                elif 'temperature' in feature:
-                    X_data[feature] = np.random.uniform(5, 35, n_samples)
-                elif 'fertilizer' in feature:
-                    X_data[feature] = np.random.choice([0, 50, 100, 150], n_samples)
-                else:
-                    X_data[feature] = np.random.uniform(0, 100, n_samples)
-
-            X = pd.DataFrame(X_data)
-
-            # Prosta formuła dla biomasy
-            y = (8000 / (1 + np.exp(-0.08 * (X['days_since_planting'] - 70))) *
-                 (1 + X['avg_ndvi']) * 0.5 +
-                 np.random.normal(0, 200, n_samples))
+            # Minimalne dane treningowe - jeden sezon każdej uprawy
+            training_data = pd.DataFrame(generate_seasons(1, rng=np.random.default_rng(42)))
+            X = training_data[self.feature_columns]
+            y = training_data['biomass_target']
+            n_samples = len(training_data)
 
             # Trenuj prosty model
-            self.scaler.fit(X)
-            X_scaled = self.scaler.transform(X)
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X)
 
-            self.model = RandomForestRegressor(n_estimators=50, random_state=42)
-            self.model.fit(X_scaled, y)
+            model = RandomForestRegressor(n_estimators=50, random_state=42)
+            model.fit(X_scaled, y)
 
-            self.training_date = datetime.now().isoformat()
-            self.save_model()
+            if not self.save_model(model, scaler, {'fallback': True, 'samples': n_samples}):
+                # Bez zapisu model działa tylko w tym procesie
+                self.bundle = self._make_bundle(model, scaler, None)
 
             logger.info("✅ Fallback model created successfully")
             return True
@@ -196,200 +268,13 @@ class PlantGrowthPredictor:
             logger.error(f"❌ Failed to create fallback model: {e}")
             return False
 
-    def generate_comprehensive_training_data(self):
-        """Generuj kompleksowe, realistyczne dane treningowe"""
+    def generate_comprehensive_training_data(self, n_fields=None, rng=None):
+        """Generuj kompleksowe, realistyczne dane treningowe - pełne sezony upraw dla n_fields pól"""
         logger.info("🌱 Generating comprehensive training data...")
-        training_data = []
-
-        # Symuluj 4 sezony różnych upraw
-        crops_config = [
-            {'name': 'wheat', 'cycle': 120, 'max_biomass': 8000, 'growth_rate': 0.08, 'peak_day': 70},
-            {'name': 'corn', 'cycle': 140, 'max_biomass': 12000, 'growth_rate': 0.06, 'peak_day': 90},
-            {'name': 'barley', 'cycle': 100, 'max_biomass': 6000, 'growth_rate': 0.09, 'peak_day': 60},
-            {'name': 'rapeseed', 'cycle': 110, 'max_biomass': 7000, 'growth_rate': 0.07, 'peak_day': 75}
-        ]
-
-        for season in range(len(crops_config)):
-            crop_config = crops_config[season]
-            cycle_days = crop_config['cycle']
-
-            # Różne warunki dla każdego sezonu
-            season_factor = {
-                'temp_offset': [0, 3, -2, 1][season],  # Różne temperatury
-                'moisture_factor': [1.0, 0.8, 1.2, 0.9][season],  # Różna wilgotność
-                'fertility': [1.0, 1.1, 0.9, 1.05][season]  # Różna żyzność
-            }
-
-            for day in range(cycle_days):
-                # Podstawowe parametry czasowe
-                days_since_planting = day
-                growth_stage = self.calculate_growth_stage(day, cycle_days)
-
-                # NDVI z realistyczną krzywą wzrostu
-                base_ndvi = self.calculate_realistic_ndvi(day, cycle_days, crop_config)
-                ndvi_noise = np.random.normal(0, 0.05)
-                avg_ndvi = np.clip(base_ndvi + ndvi_noise, 0.1, 0.95)
-
-                # Wilgotność gleby z sezonowymi wzorcami
-                base_moisture = 0.45 * season_factor['moisture_factor']
-                moisture_cycle = 0.15 * np.sin((day / 7) * 2 * np.pi)  # Tygodniowy cykl
-                rainfall_effect = 0.2 if np.random.random() < 0.25 else 0
-                avg_moisture = np.clip(base_moisture + moisture_cycle + rainfall_effect + np.random.normal(0, 0.08),
-                                       0.05, 0.95)
-
-                # Temperatura z sezonowymi zmianami
-                base_temp = 18 + season_factor['temp_offset'] + 8 * np.sin((day / 365) * 2 * np.pi)
-                daily_variation = np.random.normal(0, 3)
-                avg_temperature = base_temp + daily_variation
-                soil_temperature = avg_temperature - 2 + np.random.normal(0, 1)
-
-                # Opady i nasłonecznienie
-                rainfall = max(0, np.random.exponential(3) if np.random.random() < 0.3 else 0)
-                sunshine_hours = np.clip(8 + 4 * np.sin((day / 365) * 2 * np.pi) + np.random.normal(0, 1.5), 3, 14)
-
-                # Nawożenie w kluczowych momentach
-                fertilizer_n = 120 if day in [10, 35] else (80 if day == 20 else 0)
-                fertilizer_p = 60 if day in [15, 45] else 0
-                fertilizer_k = 80 if day == 25 else 0
-
-                # Parametry fizyczne pola
-                field_size = 5.5 + np.random.normal(0, 1.5)
-                plant_height = self.calculate_realistic_height(day, cycle_days, crop_config)
-                plant_density = 225 + np.random.normal(0, 20)
-
-                # Target - biomasa z realistycznym modelem wzrostu
-                biomass_target = self.calculate_realistic_biomass(
-                    day, crop_config, avg_ndvi, avg_moisture,
-                    avg_temperature, fertilizer_n + fertilizer_p + fertilizer_k,
-                    season_factor['fertility']
-                )
-
-                # Dodaj szum i anomalie
-                if np.random.random() < 0.05:  # 5% szans na anomalię
-                    biomass_target *= np.random.uniform(0.6, 0.8)  # Redukcja biomasy
-                    avg_ndvi *= np.random.uniform(0.7, 0.9)  # Odpowiadające obniżenie NDVI
-
-                # Stwórz próbkę
-                sample = {
-                    'avg_ndvi': float(avg_ndvi),
-                    'min_ndvi': float(max(0.1, avg_ndvi - np.random.uniform(0.1, 0.2))),
-                    'max_ndvi': float(min(0.95, avg_ndvi + np.random.uniform(0.05, 0.15))),
-                    'avg_moisture': float(avg_moisture),
-                    'min_moisture': float(max(0.05, avg_moisture - np.random.uniform(0.1, 0.2))),
-                    'max_moisture': float(min(0.95, avg_moisture + np.random.uniform(0.05, 0.15))),
-                    'avg_temperature': float(avg_temperature),
-                    'soil_temperature': float(soil_temperature),
-                    'rainfall': float(rainfall),
-                    'sunshine_hours': float(sunshine_hours),
-                    'days_since_planting': int(days_since_planting),
-                    'growth_stage_encoded': int(growth_stage),
-                    'fertilizer_nitrogen': float(fertilizer_n),
-                    'fertilizer_phosphorus': float(fertilizer_p),
-                    'fertilizer_potassium': float(fertilizer_k),
-                    'field_size': float(field_size),
-                    'plant_height': float(plant_height),
-                    'plant_density': float(plant_density),
-                    'biomass_target': float(biomass_target)
-                }
-
-                training_data.append(sample)
-
+        training_data = pd.DataFrame(generate_seasons(n_fields or self.TRAINING_FIELDS, rng=rng))
         logger.info(f"✅ Generated {len(training_data)} comprehensive training samples")
         return training_data
 
-    def calculate_growth_stage(self, day, cycle_days):
-        """Oblicz fazę wzrostu na podstawie dnia i długości cyklu"""
-        progress = day / cycle_days
-        if progress < 0.12:
-            return 0  # Kiełkowanie (0-12%)
-        elif progress < 0.25:
-            return 1  # Wczesny wzrost (12-25%)
-        elif progress < 0.50:
-            return 2  # Wzrost wegetatywny (25-50%)
-        elif progress < 0.75:
-            return 3  # Kwitnienie (50-75%)
-        elif progress < 0.90:
-            return 4  # Dojrzewanie (75-90%)
-        else:
-            return 5  # Dojrzałość (90-100%)
-
-    def calculate_realistic_ndvi(self, day, cycle_days, crop_config):
-        """Oblicz realistyczne NDVI na podstawie krzywej wzrostu"""
-        progress = day / cycle_days
-
-        # Krzywa NDVI specyficzna dla uprowy
-        if progress < 0.12:  # Kiełkowanie
-            return 0.20 + progress * 2  # 0.2 -> 0.44
-        elif progress < 0.25:  # Wczesny wzrost
-            return 0.44 + (progress - 0.12) * 1.5  # 0.44 -> 0.64
-        elif progress < 0.65:  # Szczyt wegetatywny
-            peak_ndvi = 0.85 if crop_config['name'] in ['wheat', 'barley'] else 0.90
-            return 0.64 + (progress - 0.25) * (peak_ndvi - 0.64) / 0.4
-        elif progress < 0.85:  # Dojrzewanie
-            peak_ndvi = 0.85 if crop_config['name'] in ['wheat', 'barley'] else 0.90
-            return peak_ndvi - (progress - 0.65) * 0.4  # Spadek
-        else:  # Dojrzałość
-            return 0.45 - (progress - 0.85) * 0.3  # Dalszy spadek
-
-    def calculate_realistic_height(self, day, cycle_days, crop_config):
-        """Oblicz realistyczną wysokość rośliny"""
-        max_heights = {
-            'wheat': 90, 'corn': 200, 'barley': 80, 'rapeseed': 120
-        }
-        max_height = max_heights.get(crop_config['name'], 90)
-
-        # Logistyczna krzywa wzrostu wysokości
-        growth_rate = 0.08
-        inflection_point = cycle_days * 0.6  # 60% cyklu
-
-        height = max_height / (1 + np.exp(-growth_rate * (day - inflection_point)))
-        return max(2, height + np.random.normal(0, max_height * 0.05))
-
-    def calculate_realistic_biomass(self, day, crop_config, ndvi, moisture, temperature, fertilizer_total,
-                                    fertility_factor):
-        """Oblicz realistyczną biomasę z uwzględnieniem wszystkich czynników"""
-        # Bazowa krzywa wzrostu
-        max_biomass = crop_config['max_biomass']
-        growth_rate = crop_config['growth_rate']
-        peak_day = crop_config['peak_day']
-
-        base_biomass = max_biomass / (1 + np.exp(-growth_rate * (day - peak_day)))
-
-        # Modyfikatory środowiskowe
-        ndvi_factor = max(0.3, min(1.5, ndvi * 1.2))  # NDVI wpływa na biomasę
-
-        # Wilgotność - optymalna w zakresie 0.4-0.6
-        if 0.4 <= moisture <= 0.6:
-            moisture_factor = 1.0
-        elif moisture < 0.4:
-            moisture_factor = max(0.5, moisture / 0.4)
-        else:
-            moisture_factor = max(0.7, 1.0 - (moisture - 0.6) * 0.5)
-
-        # Temperatura - optymalna w zakresie 18-25°C
-        if 18 <= temperature <= 25:
-            temp_factor = 1.0
-        elif temperature < 18:
-            temp_factor = max(0.6, 0.8 + (temperature - 15) * 0.04)
-        else:
-            temp_factor = max(0.5, 1.0 - (temperature - 25) * 0.02)
-
-        # Nawożenie - wpływ logarytmiczny
-        fertilizer_factor = 1.0 + np.log(1 + fertilizer_total / 100) * 0.1
-
-        # Czynnik żyzności gleby
-        soil_factor = fertility_factor
-
-        # Oblicz finalną biomasę
-        final_biomass = (base_biomass * ndvi_factor * moisture_factor *
-                         temp_factor * fertilizer_factor * soil_factor)
-
-        # Dodaj naturalną zmienność
-        variation = np.random.normal(1.0, 0.08)
-        final_biomass *= variation
-
-        return max(50, final_biomass)  # Minimalna biomasa 50 kg/ha
-
     def log_feature_importance(self):
         """Wyloguj ważność cech modelu"""
         if hasattr(self.model, 'feature_importances_'):
@@ -403,127 +288,55 @@ class PlantGrowthPredictor:
                 logger.info(f"   {row['feature']}: {row['importance']:.4f}")
 
     def prepare_features(self, field_data, field_info):
-        """Przygotowanie cech do predykcji z danych pola"""
+        """Przygotowanie cech do predykcji z danych pola (lista odczytów lub FieldData)"""
+        field_data = decode_field_data(field_data)
         features = {}
 
         # NDVI features z ostatnich 7 dni
-        ndvi_data = [item for item in field_data if item.get('data_type') == 'ndvi']
-        if ndvi_data:
-            all_ndvi = []
-            for item in ndvi_data[-7:]:  # Ostatnie 7 dni
-                data = item.get('data', {})
-                if isinstance(data, str):
-                    try:
-                        data = json.loads(data)
-                    except:
-                        continue
-                ndvi_values = data.get('ndvi_values', [])
-                all_ndvi.extend(ndvi_values)
-
-            if all_ndvi:
-                features['avg_ndvi'] = np.mean(all_ndvi)
-                features['min_ndvi'] = np.min(all_ndvi)
-                features['max_ndvi'] = np.max(all_ndvi)
-            else:
-                features.update({'avg_ndvi': 0.5, 'min_ndvi': 0.3, 'max_ndvi': 0.7})
+        all_ndvi = field_data.series('ndvi').tail('ndvi_values', 7)
+        if all_ndvi.size:
+            features['avg_ndvi'] = all_ndvi.mean()
+            features['min_ndvi'] = all_ndvi.min()
+            features['max_ndvi'] = all_ndvi.max()
         else:
             features.update({'avg_ndvi': 0.5, 'min_ndvi': 0.3, 'max_ndvi': 0.7})
 
         # Soil moisture features z ostatnich 7 dni
-        moisture_data = [item for item in field_data if item.get('data_type') == 'soil_moisture']
-        if moisture_data:
-            all_moisture = []
-            for item in moisture_data[-7:]:
-                data = item.get('data', {})
-                if isinstance(data, str):
-                    try:
-                        data = json.loads(data)
-                    except:
-                        continue
-                moisture_values = data.get('moisture_values', [])
-                all_moisture.extend(moisture_values)
-
-            if all_moisture:
-                features['avg_moisture'] = np.mean(all_moisture)
-                features['min_moisture'] = np.min(all_moisture)
-                features['max_moisture'] = np.max(all_moisture)
-            else:
-                features.update({'avg_moisture': 0.45, 'min_moisture': 0.25, 'max_moisture': 0.65})
+        all_moisture = field_data.series('soil_moisture').tail('moisture_values', 7)
+        if all_moisture.size:
+            features['avg_moisture'] = all_moisture.mean()
+            features['min_moisture'] = all_moisture.min()
+            features['max_moisture'] = all_moisture.max()
         else:
             features.update({'avg_moisture': 0.45, 'min_moisture': 0.25, 'max_moisture': 0.65})
 
         # Weather features z ostatnich 3 dni
-        weather_data = [item for item in field_data if item.get('data_type') == 'weather']
-        if weather_data:
-            recent_weather = weather_data[-3:]
-            temps = []
-            rainfall_total = 0
-
-            for item in recent_weather:
-                data = item.get('data', {})
-                if isinstance(data, str):
-                    try:
-                        data = json.loads(data)
-                    except:
-                        continue
-                temps.append(data.get('temperature_avg', 20))
-                rainfall_total += data.get('rainfall', 0)
-
-            features['avg_temperature'] = np.mean(temps) if temps else 20
-            features['rainfall'] = rainfall_total
+        weather = field_data.series('weather')
+        if weather:
+            features['avg_temperature'] = float(weather.scalars('temperature_avg', 20)[-3:].mean())
+            features['rainfall'] = float(weather.scalars('rainfall', 0)[-3:].sum())
         else:
             features['avg_temperature'] = 20
             features['rainfall'] = 0
 
         # Soil temperature
-        soil_temp_data = [item for item in field_data if item.get('data_type') == 'soil_temperature']
-        if soil_temp_data:
-            recent_temp = soil_temp_data[-1]
-            data = recent_temp.get('data', {})
-            if isinstance(data, str):
-                try:
-                    data = json.loads(data)
-                except:
-                    data = {}
-            features['soil_temperature'] = data.get('avg_temperature', 16)
-        else:
-            features['soil_temperature'] = 16
+        soil_temperature = field_data.series('soil_temperature')
+        features['soil_temperature'] = soil_temperature.latest().get('avg_temperature', 16) if soil_temperature else 16
 
         # Sunlight z ostatnich 3 dni
-        sunlight_data = [item for item in field_data if item.get('data_type') == 'sunlight']
-        if sunlight_data:
-            recent_sun = sunlight_data[-3:]
-            sun_hours = []
-            for item in recent_sun:
-                data = item.get('data', {})
-                if isinstance(data, str):
-                    try:
-                        data = json.loads(data)
-                    except:
-                        continue
-                sun_hours.append(data.get('sunshine_hours', 8))
-            features['sunshine_hours'] = np.mean(sun_hours) if sun_hours else 8
-        else:
-            features['sunshine_hours'] = 8
+        sunlight = field_data.series('sunlight')
+        features['sunshine_hours'] = float(sunlight.scalars('sunshine_hours', 8)[-3:].mean()) if sunlight else 8
 
         # Time and growth stage features
         features['days_since_planting'] = self._calculate_days_since_planting(field_info)
         features['growth_stage_encoded'] = self._determine_growth_stage(features['days_since_planting'])
 
         # Fertilizer features z ostatnich 30 dni
-        fertilizer_data = [item for item in field_data if item.get('data_type') == 'fertilizer_application']
         features['fertilizer_nitrogen'] = 0
         features['fertilizer_phosphorus'] = 0
         features['fertilizer_potassium'] = 0
 
-        for item in fertilizer_data:
-            data = item.get('data', {})
-            if isinstance(data, str):
-                try:
-                    data = json.loads(data)
-                except:
-                    continue
-
+        for data in field_data.series('fertilizer_application').data:
             fert_type = data.get('fertilizer_type', '').lower()
             amount = data.get('amount_per_hectare', 0)
 
@@ -538,16 +351,9 @@ class PlantGrowthPredictor:
         features['field_size'] = field_info.get('size', 5.5)
 
         # Plant features z ostatnich pomiarów biomasy
-        biomass_data = [item for item in field_data if item.get('data_type') == 'biomass_measurement']
-        if biomass_data:
-            latest_biomass = biomass_data[-1]
-            data = latest_biomass.get('data', {})
-            if isinstance(data, str):
-                try:
-                    data = json.loads(data)
-                except:
-                    data = {}
-
+        biomass = field_data.series('biomass_measurement')
+        if biomass:
+            data = biomass.latest()
             features['plant_height'] = data.get('plant_height_cm', 50)
             features['plant_density'] = data.get('plant_density_per_m2', 225)
         else:
@@ -557,100 +363,369 @@ class PlantGrowthPredictor:
 
         return features
 
-    def predict_growth(self, field_data, field_info, days_ahead=7):
-        """Główna funkcja predykcji wzrostu roślin"""
-        if not self.model:
-            return {'error': 'Prediction model not available'}
+    def prepare_stored_features(self, stored_features, field_info):
+        """Cechy z magazynu cech uzupełnione o cechy czasowe i pola (jak w prepare_features)"""
+        features = dict(stored_features)
+
+        features['days_since_planting'] = self._calculate_days_since_planting(field_info)
+        features['growth_stage_encoded'] = self._determine_growth_stage(features['days_since_planting'])
+        features['field_size'] = field_info.get('size', 5.5)
+
+        if features.get('plant_height') is None:
+            features['plant_height'] = self._estimate_height(features['days_since_planting'])
+
+        return features
+
+    def predict_growth(self, field_data, field_info, days_ahead=7, seed=None):
+        """Główna funkcja predykcji wzrostu roślin (seed=None - seed wyliczany z danych żądania)"""
+        # Migawka modelu - podmiana wersji w trakcie nie wpływa na to żądanie
+        bundle = self.bundle
+        if not bundle:
+            return self._not_ready_error()
 
         try:
-            current_features = self.prepare_features(field_data, field_info)
-            current_biomass = self._estimate_current_biomass(current_features)
-
-            predictions = []
-
-            for day in range(1, days_ahead + 1):
-                # Przygotuj cechy dla przyszłego dnia
-                future_features = current_features.copy()
-                future_features['days_since_planting'] += day
-                future_features['growth_stage_encoded'] = self._determine_growth_stage(
-                    future_features['days_since_planting']
-                )
-
-                # Oszacuj zmiany pogodowe (uproszczone prognozy)
-                future_features['avg_temperature'] += np.random.normal(0, 2)
-                future_features['rainfall'] = max(0, np.random.exponential(2) if np.random.random() < 0.2 else 0)
-                future_features['sunshine_hours'] = max(4, min(12,
-                                                               future_features['sunshine_hours'] + np.random.normal(0,
-                                                                                                                    1)))
-
-                # Oszacuj zmiany NDVI i wilgotności
-                ndvi_change = 0.002 if future_features['growth_stage_encoded'] <= 3 else -0.005
-                future_features['avg_ndvi'] = np.clip(
-                    future_features['avg_ndvi'] + ndvi_change, 0.1, 0.95)
-
-                moisture_change = 0.02 if future_features['rainfall'] > 5 else -0.01
-                future_features['avg_moisture'] = np.clip(
-                    future_features['avg_moisture'] + moisture_change, 0.1, 0.9)
-
-                # Przewiduj biomasę
-                try:
-                    feature_array = np.array([future_features[col] for col in self.feature_columns]).reshape(1, -1)
-                    feature_array_scaled = self.scaler.transform(feature_array)
-                    predicted_biomass = self.model.predict(feature_array_scaled)[0]
-                except Exception as e:
-                    logger.warning(f"Prediction error for day {day}: {e}")
-                    # Fallback prediction
-                    predicted_biomass = current_biomass * (1 + 0.015 * day)
-
-                # Oblicz tempo wzrostu
-                previous_biomass = predictions[-1]['predicted_biomass'] if predictions else current_biomass
-                growth_rate = predicted_biomass - previous_biomass
-
-                predictions.append({
-                    'day': day,
-                    'date': (datetime.now() + timedelta(days=day)).strftime('%Y-%m-%d'),
-                    'predicted_biomass': float(max(current_biomass, predicted_biomass)),
-                    'growth_rate': float(growth_rate),
-                    'confidence': self._calculate_confidence(current_features, day),
-                    'growth_stage': self._get_growth_stage_name(future_features['growth_stage_encoded']),
-                    'estimated_ndvi': float(future_features['avg_ndvi']),
-                    'estimated_moisture': float(future_features['avg_moisture'])
-                })
+            with stage_timer('growth_features'):
+                current_features = self.prepare_features(field_data, field_info)
+            rng = self._forecast_rng(current_features, days_ahead, seed)
+            return self._predict_from_features(current_features, days_ahead, bundle, rng)
 
-            # Przygotuj kompletną odpowiedź
-            result = {
-                'current_status': self._assess_current_status(current_features),
-                'current_biomass': float(current_biomass),
-                'predictions': predictions,
-                'recommendations': self._generate_growth_recommendations(predictions, current_features),
-                'summary': self._generate_prediction_summary(predictions, current_features),
-                'model_info': {
-                    'model_type': type(self.model).__name__,
-                    'features_used': len(self.feature_columns),
-                    'training_date': self.training_date,
-                    'version': self.model_version
-                }
-            }
+        except Exception as e:
+            logger.error(f"Prediction failed: {e}")
+            return {'error': f'Prediction failed: {str(e)}'}
+
+    def predict_from_features(self, current_features, days_ahead=7, seed=None):
+        """Predykcja wzrostu z gotowych cech (np. z magazynu cech - bez historii odczytów)"""
+        bundle = self.bundle
+        if not bundle:
+            return self._not_ready_error()
 
-            return result
+        try:
+            rng = self._forecast_rng(current_features, days_ahead, seed)
+            return self._predict_from_features(current_features, days_ahead, bundle, rng)
 
         except Exception as e:
             logger.error(f"Prediction failed: {e}")
             return {'error': f'Prediction failed: {str(e)}'}
 
-    def _estimate_current_biomass(self, features):
-        """Oszacuj obecną biomasę na podstawie cech"""
+    def _predict_from_features(self, current_features, days_ahead, bundle, rng):
+        """Symulacja horyzontu, ocena modelem i złożenie odpowiedzi"""
+        horizon = self._simulate_horizon(current_features, days_ahead, rng)
+
+        # Cały horyzont (stan obecny + dni przyszłe) oceniany jednym wywołaniem modelu
+        intervals = None
         try:
-            feature_array = np.array([features[col] for col in self.feature_columns]).reshape(1, -1)
-            feature_array_scaled = self.scaler.transform(feature_array)
-            predicted_biomass = self.model.predict(feature_array_scaled)[0]
-            return max(100, predicted_biomass)
+            feature_matrix = self._horizon_matrix(current_features, horizon)
+            with stage_timer('model_predict'):
+                predicted, intervals = self._score_matrix(feature_matrix, bundle)
+            current_biomass = max(100, predicted[0])
+            future_biomass = predicted[1:]
+            if intervals is not None:
+                intervals = intervals[:, 1:]
+        except Exception as e:
+            logger.warning(f"Horizon prediction error: {e}")
+            current_biomass, future_biomass = self._fallback_horizon_biomass(current_features, days_ahead)
+
+        predictions = self._collect_predictions(current_features, current_biomass, horizon, future_biomass, intervals)
+
+        return self._build_growth_result(current_features, current_biomass, predictions, bundle)
+
+    def predict_growth_scenarios(self, field_data, field_info, days_ahead=7, n_scenarios=1000, seed=None):
+        """Prognoza scenariuszowa (Monte-Carlo) - pasma p10/p50/p90 biomasy i tempa wzrostu"""
+        bundle = self.bundle
+        if not bundle:
+            return self._not_ready_error()
+
+        try:
+            with stage_timer('growth_features'):
+                current_features = self.prepare_features(field_data, field_info)
+            rng = self._forecast_rng(current_features, days_ahead, seed)
+            return self._scenarios_from_features(current_features, days_ahead, n_scenarios, bundle, rng)
+
         except Exception as e:
-            logger.warning(f"Current biomass estimation failed: {e}")
-            # Fallback calculation
-            base_biomass = 8000 / (1 + np.exp(-0.08 * (features['days_since_planting'] - 70)))
-            ndvi_factor = max(0.5, features['avg_ndvi'])
-            return base_biomass * ndvi_factor
+            logger.error(f"Scenario prediction failed: {e}")
+            return {'error': f'Scenario prediction failed: {str(e)}'}
+
+    def predict_scenarios_from_features(self, current_features, days_ahead=7, n_scenarios=1000, seed=None):
+        """Prognoza scenariuszowa z gotowych cech (np. z magazynu cech)"""
+        bundle = self.bundle
+        if not bundle:
+            return self._not_ready_error()
+
+        try:
+            rng = self._forecast_rng(current_features, days_ahead, seed)
+            return self._scenarios_from_features(current_features, days_ahead, n_scenarios, bundle, rng)
+
+        except Exception as e:
+            logger.error(f"Scenario prediction failed: {e}")
+            return {'error': f'Scenario prediction failed: {str(e)}'}
+
+    def _scenarios_from_features(self, current_features, days_ahead, n_scenarios, bundle, rng):
+        """
+        N trajektorii pogody/NDVI/wilgotności jako tablice (N x days_ahead), ocenione
+        jednym wywołaniem model.predict na macierzy (N * days_ahead + 1) x cechy.
+        """
+        n_scenarios = int(max(1, min(n_scenarios, self.MAX_SCENARIOS)))
+        horizon = self._simulate_horizon(current_features, days_ahead, rng, n_scenarios)
+
+        feature_matrix = self._horizon_matrix(current_features, horizon)
+        with stage_timer('model_predict'):
+            predicted = bundle['model'].predict(bundle['scaler'].transform(feature_matrix))
+        current_biomass = max(100, predicted[0])
+        future_biomass = predicted[1:].reshape(n_scenarios, days_ahead)
+
+        # Tempo wzrostu liczone jak w _collect_predictions - względem poprzedniego dnia (nie mniej niż stan obecny)
+        biomass = np.maximum(current_biomass, future_biomass)
+        previous = np.concatenate([np.full((n_scenarios, 1), current_biomass), biomass[:, :-1]], axis=1)
+        growth_rate = future_biomass - previous
+
+        biomass_bands = np.percentile(biomass, self.SCENARIO_PERCENTILES, axis=0)
+        growth_bands = np.percentile(growth_rate, self.SCENARIO_PERCENTILES, axis=0)
+        labels = [f'p{p}' for p in self.SCENARIO_PERCENTILES]
+
+        bands = []
+        for i in range(days_ahead):
+            day = i + 1
+            bands.append({
+                'day': day,
+                'date': (datetime.now() + timedelta(days=day)).strftime('%Y-%m-%d'),
+                'biomass': {label: float(value) for label, value in zip(labels, biomass_bands[:, i])},
+                'growth_rate': {label: float(value) for label, value in zip(labels, growth_bands[:, i])}
+            })
+
+        return {
+            'scenarios': n_scenarios,
+            'current_biomass': float(current_biomass),
+            'bands': bands,
+            'model_info': {
+                'model_type': type(bundle['model']).__name__,
+                'version': bundle['model_version']
+            }
+        }
+
+    def predict_growth_batch(self, fields, days_ahead=7, seed=None):
+        """
+        Predykcja wzrostu dla wielu pól naraz.
+        Macierze horyzontu wszystkich pól są składane w jedną macierz
+        i oceniane jednym wywołaniem scaler.transform / model.predict.
+        `fields` to lista par (field_data, field_info) - wyniki w tej samej kolejności.
+        Każde pole ma własny generator - wynik pola nie zależy od reszty partii.
+        """
+        bundle = self.bundle
+        if not bundle:
+            return [self._not_ready_error() for _ in fields]
+
+        prepared = []
+        matrices = []
+
+        for field_data, field_info in fields:
+            try:
+                with stage_timer('growth_features'):
+                    current_features = self.prepare_features(field_data, field_info)
+                rng = self._forecast_rng(current_features, days_ahead, seed)
+                horizon = self._simulate_horizon(current_features, days_ahead, rng)
+                matrices.append(self._horizon_matrix(current_features, horizon))
+            except Exception as e:
+                logger.error(f"Batch feature preparation failed: {e}")
+                prepared.append(e)
+                continue
+
+            prepared.append((current_features, horizon))
+
+        predicted = None
+        intervals = None
+        if matrices:
+            try:
+                with stage_timer('model_predict'):
+                    predicted, intervals = self._score_matrix(np.vstack(matrices), bundle)
+            except Exception as e:
+                logger.warning(f"Batch prediction error: {e}")
+
+        results = []
+        offset = 0
+        for item in prepared:
+            if isinstance(item, Exception):
+                results.append({'error': f'Prediction failed: {str(item)}'})
+                continue
+
+            current_features, horizon = item
+            field_intervals = None
+            if predicted is not None:
+                current_biomass = max(100, predicted[offset])
+                future_biomass = predicted[offset + 1:offset + 1 + days_ahead]
+                if intervals is not None:
+                    field_intervals = intervals[:, offset + 1:offset + 1 + days_ahead]
+            else:
+                current_biomass, future_biomass = self._fallback_horizon_biomass(current_features, days_ahead)
+            offset += days_ahead + 1
+
+            predictions = self._collect_predictions(current_features, current_biomass, horizon, future_biomass, field_intervals)
+            results.append(self._build_growth_result(current_features, current_biomass, predictions, bundle))
+
+        return results
+
+    def _not_ready_error(self):
+        """Szybka odpowiedź gdy model nie jest jeszcze gotowy (np. trwa trening w tle)"""
+        if self.status in ('loading', 'training'):
+            return {'error': f'Prediction model not ready ({self.status})', 'model_status': self.status}
+        return {'error': 'Prediction model not available', 'model_status': self.status}
+
+    def _score_matrix(self, feature_matrix, bundle):
+        """
+        Predykcja punktowa i przedział (2 x wiersze: dolna, górna granica) dla macierzy cech.
+        Przedział z głowic kwantylowych wersji modelu, a bez nich z rozrzutu drzew lasu
+        (jedno przejście po estimators_ zastępuje model.predict - średnia drzew to predykcja lasu).
+        """
+        X = bundle['scaler'].transform(feature_matrix)
+        quantile_models = bundle['quantile_models']
+
+        if quantile_models:
+            predicted = bundle['model'].predict(X)
+            margin = bundle['metrics'].get('interval_margin', 0.0)
+            intervals = np.vstack([quantile_models['quantile_low'].predict(X) - margin,
+                                   quantile_models['quantile_high'].predict(X) + margin])
+        elif isinstance(bundle['model'], RandomForestRegressor):
+            per_tree = tree_predictions(bundle['model'], X)
+            predicted = per_tree.mean(axis=0)
+            intervals = np.quantile(per_tree, self.INTERVAL_QUANTILES, axis=0)
+        else:
+            return bundle['model'].predict(X), None
+
+        # Głowice trenowane niezależnie - przedział zawsze obejmuje predykcję punktową
+        intervals = np.vstack([np.minimum(intervals[0], predicted), np.maximum(intervals[1], predicted)])
+        return predicted, intervals
+
+    def _interval_method(self, bundle):
+        if bundle['quantile_models']:
+            return 'quantile_gradient_boosting'
+        if isinstance(bundle['model'], RandomForestRegressor):
+            return 'forest_tree_spread'
+        return None
+
+    def _feature_row(self, features):
+        """Wiersz cech w kolejności feature_columns"""
+        return [features[col] for col in self.feature_columns]
+
+    def _forecast_rng(self, current_features, days_ahead, seed=None):
+        """
+        Generator losowy per żądanie - bez globalnego stanu np.random (bezpieczny dla wątków).
+        Bez podanego seed wyliczany z cech i horyzontu - te same dane dają tę samą prognozę.
+        """
+        if seed is None:
+            payload = json.dumps([self._feature_row(current_features), days_ahead], default=float)
+            seed = int.from_bytes(hashlib.sha256(payload.encode('utf-8')).digest()[:8], 'little')
+        return np.random.default_rng(seed)
+
+    def _simulate_horizon(self, current_features, days_ahead, rng, n_scenarios=None):
+        """
+        Oszacuj cechy dla kolejnych dni horyzontu - wszystkie dni naraz jako tablice.
+        Zwraca słownik cecha -> tablica długości days_ahead (tylko cechy zmienne w czasie).
+        Z n_scenarios cechy losowe mają kształt (n_scenarios, days_ahead), a NDVI i wilgotność
+        dodatkowo błądzą losowo wokół trendu.
+        """
+        days = np.arange(1, days_ahead + 1)
+        shape = days_ahead if n_scenarios is None else (n_scenarios, days_ahead)
+
+        days_since_planting = current_features['days_since_planting'] + days
+        growth_stage = np.searchsorted(self.GROWTH_STAGE_BOUNDS, days_since_planting, side='right')
+
+        # Oszacuj zmiany pogodowe (uproszczone prognozy)
+        avg_temperature = current_features['avg_temperature'] + rng.normal(0, 2, shape)
+        rain_event = rng.random(shape) < 0.2
+        rainfall = np.where(rain_event, rng.exponential(2, shape), 0.0)
+        sunshine_hours = np.clip(current_features['sunshine_hours'] + rng.normal(0, 1, shape), 4, 12)
+
+        # Oszacuj zmiany NDVI i wilgotności
+        ndvi_change = np.where(growth_stage <= 3, 0.002, -0.005)
+        moisture_change = np.where(rainfall > 5, 0.02, -0.01)
+        if n_scenarios is not None:
+            ndvi_change = ndvi_change + np.cumsum(rng.normal(0, 0.01, shape), axis=1)
+            moisture_change = moisture_change + np.cumsum(rng.normal(0, 0.015, shape), axis=1)
+
+        avg_ndvi = np.clip(current_features['avg_ndvi'] + ndvi_change, 0.1, 0.95)
+        avg_moisture = np.clip(current_features['avg_moisture'] + moisture_change, 0.1, 0.9)
+
+        return {
+            'days_since_planting': days_since_planting,
+            'growth_stage_encoded': growth_stage,
+            'avg_temperature': avg_temperature,
+            'rainfall': rainfall,
+            'sunshine_hours': sunshine_hours,
+            'avg_ndvi': avg_ndvi,
+            'avg_moisture': avg_moisture
+        }
+
+    def _horizon_matrix(self, current_features, horizon):
+        """
+        Macierz (days_ahead + 1) x cechy: wiersz 0 to stan obecny, kolejne to dni horyzontu.
+        Dla scenariuszy (cechy N x days_ahead) dni kolejnych scenariuszy leżą jeden po drugim.
+        """
+        shape = np.shape(horizon['rainfall'])
+        matrix = np.tile(np.array(self._feature_row(current_features), dtype=float), (int(np.prod(shape)) + 1, 1))
+
+        for feature, values in horizon.items():
+            matrix[1:, self.feature_columns.index(feature)] = np.broadcast_to(values, shape).ravel()
+
+        return matrix
+
+    def _fallback_horizon_biomass(self, current_features, days_ahead):
+        """Fallback prediction dla całego horyzontu"""
+        current_biomass = self._fallback_current_biomass(current_features)
+        future_biomass = current_biomass * (1 + 0.015 * np.arange(1, days_ahead + 1))
+        return current_biomass, future_biomass
+
+    def _collect_predictions(self, current_features, current_biomass, horizon, future_biomass, intervals=None):
+        """Złóż listę dziennych predykcji z przewidzianych wartości biomasy (i przedziałów, jeśli są)"""
+        predictions = []
+
+        for i, predicted_biomass in enumerate(future_biomass):
+            day = i + 1
+
+            # Oblicz tempo wzrostu
+            previous_biomass = predictions[-1]['predicted_biomass'] if predictions else current_biomass
+            growth_rate = predicted_biomass - previous_biomass
+
+            predictions.append({
+                'day': day,
+                'date': (datetime.now() + timedelta(days=day)).strftime('%Y-%m-%d'),
+                'predicted_biomass': float(max(current_biomass, predicted_biomass)),
+                'growth_rate': float(growth_rate),
+                'confidence': self._calculate_confidence(current_features, day),
+                'growth_stage': self._get_growth_stage_name(int(horizon['growth_stage_encoded'][i])),
+                'estimated_ndvi': float(horizon['avg_ndvi'][i]),
+                'estimated_moisture': float(horizon['avg_moisture'][i])
+            })
+
+            if intervals is not None:
+                predictions[-1]['prediction_interval'] = {
+                    'lower': float(max(current_biomass, intervals[0, i])),
+                    'upper': float(max(current_biomass, intervals[1, i])),
+                    'quantiles': list(self.INTERVAL_QUANTILES)
+                }
+
+        return predictions
+
+    def _build_growth_result(self, current_features, current_biomass, predictions, bundle):
+        """Przygotuj kompletną odpowiedź"""
+        return {
+            'current_status': self._assess_current_status(current_features),
+            'current_biomass': float(current_biomass),
+            'predictions': predictions,
+            'recommendations': self._generate_growth_recommendations(predictions, current_features),
+            'summary': self._generate_prediction_summary(predictions, current_features),
+            'model_info': {
+                'model_type': type(bundle['model']).__name__,
+                'features_used': len(self.feature_columns),
+                'training_date': bundle['training_date'],
+                'version': bundle['model_version'],
+                'interval_method': self._interval_method(bundle)
+            }
+        }
+
+    def _fallback_current_biomass(self, features):
+        """Fallback calculation obecnej biomasy"""
+        base_biomass = 8000 / (1 + np.exp(-0.08 * (features['days_since_planting'] - 70)))
+        ndvi_factor = max(0.5, features['avg_ndvi'])
+        return base_biomass * ndvi_factor
 
     def _calculate_days_since_planting(self, field_info):
         """Oblicz dni od sadzenia"""
@@ -975,62 +1050,91 @@ class PlantGrowthPredictor:
 
         return max(0.4, min(0.95, final_confidence))
 
-    def save_model(self):
-        """Zapisz wytrenowany model"""
-        if not self.model:
-            logger.warning("No model to save")
-            return False
+    def _make_bundle(self, model, scaler, manifest, quantile_models=None):
+        manifest = manifest or {}
+        return {
+            'model': model,
+            'scaler': scaler,
+            'quantile_models': quantile_models or {},
+            'training_date': manifest.get('training_date', datetime.now().isoformat()),
+            'model_version': manifest.get('version'),
+            'metrics': manifest.get('metrics', {})
+        }
 
+    def save_model(self, model, scaler, model_metrics=None, quantile_models=None, leaderboard=None, activate=True):
+        """Zapisz wytrenowany model (z opcjonalnymi głowicami kwantylowymi) jako nową wersję w rejestrze i aktywuj ją"""
         try:
-            model_data = {
-                'model': self.model,
-                'scaler': self.scaler,
+            version = self.registry.publish({'model': model, 'scaler': scaler, **(quantile_models or {})}, {
                 'feature_columns': self.feature_columns,
-                'training_date': self.training_date or datetime.now().isoformat(),
-                'model_version': self.model_version,
-                'model_type': type(self.model).__name__
-            }
-
-            # Stwórz katalog jeśli nie istnieje
-            os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-
-            # Zapisz model
-            joblib.dump(model_data, self.model_path)
-            logger.info(f"✅ Model saved successfully to {self.model_path}")
+                'training_date': datetime.now().isoformat(),
+                'model_type': type(model).__name__,
+                'interval_quantiles': list(self.INTERVAL_QUANTILES) if quantile_models else None,
+                'metrics': model_metrics or {},
+                'leaderboard': leaderboard or []
+            }, activate=activate)
+
+            self.bundle = self._make_bundle(model, scaler, self.registry.manifest(version), quantile_models)
+            logger.info(f"✅ Model saved successfully as version {version}")
             return True
 
         except Exception as e:
             logger.error(f"❌ Error saving model: {e}")
             return False
 
-    def load_model(self):
-        """Wczytaj zapisany model"""
+    def load_model(self, version=None):
+        """Wczytaj wersję modelu z rejestru (domyślnie aktywną) i podmień ją atomowo"""
+        started = time.perf_counter()
         try:
-            if not os.path.exists(self.model_path):
-                raise FileNotFoundError(f"Model file not found: {self.model_path}")
+            self._import_legacy_model()
+
+            loaded = self.registry.load(version)
+            if loaded is None:
+                logger.info("No growth model version in registry")
+                return False
 
-            model_data = joblib.load(self.model_path)
+            manifest, artifacts = loaded
+            if manifest['feature_columns'] != self.feature_columns:
+                raise ValueError(f"Model version {manifest['version']} has incompatible feature columns")
 
-            self.model = model_data['model']
-            self.scaler = model_data['scaler']
-            self.feature_columns = model_data['feature_columns']
-            self.training_date = model_data.get('training_date', 'unknown')
-            self.model_version = model_data.get('model_version', '1.0')
+            quantile_models = {key: artifacts[key] for key in ('quantile_low', 'quantile_high') if key in artifacts}
+            self.bundle = self._make_bundle(artifacts['model'], artifacts['scaler'], manifest, quantile_models)
+            self.status = 'loaded'
+            metrics.observe('ai_model_load_seconds', time.perf_counter() - started, model=self.registry.name)
 
-            logger.info(f"✅ Model loaded: {model_data.get('model_type', 'Unknown')} trained on {self.training_date}")
+            logger.info(f"✅ Model loaded: {manifest.get('model_type', 'Unknown')} version {manifest['version']} trained on {self.training_date}")
             return True
 
         except Exception as e:
             logger.error(f"❌ Error loading model: {e}")
             return False
 
+    def _import_legacy_model(self):
+        """Jednorazowe przeniesienie starego growth_model.pkl do pustego rejestru"""
+        legacy_path = os.path.join(Config.MODEL_PATH, 'growth_model.pkl')
+        if self.registry.active_version() or not os.path.exists(legacy_path):
+            return
+
+        model_data = joblib.load(legacy_path)
+        self.registry.publish({'model': model_data['model'], 'scaler': model_data['scaler']}, {
+            'feature_columns': model_data['feature_columns'],
+            'training_date': model_data.get('training_date', 'unknown'),
+            'model_type': model_data.get('model_type', type(model_data['model']).__name__),
+            'metrics': {},
+            'imported_from': legacy_path
+        })
+        logger.info(f"📦 Imported legacy model {legacy_path} into registry")
+
     def get_model_info(self):
         """Informacje o modelu"""
         return {
             'model_loaded': self.model is not None,
+            'model_status': self.status,
             'model_type': type(self.model).__name__ if self.model else None,
             'training_date': self.training_date,
             'version': self.model_version,
+            'metrics': self.bundle['metrics'] if self.bundle else {},
+            'interval_method': self._interval_method(self.bundle) if self.bundle else None,
             'features_count': len(self.feature_columns),
-            'model_path': self.model_path
+            'registry_path': self.registry.path,
+            'active_version': self.registry.active_version()
         }
@@ -0,0 +1,396 @@
+import numpy as np
+import heapq
+import os
+import logging
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def open_raster(path, rows=None, cols=None, dtype='float32'):
+    """
+    Otwórz raster NDVI jako memory-map (bez wczytywania do pamięci).
+    Ścieżka względna wobec Config.DATA_PATH; pliki .npy niosą własny kształt,
+    surowe pliki wymagają rows/cols i dtype.
+    """
+    base = os.path.realpath(Config.DATA_PATH)
+    full_path = os.path.realpath(os.path.join(base, path))
+
+    if not full_path.startswith(base + os.sep):
+        raise ValueError(f"Raster path outside data directory: {path}")
+    if not os.path.exists(full_path):
+        raise FileNotFoundError(f"Raster file not found: {path}")
+
+    if full_path.endswith('.npy'):
+        raster = np.load(full_path, mmap_mode='r')
+    else:
+        if not rows or not cols:
+            raise ValueError("rows and cols are required for raw raster files")
+        raster = np.memmap(full_path, dtype=dtype, mode='r', shape=(int(rows), int(cols)))
+
+    if raster.ndim != 2:
+        raise ValueError(f"Raster must be 2-dimensional, got shape {raster.shape}")
+
+    return raster
+
+
+def iter_tiles(shape, tile_size, halo=0):
+    """
+    Kafelki rastra: (tile_row, tile_col, core, padded, inner)
+    core - zakres kafelka w rastrze, padded - zakres z marginesem halo (przycięty do rastra),
+    inner - położenie core wewnątrz padded.
+    """
+    rows, cols = shape
+    for tile_row, r0 in enumerate(range(0, rows, tile_size)):
+        r1 = min(r0 + tile_size, rows)
+        pr0, pr1 = max(0, r0 - halo), min(rows, r1 + halo)
+
+        for tile_col, c0 in enumerate(range(0, cols, tile_size)):
+            c1 = min(c0 + tile_size, cols)
+            pc0, pc1 = max(0, c0 - halo), min(cols, c1 + halo)
+
+            yield (
+                tile_row, tile_col,
+                (slice(r0, r1), slice(c0, c1)),
+                (slice(pr0, pr1), slice(pc0, pc1)),
+                (slice(r0 - pr0, r1 - pr0), slice(c0 - pc0, c1 - pc0))
+            )
+
+
+class RunningStats:
+    """Łączalne statystyki (count/mean/M2/min/max) - algorytm Chana dla kolejnych kafelków; NaN (brak danych) pomijane"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = finite_values(values)
+        n = values.size
+        if n == 0:
+            return
+
+        mean = values.mean()
+        m2 = np.sum((values - mean) ** 2)
+
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.count) if self.count else 0.0
+
+
+def finite_values(values):
+    """Spłaszczone wartości bez NaN/inf (piksele bez danych)"""
+    values = np.asarray(values, dtype=float).ravel()
+    return values[np.isfinite(values)]
+
+
+def _bin_index(values, lo, hi, bins):
+    """Kubełek wartości w [lo, hi] podzielonym na bins (poza zakresem - skrajne kubełki); monotoniczny względem wartości"""
+    if hi <= lo:
+        return np.zeros(values.size, dtype=np.int64)
+    idx = np.floor((values - lo) / (hi - lo) * bins).astype(np.int64)
+    return np.clip(idx, 0, bins - 1)
+
+
+class HistogramQuantiles:
+    """
+    Dokładne kwantyle (jak np.percentile, interpolacja liniowa) w kilku przebiegach po danych:
+    1) add - histogram wartości, 2+) collect + resolve - okna (kubełki) zawierające szukane rangi.
+    Okno z najwyżej max_collect wartościami jest zbierane i sortowane; większe dzielone jest na drobniejszy
+    histogram z min/max podkubełków. Podkubełek o min == max daje wartość bez zbierania (np. tło 0),
+    pozostałe są rozstrzygane w kolejnym przebiegu (resolve() zwraca False).
+    Pamięć ograniczona przez bins i max_collect, niezależnie od rozkładu wartości. NaN pomijane.
+    """
+
+    def __init__(self, lo, hi, bins=65536, max_collect=1 << 18):
+        self.lo = float(lo)
+        self.hi = float(hi) if hi > lo else float(lo) + 1.0
+        self.bins = bins
+        self.max_collect = max_collect
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.windows = {}
+        self.resolved = {}
+        self.at_most = {}
+
+    def add(self, values):
+        """Przebieg 1 - zliczanie"""
+        self.counts += np.bincount(_bin_index(finite_values(values), self.lo, self.hi, self.bins), minlength=self.bins)
+
+    def _ranks(self, p):
+        h = (self.total - 1) * p / 100.0
+        lower = int(np.floor(h))
+        return h, lower, min(lower + 1, self.total - 1)
+
+    def prepare(self, percentiles):
+        """Ustal okna (kubełki histogramu) zawierające rangi potrzebne dla percentyli"""
+        self.total = int(self.counts.sum())
+        if self.total == 0:
+            raise ValueError("No valid values for quantiles")
+        self.percentiles = list(percentiles)
+
+        cumulative = np.cumsum(self.counts)
+        width = (self.hi - self.lo) / self.bins
+        for p in self.percentiles:
+            _, lower, upper = self._ranks(p)
+            for rank in (lower, upper):
+                b = int(np.searchsorted(cumulative, rank, side='right'))
+                before = int(cumulative[b - 1]) if b else 0
+                self._add_window(rank, b, (), (self.lo + b * width, self.lo + (b + 1) * width), before, int(self.counts[b]))
+
+    def _add_window(self, rank, bin_index, path, value_range, before, count):
+        """Okno: kubełek histogramu zawężony ścieżką podkubełków path ((lo, hi, podkubełek), ...)"""
+        window = self.windows.get((bin_index, path))
+        if window is None:
+            collect = count <= self.max_collect
+            window = self.windows[(bin_index, path)] = {
+                'bin': bin_index, 'path': path, 'range': value_range, 'before': before, 'ranks': set(),
+                'values': [] if collect else None,
+                'counts': None if collect else np.zeros(self.bins, dtype=np.int64),
+                'mins': None if collect else np.full(self.bins, np.inf),
+                'maxs': None if collect else np.full(self.bins, -np.inf)
+            }
+        window['ranks'].add(rank)
+
+    def collect(self, values):
+        """Przebieg 2+ - wartości (lub drobniejszy histogram) okien z szukanymi rangami"""
+        if not self.windows:
+            return
+        values = finite_values(values)
+        idx = _bin_index(values, self.lo, self.hi, self.bins)
+
+        for window in self.windows.values():
+            members = values[idx == window['bin']]
+            for lo, hi, sub in window['path']:
+                members = members[_bin_index(members, lo, hi, self.bins) == sub]
+            if not members.size:
+                continue
+
+            if window['values'] is not None:
+                window['values'].append(members)
+                continue
+
+            sub = _bin_index(members, *window['range'], self.bins)
+            window['counts'] += np.bincount(sub, minlength=self.bins)
+            np.minimum.at(window['mins'], sub, members)
+            np.maximum.at(window['maxs'], sub, members)
+
+    def resolve(self):
+        """Po przebiegu collect: wartości rang z zebranych okien; True gdy wszystkie znane, False - potrzebny kolejny przebieg"""
+        windows, self.windows = self.windows, {}
+        for window in windows.values():
+            if window['values'] is not None:
+                members = np.sort(np.concatenate(window['values']))
+                for rank in window['ranks']:
+                    value = members[rank - window['before']]
+                    self.resolved[rank] = float(value)
+                    # Równe wartości trafiają zawsze do tego samego okna - liczba wartości <= value jest dokładna
+                    self.at_most[rank] = window['before'] + int(np.searchsorted(members, value, side='right'))
+                continue
+
+            cumulative = np.cumsum(window['counts'])
+            for rank in window['ranks']:
+                sub = int(np.searchsorted(cumulative, rank - window['before'], side='right'))
+                before = window['before'] + (int(cumulative[sub - 1]) if sub else 0)
+                low, high = float(window['mins'][sub]), float(window['maxs'][sub])
+                if low == high:
+                    self.resolved[rank] = low
+                    self.at_most[rank] = before + int(window['counts'][sub])
+                else:
+                    self._add_window(rank, window['bin'], window['path'] + (window['range'] + (sub,),),
+                                     (low, high), before, int(window['counts'][sub]))
+
+        return not self.windows
+
+    def quantiles(self):
+        result = []
+        for p in self.percentiles:
+            h, lower, upper = self._ranks(p)
+            low_value = self.resolved[lower]
+            result.append(float(low_value + (h - lower) * (self.resolved[upper] - low_value)))
+        return result
+
+    def count_above(self, threshold):
+        """Liczba wartości > threshold (threshold musi leżeć między wartościami wyznaczonych rang, np. kwantyl)"""
+        at_most = 0
+        for rank in sorted(self.resolved):
+            value = self.resolved[rank]
+            if value < threshold:
+                at_most = rank + 1
+            elif value == threshold:
+                at_most = self.at_most[rank]
+        return self.total - at_most
+
+
+class ClusterStitcher:
+    """
+    Klastry 8-spójne łączone ponad granicami kafelków (kafelki podawane wierszami, jak w iter_tiles).
+    Klastry wewnątrz kafelka są finalizowane od razu. W pamięci zostają tylko dolne paski poprzedniego
+    wiersza kafelków i bieżącego wiersza, prawy pasek poprzedniego kafelka oraz statystyki klastrów,
+    które mogą jeszcze sięgnąć kolejnych kafelków - O(szerokość rastra), niezależnie od liczby wierszy.
+    Raport: cluster_count wszystkich klastrów i najwyżej max_reported największych
+    (malejąco po rozmiarze, remisy po środku) - tak jak analiza gridu w pamięci.
+    """
+
+    def __init__(self, min_size=2, max_reported=100):
+        self.min_size = min_size
+        self.max_reported = max_reported
+        self.cluster_count = 0
+        self.top_clusters = []
+        self.border_stats = {}
+        self.parent = {}
+        self.current_row = None
+        self.previous_bottoms = {}
+        self.current_bottoms = {}
+        self.previous_right = None
+        self.next_label = 1
+
+    def add_tile(self, tile_row, tile_col, labels, count, stats, touches_border):
+        """
+        labels - etykiety kafelka (0 = tło), stats - tablice size/sum_row/sum_col/sum_ndvi
+        indeksowane etykietą, touches_border - maska etykiet dotykających krawędzi kafelka.
+        """
+        if tile_row != self.current_row:
+            self._close_row()
+            self.current_row = tile_row
+
+        offset = self.next_label - 1
+        keys = ('size', 'sum_row', 'sum_col', 'sum_ndvi')
+
+        # Klastry wewnątrz kafelka - gotowe, nie mogą się już z niczym połączyć
+        interior = np.flatnonzero(~touches_border[1:]) + 1
+        interior = interior[stats['size'][interior] >= self.min_size]
+        if interior.size > self.max_reported:
+            # Do raportu trafią najwyżej max_reported największych - mniejsze od nich tylko liczymy
+            sizes = stats['size'][interior]
+            keep = sizes >= np.partition(sizes, -self.max_reported)[-self.max_reported]
+            self.cluster_count += int(np.count_nonzero(~keep))
+            interior = interior[keep]
+        for label in interior:
+            self._finalize(tuple(float(stats[key][label]) for key in keys))
+
+        # Klastry na krawędzi kafelka - czekają na zszycie z sąsiadami
+        for label in np.flatnonzero(touches_border[1:]) + 1:
+            global_label = int(label) + offset
+            self.border_stats[global_label] = tuple(float(stats[key][label]) for key in keys)
+            self.parent[global_label] = global_label
+
+        global_labels = np.where(labels > 0, labels + offset, 0)
+        top, bottom = global_labels[0, :], global_labels[-1, :].copy()
+        left, right = global_labels[:, 0], global_labels[:, -1].copy()
+
+        # Zszycie z kafelkiem po lewej i z kafelkami wiersza powyżej (także po przekątnej)
+        if self.previous_right is not None:
+            self._union_strips(self.previous_right, left)
+
+        above = self.previous_bottoms.get(tile_col)
+        if above is not None:
+            self._union_strips(above, top)
+
+        above_left = self.previous_bottoms.get(tile_col - 1)
+        if above_left is not None and above_left[-1] and top[0]:
+            self._union(int(above_left[-1]), int(top[0]))
+
+        above_right = self.previous_bottoms.get(tile_col + 1)
+        if above_right is not None and above_right[0] and top[-1]:
+            self._union(int(above_right[0]), int(top[-1]))
+
+        self.current_bottoms[tile_col] = bottom
+        self.previous_right = right
+        self.next_label += count
+
+    def _close_row(self):
+        """
+        Koniec wiersza kafelków: kolejne kafelki widzą już tylko dolne paski tego wiersza.
+        Klastry, których nie ma na tych paskach, są kompletne - finalizowane i usuwane z pamięci.
+        """
+        self.previous_bottoms, self.current_bottoms = self.current_bottoms, {}
+        self.previous_right = None
+
+        merged = {}
+        for label, cluster in self.border_stats.items():
+            root = self._find(label)
+            merged[root] = tuple(a + b for a, b in zip(merged.get(root, (0.0, 0.0, 0.0, 0.0)), cluster))
+
+        roots = {}
+        for col, strip in self.previous_bottoms.items():
+            for label in np.unique(strip[strip > 0]).tolist():
+                roots[label] = self._find(label)
+        live = set(roots.values())
+
+        for root, cluster in merged.items():
+            if root not in live:
+                self._finalize(cluster)
+
+        # Paski przepisane na korzenie - słownik union-find zawiera tylko żywe klastry
+        if roots:
+            labels = np.array(sorted(roots))
+            targets = np.array([roots[label] for label in labels])
+            for col, strip in self.previous_bottoms.items():
+                positions = np.clip(np.searchsorted(labels, strip), 0, len(labels) - 1)
+                self.previous_bottoms[col] = np.where(strip > 0, targets[positions], 0)
+
+        self.border_stats = {root: merged[root] for root in live}
+        self.parent = {root: root for root in live}
+
+    def _find(self, label):
+        root = label
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[label] != root:
+            self.parent[label], label = root, self.parent[label]
+        return root
+
+    def _union(self, a, b):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def _union_strips(self, first, second, diagonal=True):
+        """Połącz etykiety sąsiadujących pasków krawędziowych (8-spójność)"""
+        for shift in ((-1, 0, 1) if diagonal else (0,)):
+            a = first[max(0, -shift):len(first) - max(0, shift)]
+            b = second[max(0, shift):len(second) - max(0, -shift)]
+            both = (a > 0) & (b > 0)
+            for la, lb in set(zip(a[both].tolist(), b[both].tolist())):
+                self._union(la, lb)
+
+    def _finalize(self, cluster):
+        size, sum_row, sum_col, sum_ndvi = cluster
+        if size < self.min_size:
+            return
+
+        self.cluster_count += 1
+        center = [sum_row / size, sum_col / size]
+        # Kolejność raportu: rozmiar malejąco, remisy po środku rosnąco (niezależnie od kolejności kafelków)
+        entry = (size, -center[0], -center[1], self.cluster_count, {
+            'size': int(size),
+            'center': center,
+            'mean_ndvi': sum_ndvi / size
+        })
+        if len(self.top_clusters) < self.max_reported:
+            heapq.heappush(self.top_clusters, entry)
+        else:
+            heapq.heappushpop(self.top_clusters, entry)
+
+    def finish(self):
+        """Zamknij ostatni wiersz, sfinalizuj pozostałe klastry i zwróć (liczba klastrów, największe klastry)"""
+        self._close_row()
+        for cluster in self.border_stats.values():
+            self._finalize(cluster)
+        self.border_stats, self.parent, self.previous_bottoms = {}, {}, {}
+
+        clusters = [entry[-1] for entry in sorted(self.top_clusters, reverse=True)]
+        return self.cluster_count, clusters
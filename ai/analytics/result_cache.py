@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import logging
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(*parts):
+    """Stabilny klucz (sha256) znormalizowanych danych wejściowych"""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache wyników analiz: LRU + TTL w pamięci procesu oraz opcjonalna warstwa na dysku
+    (wspólna dla procesów roboczych gunicorna). Wartości trzymane jako JSON -
+    każdy odczyt zwraca nową kopię.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, max_entries=256, ttl=600, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'sets': 0}
+
+        if disk_path:
+            os.makedirs(disk_path, exist_ok=True)
+
+    def get(self, key):
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, payload = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    self._stats['memory_hits'] += 1
+                    metrics.inc('ai_result_cache_requests_total', result='memory_hit')
+                    return json.loads(payload)
+                del self._entries[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self._stats['misses'] += 1
+                metrics.inc('ai_result_cache_requests_total', result='miss')
+                return None
+
+            self._remember(key, entry)
+            self._stats['hits'] += 1
+            self._stats['disk_hits'] += 1
+        metrics.inc('ai_result_cache_requests_total', result='disk_hit')
+        return json.loads(entry[1])
+
+    def set(self, key, value):
+        entry = (time.time() + self.ttl, json.dumps(value, default=str))
+
+        with self._lock:
+            self._remember(key, entry)
+            self._stats['sets'] += 1
+            prune = self.disk_path and self._stats['sets'] % self.PRUNE_EVERY == 0
+
+        self._write_disk(key, entry)
+        if prune:
+            self._prune_disk()
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_file(self, key):
+        return os.path.join(self.disk_path, key[:2], f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.disk_path:
+            return None
+
+        path = self._disk_file(key)
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if stored['expires'] <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        return stored['expires'], stored['payload']
+
+    def _write_disk(self, key, entry):
+        if not self.disk_path:
+            return
+
+        path = self._disk_file(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({'expires': entry[0], 'payload': entry[1]}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Result cache disk write failed: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _prune_disk(self):
+        """Usuń przeterminowane wpisy z dysku"""
+        now = time.time()
+        for root, _, files in os.walk(self.disk_path):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if name.endswith('.json') and os.path.getmtime(path) + self.ttl <= now:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['ttl'] = self.ttl
+        stats['disk_tier'] = bool(self.disk_path)
+        return stats
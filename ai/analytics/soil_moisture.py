@@ -1,24 +1,52 @@
 import numpy as np
+import logging
+
+from .utils import segment_stats
+from preprocessing.field_data import as_series
+
+logger = logging.getLogger(__name__)
+
 
 def predict_moisture(moisture_data):
-    print("🔥 SIMPLE MOISTURE FUNCTION CALLED")
+    logger.debug("Soil moisture prediction called")
 
     if not moisture_data:
         return None
 
-    all_values = []
+    # Wartości wszystkich odczytów jako jedna tablica - ZERO json.loads() per żądanie
+    all_values, _ = as_series(moisture_data).values('moisture_values')
 
-    # Super proste przetwarzanie - ZERO json.loads()
-    for item in moisture_data:
-        data = item['data']  # Direct access - no json decoding!
-        values = data['moisture_values']  # Direct access
-        all_values.extend(values)
-
-    if not all_values:
+    if not all_values.size:
         return {'error': 'No moisture values found'}
 
-    avg = float(np.mean(all_values))
+    avg = float(all_values.mean())
+
+    return _build_result(avg, all_values.min(), all_values.max())
+
+
+def predict_moisture_batch(moisture_data_by_field):
+    """
+    Analiza wilgotności wielu pól naraz - jeden przebieg NumPy dla wszystkich pól.
+    Zwraca słownik field_id -> wynik w formacie predict_moisture.
+    """
+    field_ids = list(moisture_data_by_field.keys())
+    chunks = [as_series(moisture_data_by_field[field_id]).values('moisture_values')[0] for field_id in field_ids]
+
+    stats = segment_stats(chunks)
+
+    results = {}
+    for i, field_id in enumerate(field_ids):
+        if not moisture_data_by_field[field_id]:
+            results[field_id] = None
+        elif stats['count'][i] == 0:
+            results[field_id] = {'error': 'No moisture values found'}
+        else:
+            results[field_id] = _build_result(float(stats['mean'][i]), stats['min'][i], stats['max'][i])
+
+    return results
+
 
+def _build_result(avg, min_value, max_value):
     # Simple status
     if avg < 0.3:
         status = "Low"
@@ -32,8 +60,8 @@ def predict_moisture(moisture_data):
 
     return {
         'avg_moisture': avg,
-        'min_moisture': float(np.min(all_values)),
-        'max_moisture': float(np.max(all_values)),
+        'min_moisture': float(min_value),
+        'max_moisture': float(max_value),
         'predicted_moisture': avg,
         'moisture_status': status,
         'dry_area_percent': 0.0,  # Simplified
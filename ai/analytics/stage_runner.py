@@ -0,0 +1,110 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import logging
+
+from .metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+
+class StageRunner:
+    """
+    Niezależne etapy analizy (NDVI, wilgotność, anomalie, predykcja) na wspólnej puli wątków -
+    ciężkie obliczenia NumPy/sklearn zwalniają GIL, więc czas analizy zbliża się do najwolniejszego etapu.
+    Etap przekraczający timeout lub zakończony błędem nie przerywa analizy - trafia do errors.
+    Do puli trafia najwyżej tyle etapów, ile ma ona wolnych wątków (etapy po timeout nadal je zajmują) -
+    pozostałe etapy żądania wykonywane są w wątku żądania, więc żaden etap nie czeka w kolejce puli.
+    Pula tworzona leniwie w każdym procesie (wątki nie przetrwają fork).
+    """
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage')
+                self._executor_pid = os.getpid()
+                self._in_flight = 0
+            return self._executor
+
+    def _reserve(self, wanted):
+        """Zajmij do `wanted` wolnych wątków puli - zwraca liczbę zajętych"""
+        with self._lock:
+            reserved = max(0, min(wanted, self.max_workers - self._in_flight))
+            self._in_flight += reserved
+            return reserved
+
+    def _run_reserved(self, name, func):
+        try:
+            return self._run_stage(name, func)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def in_flight(self):
+        """Etapy wykonywane w puli tego procesu (także te, na które żądanie przestało czekać)"""
+        with self._lock:
+            return self._in_flight
+
+    def run(self, stages, concurrent=True, timeout=None):
+        """
+        stages: {nazwa: funkcja bez argumentów}. Zwraca (results, errors) - słowniki po nazwach etapów;
+        etap bez wyniku ma None w results i opis w errors. timeout (s) liczony od startu wszystkich etapów.
+        concurrent=False - etapy kolejno w wątku żądania (bez limitu czasu). Czas etapu - stage_timer(nazwa).
+        Etapy, dla których brakuje wolnych wątków puli, też wykonywane są kolejno w wątku żądania.
+        """
+        results, errors = {}, {}
+
+        executor = self._get_executor() if concurrent else None
+        pooled = list(stages)[:self._reserve(len(stages))] if concurrent else []
+        if concurrent and len(pooled) < len(stages):
+            logger.warning(f"⚠️ Stage pool saturated - running {len(stages) - len(pooled)} stages in the request thread")
+
+        # Kontekst żądania (blok timings) przekazywany do wątków etapów
+        started = time.monotonic()
+        futures = {executor.submit(contextvars.copy_context().run, self._run_reserved, name, stages[name]): name
+                   for name in pooled}
+
+        for name, func in stages.items():
+            if name not in pooled:
+                results[name], error = self._run_stage(name, func)
+                if error:
+                    errors[name] = error
+
+        if not futures:
+            return results, errors
+
+        # Limit czasu liczony od startu etapów w puli - etapy w wątku żądania mogły go już wyczerpać
+        done, not_done = wait(futures, timeout=None if timeout is None else max(0, timeout - (time.monotonic() - started)))
+
+        for future in done:
+            name = futures[future]
+            results[name], error = future.result()
+            if error:
+                errors[name] = error
+
+        for future in not_done:
+            # Wątku nie da się przerwać - etap kończy się w tle, jego wynik jest pomijany
+            name = futures[future]
+            logger.warning(f"⏱️ Stage {name} timed out after {timeout}s")
+            results[name] = None
+            errors[name] = f'Timed out after {timeout}s'
+
+        return results, errors
+
+    @staticmethod
+    def _run_stage(name, func):
+        try:
+            with stage_timer(name):
+                return func(), None
+        except Exception as e:
+            logger.error(f"Stage {name} failed: {str(e)}")
+            return None, str(e)
@@ -0,0 +1,145 @@
+import sqlite3
+import os
+from contextlib import closing
+import numpy as np
+from scipy.stats import norm
+from datetime import datetime
+import logging
+
+from config import Config
+from .anomaly_detection import CONTAMINATION, reading_value
+
+logger = logging.getLogger(__name__)
+
+# Próg z-score odpowiadający odsetkowi anomalii dla czułości (dwustronnie)
+Z_THRESHOLDS = {sensitivity: float(norm.ppf(1 - contamination / 2)) for sensitivity, contamination in CONTAMINATION.items()}
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stream_series (
+    field_id TEXT NOT NULL,
+    data_type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    var REAL NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (field_id, data_type)
+);
+"""
+
+
+class StreamingAnomalyDetector:
+    """
+    Detekcja anomalii odczyt po odczycie - wykładniczo ważona średnia i wariancja (EWMA)
+    per pole i data_type. Stan serii to stała liczba wartości, bez historii.
+    Stan trzymany w SQLite pod Config.DATA_PATH - wspólny dla wszystkich procesów roboczych,
+    odczyty jednego żądania dołączane w jednej transakcji (kolejne żądania pola widzą pełny stan).
+    """
+
+    def __init__(self, alpha=0.1, warmup=10, path=None):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.path = path or os.path.join(Config.DATA_PATH, 'stream_state.sqlite3')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Połączenie per operacja - bezpieczne dla wątków i procesów roboczych
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def update(self, field_id, item, sensitivity='medium'):
+        """Dołącz odczyt do serii; zwraca anomalię (schemat detect_anomalies) lub None"""
+        anomalies = self.ingest(field_id, [item], sensitivity)
+        return anomalies[0] if anomalies else None
+
+    def ingest(self, field_id, readings, sensitivity='medium'):
+        """Dołącz odczyty po kolei; zwraca listę wykrytych anomalii"""
+        z_threshold = Z_THRESHOLDS.get(sensitivity, Z_THRESHOLDS['medium'])
+        anomalies = []
+
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                series = {}
+                for item in readings:
+                    anomaly = self._update(conn, series, field_id, item, z_threshold)
+                    if anomaly is not None:
+                        anomalies.append(anomaly)
+
+                updated_at = datetime.now().isoformat()
+                conn.executemany(
+                    'INSERT OR REPLACE INTO stream_series (field_id, data_type, count, mean, var, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    [(str(field_id), data_type, state['count'], state['mean'], state['var'], updated_at)
+                     for data_type, state in series.items()]
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        return anomalies
+
+    def _update(self, conn, series, field_id, item, z_threshold):
+        """Krok EWMA dla jednego odczytu; series - stan serii zmienionych w tej transakcji"""
+        reading = reading_value(item)
+        if reading is None:
+            return None
+
+        feature, value = reading
+        data_type = item.get('data_type')
+        state = series.get(data_type)
+        if state is None:
+            row = conn.execute('SELECT count, mean, var FROM stream_series WHERE field_id = ? AND data_type = ?',
+                               (str(field_id), data_type)).fetchone()
+            state = series[data_type] = dict(zip(('count', 'mean', 'var'), row or (0, 0.0, 0.0)))
+
+        count, mean_value, std_value = state['count'], state['mean'], np.sqrt(state['var'])
+
+        deviation = abs(value - mean_value) / (std_value if std_value > 0 else 1)
+        is_anomaly = count >= self.warmup and deviation > z_threshold
+
+        # Anomalia aktualizuje stan wartością przyciętą do progu - pojedynczy skok nie rozmywa statystyk
+        update_value = value
+        if is_anomaly:
+            update_value = float(np.clip(value, mean_value - z_threshold * std_value, mean_value + z_threshold * std_value))
+
+        # W okresie rozgrzewki alpha = 1/n, czyli zwykła średnia i wariancja
+        alpha = max(self.alpha, 1.0 / (count + 1))
+        diff = update_value - mean_value
+        state['mean'] = mean_value + alpha * diff
+        state['var'] = (1 - alpha) * (state['var'] + alpha * diff * diff)
+        state['count'] = count + 1
+
+        if not is_anomaly:
+            return None
+
+        logger.debug(f"Streaming anomaly for field {field_id}: {feature}={value:.3f}, expected {mean_value:.3f}")
+
+        return {
+            'date': item.get('collection_date') or datetime.now().strftime('%Y-%m-%d'),
+            'type': f"{feature}_anomaly",
+            'description': f"Anomalous {feature} value detected ({value:.2f})",
+            'severity': 'high' if deviation > 3 else 'medium',
+            'value': float(value),
+            'expected': float(mean_value)
+        }
+
+    def get_state(self, field_id):
+        """Bieżący stan serii pola (średnia/odchylenie per data_type)"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute('SELECT data_type, count, mean, var FROM stream_series WHERE field_id = ?',
+                                (str(field_id),)).fetchall()
+
+        return {
+            data_type: {
+                'count': count,
+                'mean': float(mean_value),
+                'std': float(np.sqrt(var)),
+                'warmed_up': count >= self.warmup
+            }
+            for data_type, count, mean_value, var in rows
+        }
@@ -0,0 +1,197 @@
+import numpy as np
+
+# Uprawy symulowanych sezonów (cykl w dniach, krzywa biomasy, maksymalna wysokość i szczyt NDVI)
+CROPS = [
+    {'name': 'wheat', 'cycle': 120, 'max_biomass': 8000, 'growth_rate': 0.08, 'peak_day': 70, 'max_height': 90, 'peak_ndvi': 0.85},
+    {'name': 'corn', 'cycle': 140, 'max_biomass': 12000, 'growth_rate': 0.06, 'peak_day': 90, 'max_height': 200, 'peak_ndvi': 0.90},
+    {'name': 'barley', 'cycle': 100, 'max_biomass': 6000, 'growth_rate': 0.09, 'peak_day': 60, 'max_height': 80, 'peak_ndvi': 0.85},
+    {'name': 'rapeseed', 'cycle': 110, 'max_biomass': 7000, 'growth_rate': 0.07, 'peak_day': 75, 'max_height': 120, 'peak_ndvi': 0.90}
+]
+
+# Warunki sezonu (temperatura, wilgotność, żyzność) - kolejne uprawy dostają kolejne sezony
+SEASONS = [
+    {'temp_offset': 0, 'moisture_factor': 1.0, 'fertility': 1.0},
+    {'temp_offset': 3, 'moisture_factor': 0.8, 'fertility': 1.1},
+    {'temp_offset': -2, 'moisture_factor': 1.2, 'fertility': 0.9},
+    {'temp_offset': 1, 'moisture_factor': 0.9, 'fertility': 1.05}
+]
+
+# Granice postępu cyklu (0-1) dla faz wzrostu 0-5
+STAGE_PROGRESS_BOUNDS = [0.12, 0.25, 0.50, 0.75, 0.90]
+
+# Nawożenie w kluczowych dniach sezonu: dzień -> dawka (kg/ha)
+FERTILIZER_SCHEDULE = {
+    'fertilizer_nitrogen': {10: 120, 20: 80, 35: 120},
+    'fertilizer_phosphorus': {15: 60, 45: 60},
+    'fertilizer_potassium': {25: 80}
+}
+
+
+def growth_stage(progress):
+    """Faza wzrostu 0-5 z postępu cyklu (kiełkowanie ... dojrzałość)"""
+    return np.searchsorted(STAGE_PROGRESS_BOUNDS, progress, side='right')
+
+
+def ndvi_curve(progress, peak_ndvi):
+    """Krzywa NDVI w cyklu uprawy: wzrost do szczytu wegetatywnego, potem spadek"""
+    return np.select(
+        [progress < 0.12, progress < 0.25, progress < 0.65, progress < 0.85],
+        [
+            0.20 + progress * 2,
+            0.44 + (progress - 0.12) * 1.5,
+            0.64 + (progress - 0.25) * (peak_ndvi - 0.64) / 0.4,
+            peak_ndvi - (progress - 0.65) * 0.4
+        ],
+        0.45 - (progress - 0.85) * 0.3
+    )
+
+
+def biomass_curve(day, crop, ndvi, moisture, temperature, fertilizer_total, fertility):
+    """Biomasa (kg/ha) z krzywej logistycznej uprawy i czynników środowiskowych (bez szumu)"""
+    base_biomass = crop['max_biomass'] / (1 + np.exp(-crop['growth_rate'] * (day - crop['peak_day'])))
+
+    ndvi_factor = np.clip(ndvi * 1.2, 0.3, 1.5)
+
+    # Wilgotność - optymalna w zakresie 0.4-0.6
+    moisture_factor = np.where(
+        (moisture >= 0.4) & (moisture <= 0.6), 1.0,
+        np.where(moisture < 0.4, np.maximum(0.5, moisture / 0.4), np.maximum(0.7, 1.0 - (moisture - 0.6) * 0.5))
+    )
+
+    # Temperatura - optymalna w zakresie 18-25°C
+    temp_factor = np.where(
+        (temperature >= 18) & (temperature <= 25), 1.0,
+        np.where(temperature < 18, np.maximum(0.6, 0.8 + (temperature - 15) * 0.04),
+                 np.maximum(0.5, 1.0 - (temperature - 25) * 0.02))
+    )
+
+    # Nawożenie - wpływ logarytmiczny
+    fertilizer_factor = 1.0 + np.log1p(fertilizer_total / 100) * 0.1
+
+    return base_biomass * ndvi_factor * moisture_factor * temp_factor * fertilizer_factor * fertility
+
+
+def generate_seasons(n_fields=1, crops=None, rng=None):
+    """
+    Pełne sezony upraw dla n_fields pól jako kolumny NumPy (cechy PlantGrowthPredictor + biomass_target).
+    Każde pole przechodzi sezon każdej uprawy; warunki sezonu są lekko różne dla każdego pola.
+    Wszystkie dni wszystkich pól liczone naraz - brak pętli po wierszach.
+    """
+    rng = rng if rng is not None else np.random.default_rng(42)
+    crops = crops or CROPS
+    parts = [_generate_crop_season(crop, SEASONS[i % len(SEASONS)], n_fields, rng) for i, crop in enumerate(crops)]
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def _generate_crop_season(crop, season, n_fields, rng):
+    """Sezon jednej uprawy: tablice (n_fields x dni cyklu) spłaszczone do kolumn"""
+    cycle = crop['cycle']
+    shape = (n_fields, cycle)
+    day = np.broadcast_to(np.arange(cycle), shape)
+    progress = day / cycle
+
+    # Warunki sezonu per pole
+    temp_offset = season['temp_offset'] + rng.normal(0, 1, (n_fields, 1))
+    moisture_factor = season['moisture_factor'] * rng.normal(1.0, 0.05, (n_fields, 1))
+    fertility = season['fertility'] * rng.normal(1.0, 0.05, (n_fields, 1))
+
+    # NDVI z krzywej wzrostu
+    avg_ndvi = np.clip(ndvi_curve(progress, crop['peak_ndvi']) + rng.normal(0, 0.05, shape), 0.1, 0.95)
+
+    # Wilgotność gleby: tygodniowy cykl i skoki po opadach
+    moisture_cycle = 0.15 * np.sin((day / 7) * 2 * np.pi)
+    rainfall_effect = np.where(rng.random(shape) < 0.25, 0.2, 0.0)
+    avg_moisture = np.clip(0.45 * moisture_factor + moisture_cycle + rainfall_effect + rng.normal(0, 0.08, shape), 0.05, 0.95)
+
+    # Temperatura z sezonowymi zmianami
+    avg_temperature = 18 + temp_offset + 8 * np.sin((day / 365) * 2 * np.pi) + rng.normal(0, 3, shape)
+    soil_temperature = avg_temperature - 2 + rng.normal(0, 1, shape)
+
+    # Opady (zdarzenia w 30% dni) i nasłonecznienie
+    rainfall = np.where(rng.random(shape) < 0.3, rng.exponential(3, shape), 0.0)
+    sunshine_hours = np.clip(8 + 4 * np.sin((day / 365) * 2 * np.pi) + rng.normal(0, 1.5, shape), 3, 14)
+
+    # Nawożenie według harmonogramu
+    fertilizer = {}
+    for column, schedule in FERTILIZER_SCHEDULE.items():
+        doses = np.zeros(cycle)
+        for dose_day, dose in schedule.items():
+            if dose_day < cycle:
+                doses[dose_day] = dose
+        fertilizer[column] = np.broadcast_to(doses, shape)
+
+    # Parametry fizyczne pola i roślin
+    field_size = np.broadcast_to(5.5 + rng.normal(0, 1.5, (n_fields, 1)), shape)
+    plant_height = crop['max_height'] / (1 + np.exp(-0.08 * (day - cycle * 0.6)))
+    plant_height = np.maximum(2, plant_height + rng.normal(0, crop['max_height'] * 0.05, shape))
+    plant_density = 225 + rng.normal(0, 20, shape)
+
+    # Target - biomasa z naturalną zmiennością
+    fertilizer_total = sum(fertilizer.values())
+    biomass = biomass_curve(day, crop, avg_ndvi, avg_moisture, avg_temperature, fertilizer_total, fertility)
+    biomass = np.maximum(50, biomass * rng.normal(1.0, 0.08, shape))
+
+    # Anomalie (5% dni): redukcja biomasy i odpowiadające obniżenie NDVI
+    anomaly = rng.random(shape) < 0.05
+    biomass = np.where(anomaly, biomass * rng.uniform(0.6, 0.8, shape), biomass)
+    avg_ndvi = np.where(anomaly, avg_ndvi * rng.uniform(0.7, 0.9, shape), avg_ndvi)
+
+    columns = {
+        'avg_ndvi': avg_ndvi,
+        'min_ndvi': np.maximum(0.1, avg_ndvi - rng.uniform(0.1, 0.2, shape)),
+        'max_ndvi': np.minimum(0.95, avg_ndvi + rng.uniform(0.05, 0.15, shape)),
+        'avg_moisture': avg_moisture,
+        'min_moisture': np.maximum(0.05, avg_moisture - rng.uniform(0.1, 0.2, shape)),
+        'max_moisture': np.minimum(0.95, avg_moisture + rng.uniform(0.05, 0.15, shape)),
+        'avg_temperature': avg_temperature,
+        'soil_temperature': soil_temperature,
+        'rainfall': rainfall,
+        'sunshine_hours': sunshine_hours,
+        'days_since_planting': day,
+        'growth_stage_encoded': growth_stage(progress),
+        'fertilizer_nitrogen': fertilizer['fertilizer_nitrogen'],
+        'fertilizer_phosphorus': fertilizer['fertilizer_phosphorus'],
+        'fertilizer_potassium': fertilizer['fertilizer_potassium'],
+        'field_size': field_size,
+        'plant_height': plant_height,
+        'plant_density': plant_density,
+        'biomass_target': biomass
+    }
+    return {key: np.ravel(values) for key, values in columns.items()}
+
+
+def generate_samples(n_samples, rng=None):
+    """Losowe n_samples dni z symulowanych sezonów (tyle pól, ile potrzeba)"""
+    rng = rng if rng is not None else np.random.default_rng(42)
+    rows_per_field = sum(crop['cycle'] for crop in CROPS)
+    columns = generate_seasons(-(-n_samples // rows_per_field), rng=rng)
+
+    index = rng.choice(len(columns['biomass_target']), n_samples, replace=False)
+    return {key: values[index] for key, values in columns.items()}
+
+
+def ensemble_training_data(n_samples, rng=None):
+    """
+    Dane dla EnhancedPlantGrowthPredictor: (X, y) w kolejności jego feature_names,
+    target to biomasa w t/ha. Cechy przestrzenne, których sezony nie modelują, są losowane.
+    """
+    rng = rng if rng is not None else np.random.default_rng(42)
+    samples = generate_samples(n_samples, rng)
+
+    ndvi_std = (samples['max_ndvi'] - samples['min_ndvi']) / 4
+    moisture_std = (samples['max_moisture'] - samples['min_moisture']) / 4
+    temp_avg = samples['avg_temperature']
+
+    X = np.column_stack([
+        samples['avg_ndvi'], ndvi_std, samples['min_ndvi'], samples['max_ndvi'],
+        samples['avg_moisture'], moisture_std,
+        temp_avg, temp_avg + 5, temp_avg - 3,
+        rng.normal(65, 10, n_samples), samples['rainfall'],
+        samples['days_since_planting'], np.clip(samples['days_since_planting'] // 30, 0, 3),
+        rng.normal(0.3, 0.2, n_samples), rng.normal(0.02, 0.01, n_samples),
+        rng.poisson(1, n_samples), rng.poisson(2, n_samples),
+        rng.beta(2, 3, n_samples)
+    ])
+    y = np.clip(samples['biomass_target'] / 1000, 0, 15)
+
+    return X, y
@@ -0,0 +1,89 @@
+import numpy as np
+from itertools import chain
+
+
+def convert_numpy_types(obj):
+    """Rekurencyjna konwersja typów NumPy na natywne typy Pythona (serializacja JSON)"""
+    if isinstance(obj, dict):
+        return {key: convert_numpy_types(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [convert_numpy_types(value) for value in obj]
+    if isinstance(obj, np.ndarray):
+        return convert_numpy_types(obj.tolist())
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return safe_float(obj)
+    return obj
+
+
+def safe_float(value, default=0.0):
+    """Konwersja do float - NaN/inf i wartości niekonwertowalne zamieniane na default"""
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return default
+    return result if np.isfinite(result) else default
+
+
+def safe_int(value, default=0):
+    """Konwersja do int z wartością domyślną"""
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+
+def safe_bool(value):
+    """Konwersja do natywnego bool"""
+    return bool(value)
+
+
+def segment_stats(chunks, below=None):
+    """
+    Statystyki (count/mean/min/max) dla wielu list (lub tablic) wartości w jednym przebiegu NumPy.
+    Opcjonalnie liczy również wartości poniżej progu `below`.
+    """
+    n = len(chunks)
+    lengths = np.fromiter((len(c) for c in chunks), dtype=np.int64, count=n)
+    total = int(lengths.sum())
+    if all(isinstance(c, np.ndarray) for c in chunks):
+        values = np.concatenate(chunks).astype(float, copy=False) if n else np.empty(0)
+    else:
+        values = np.fromiter(chain.from_iterable(chunks), dtype=float, count=total)
+
+    segments = np.repeat(np.arange(n), lengths)
+    nonempty = lengths > 0
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+
+    sums = np.bincount(segments, weights=values, minlength=n)
+    means = np.divide(sums, lengths, out=np.full(n, np.nan), where=nonempty)
+
+    mins = np.full(n, np.nan)
+    maxs = np.full(n, np.nan)
+    if total:
+        mins[nonempty] = np.minimum.reduceat(values, offsets[nonempty])
+        maxs[nonempty] = np.maximum.reduceat(values, offsets[nonempty])
+
+    stats = {
+        'count': lengths,
+        'mean': means,
+        'min': mins,
+        'max': maxs
+    }
+
+    if below is not None:
+        stats['below'] = np.bincount(segments, weights=values < below, minlength=n)
+
+    return stats
+
+
+def tree_predictions(forest, X):
+    """
+    Predykcje wszystkich drzew lasu jako tablica (drzewa x wiersze).
+    Wejście walidowane raz (float32 jak w forest.predict), drzewa oceniane bez ponownej walidacji.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    return np.stack([tree.predict(X, check_input=False) for tree in forest.estimators_])
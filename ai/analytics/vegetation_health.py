@@ -1,30 +1,57 @@
 import numpy as np
-import json
+from .utils import segment_stats
+from preprocessing.field_data import as_series
 
 
 def analyze_ndvi(ndvi_data):
+    """Analiza NDVI - przyjmuje listę odczytów lub zdekodowaną serię (FieldSeries)"""
     if not ndvi_data:
         return None
 
-    ndvi_values = []
-    for item in ndvi_data:
-        data = item.get('data', {})
-        #if isinstance(data, str):
-        #    data = json.loads(data)
+    ndvi_values, _ = as_series(ndvi_data).values('ndvi_values')
 
-        values = data.get('ndvi_values', [])
-        ndvi_values.extend(values)
-
-    if not ndvi_values:
+    if not ndvi_values.size:
         return {
             'error': 'No NDVI values found in provided data.'
         }
 
     # Calculate statistics
-    avg_ndvi = np.mean(ndvi_values)
-    min_ndvi = np.min(ndvi_values)
-    max_ndvi = np.max(ndvi_values)
+    avg_ndvi = ndvi_values.mean()
+    min_ndvi = ndvi_values.min()
+    max_ndvi = ndvi_values.max()
+
+    # Calculate problem areas percentage
+    problem_area_percent = np.count_nonzero(ndvi_values < 0.5) / ndvi_values.size * 100
+
+    return _build_result(avg_ndvi, min_ndvi, max_ndvi, problem_area_percent)
+
+
+def analyze_ndvi_batch(ndvi_data_by_field):
+    """
+    Analiza NDVI wielu pól naraz - jeden przebieg NumPy dla wszystkich pól.
+    Zwraca słownik field_id -> wynik w formacie analyze_ndvi.
+    """
+    field_ids = list(ndvi_data_by_field.keys())
+    chunks = [as_series(ndvi_data_by_field[field_id]).values('ndvi_values')[0] for field_id in field_ids]
 
+    stats = segment_stats(chunks, below=0.5)
+
+    results = {}
+    for i, field_id in enumerate(field_ids):
+        if not ndvi_data_by_field[field_id]:
+            results[field_id] = None
+        elif stats['count'][i] == 0:
+            results[field_id] = {'error': 'No NDVI values found in provided data.'}
+        else:
+            results[field_id] = _build_result(
+                stats['mean'][i], stats['min'][i], stats['max'][i],
+                stats['below'][i] / stats['count'][i] * 100
+            )
+
+    return results
+
+
+def _build_result(avg_ndvi, min_ndvi, max_ndvi, problem_area_percent):
     # Determine health status
     if avg_ndvi < 0.3:
         health_status = "Critical"
@@ -39,9 +66,6 @@ def analyze_ndvi(ndvi_data):
         health_status = "Good"
         recommendation = "Continue standard procedures."
 
-    # Calculate problem areas percentage
-    problem_area_percent = len([v for v in ndvi_values if v < 0.5]) / len(ndvi_values) * 100
-
     return {
         'avg_ndvi': float(avg_ndvi),
         'min_ndvi': float(min_ndvi),
@@ -1,14 +1,30 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 import os
+import hmac
 import logging
+import time
 from datetime import datetime
+from collections import Counter
+from functools import wraps
 
 # Import analytics modules
-from analytics.vegetation_health import analyze_ndvi
-from analytics.soil_moisture import predict_moisture
-from analytics.anomaly_detection import detect_anomalies
+from analytics.vegetation_health import analyze_ndvi, analyze_ndvi_batch
+from analytics.soil_moisture import predict_moisture, predict_moisture_batch
+from analytics.anomaly_detection import detect_anomalies, anomaly_model_store
+from analytics.streaming_anomaly import StreamingAnomalyDetector
 from analytics.plant_growth_prediction import PlantGrowthPredictor
+from analytics.advanced_ndvi_analyzer import AdvancedNDVIAnalyzer
+from analytics.model_registry import RegistryWatcher
+from analytics.result_cache import ResultCache, cache_key
+from analytics.job_queue import JobQueue
+from analytics.admission import AdmissionGate, Overloaded, ThreadBudget
+from analytics.stage_runner import StageRunner
+from analytics.metrics import metrics, request_timings, stage_timer
+from config import Config
+from preprocessing.field_data import decode_field_data
+from preprocessing.feature_store import FeatureStore
+from preprocessing.db_reader import FieldDataReader
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -16,7 +32,132 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-growth_predictor = PlantGrowthPredictor()
+# Metryki przed wczytaniem modelu - czas wczytania trafia do ai_model_load_seconds
+metrics.configure(os.path.join(Config.DATA_PATH, 'metrics'), Config.METRICS_FLUSH_INTERVAL)
+
+# Model z rejestru wczytywany przy imporcie - z preload_app gunicorna raz w procesie głównym,
+# współdzielony z procesami roboczymi (copy-on-write). Wątki startują w start_background_tasks.
+growth_predictor = PlantGrowthPredictor(auto_init=False)
+growth_predictor.load_model()
+ndvi_analyzer = AdvancedNDVIAnalyzer()
+# Stan detekcji anomalii (modele pól, serie strumieniowe) wspólny dla procesów roboczych - pod DATA_PATH
+anomaly_model_store.configure(os.path.join(Config.DATA_PATH, 'anomaly_models'))
+stream_detector = StreamingAnomalyDetector()
+feature_store = FeatureStore()
+field_data_reader = FieldDataReader()
+result_cache = ResultCache(
+    max_entries=Config.RESULT_CACHE_SIZE,
+    ttl=Config.RESULT_CACHE_TTL,
+    disk_path=os.path.join(Config.DATA_PATH, 'result_cache') if Config.RESULT_CACHE_DISK else None
+)
+job_queue = JobQueue(
+    os.path.join(Config.DATA_PATH, 'jobs'),
+    max_workers=Config.JOB_WORKERS,
+    ttl=Config.JOB_TTL,
+    callback_timeout=Config.JOB_CALLBACK_TIMEOUT,
+    callback_hosts=Config.JOB_CALLBACK_HOSTS,
+    stale_after=Config.JOB_STALE_AFTER
+)
+stage_runner = StageRunner(max_workers=Config.STAGE_WORKERS)
+
+# Kontrola przyjęć: ograniczona liczba równoczesnych analiz per endpoint, pas 'interactive' (domyślny)
+# obsługiwany przed 'background' (nagłówek X-Priority: background - auto_analysis z kolejki Laravela)
+# Wszystkie bramki dzielą budżet wątków (Config.ADMISSION_THREADS) - suma analiz i kolejek nie zajmie
+# wszystkich wątków gunicorna, lekkie endpointy i odpowiedzi 429 mają zawsze wolne wątki
+admission_queues = {'interactive': Config.ADMISSION_QUEUE, 'background': Config.ADMISSION_BACKGROUND_QUEUE}
+admission_budget = ThreadBudget(Config.ADMISSION_THREADS)
+admission_gates = {
+    name: AdmissionGate(name, limit, admission_queues, Config.ADMISSION_MAX_WAIT, budget=admission_budget)
+    for name, limit in (
+        ('analyze_field', Config.ANALYZE_CONCURRENCY),
+        ('analyze_batch', Config.BATCH_CONCURRENCY),
+        ('predict_growth', Config.PREDICT_CONCURRENCY),
+        ('analyze_raster', Config.RASTER_CONCURRENCY)
+    )
+}
+
+# Rejestry modeli dostępne przez /admin/models - tylko modele obsługiwane przez serwis; w tym procesie
+# przeładowywane od razu, w pozostałych procesach roboczych - przez model_watcher po zmianie aktywnej wersji
+model_registries = {
+    'growth_model': growth_predictor.registry
+}
+served_models = {
+    'growth_model': growth_predictor
+}
+model_watcher = RegistryWatcher(served_models, interval=Config.MODEL_REFRESH_INTERVAL)
+
+
+def request_lane():
+    """Pas priorytetu żądania z nagłówka X-Priority (domyślnie 'interactive')"""
+    return request.headers.get('X-Priority', 'interactive').strip().lower()
+
+
+def overloaded_response(error):
+    """Odpowiedź 429 z Retry-After dla żądania odrzuconego przez kontrolę przyjęć"""
+    logger.warning(f"⛔ {error} - retry after {error.retry_after}s")
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+
+def json_object_body():
+    """Treść żądania jako obiekt JSON lub None (brak treści, niepoprawny JSON, inny typ niż obiekt)"""
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+
+def admitted(gate_name):
+    """Dekorator endpointu: obsługa po uzyskaniu miejsca w bramce, przy przeciążeniu 429"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with admission_gates[gate_name].admit(request_lane()):
+                    return view(*args, **kwargs)
+            except Overloaded as e:
+                return overloaded_response(e)
+        return wrapper
+    return decorator
+
+
+def timing_block():
+    """Czasy etapów bieżącego żądania (parameters.include_timings) i czas całkowity w sekundach"""
+    return dict(request_timings.get() or {}, total=round(time.perf_counter() - g.request_started, 4))
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.timings_token = request_timings.set({})
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Liczba żądań, czas obsługi i rozmiary danych per endpoint (szablon trasy, nie pełny URL)"""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.inc('ai_requests_total', route=route, method=request.method, status=str(response.status_code))
+    metrics.observe('ai_request_duration_seconds', time.perf_counter() - g.request_started, route=route)
+    metrics.observe('ai_request_size_bytes', request.content_length or 0, route=route)
+    metrics.observe('ai_response_size_bytes', response.calculate_content_length() or 0, route=route)
+    metrics.maybe_flush()
+    return response
+
+
+@app.teardown_request
+def reset_request_timings(error):
+    token = g.pop('timings_token', None)
+    if token is not None:
+        request_timings.reset(token)
+
+
+def start_background_tasks():
+    """
+    Wątki w tle - uruchamiane w każdym procesie obsługującym żądania (po fork, patrz gunicorn.conf.py):
+    trening modelu gdy rejestr jest pusty (jeden proces naraz) i obserwacja aktywnych wersji w rejestrze.
+    """
+    if growth_predictor.bundle is None:
+        growth_predictor.auto_initialize(background=True)
+    model_watcher.start()
 
 
 @app.route('/')
@@ -25,73 +166,500 @@ def index():
         "status": "online",
         "name": "Precision Agriculture AI API",
         "version": "1.0.0",
-        "model_status": "loaded" if growth_predictor.model else "not_loaded"
+        "model_status": growth_predictor.status
     })
 
 
 @app.route('/analyze/field/<int:field_id>', methods=['POST'])
 def analyze_field(field_id):
     try:
-        data = request.json
-        field_data = data.get('field_data', [])
-        field_info = data.get('field_info', {})
-        parameters = data.get('parameters', {})
+        data = json_object_body()
+        if data is None:
+            return jsonify({"error": "Request body must be a JSON object"}), 400
 
-        # Standardowa analiza
-        ndvi_data = [item for item in field_data if item.get('data_type') == 'ndvi']
-        moisture_data = [item for item in field_data if item.get('data_type') == 'soil_moisture']
+        # ?async=1 - analiza w puli zadań, od razu 202 z id zadania (status: GET /jobs/<id>).
+        # Zadania czekają na miejsce w bramce w pasie 'background'.
+        if request.args.get('async', '').lower() in ('1', 'true'):
+            try:
+                job_queue.check_callback_url(data.get('callback_url'))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            if job_queue.pending() >= Config.JOB_MAX_PENDING:
+                raise Overloaded('jobs', 'background', Config.ADMISSION_MAX_WAIT)
+
+            def run_job():
+                with admission_gates['analyze_field'].admit('background', bounded=False):
+                    return run_field_analysis(field_id, data)[0]
+
+            job = job_queue.submit('analyze_field', run_job, callback_url=data.get('callback_url'), field_id=field_id)
+            json_response = jsonify({
+                'job_id': job['id'],
+                'status': job['status'],
+                'status_url': f"/jobs/{job['id']}"
+            })
+            json_response.headers['Location'] = f"/jobs/{job['id']}"
+            return json_response, 202
 
-        # Uruchom podstawowe analizy
-        vegetation_analysis = analyze_ndvi(ndvi_data) if ndvi_data else None
-        moisture_analysis = predict_moisture(moisture_data) if moisture_data else None
-        anomalies = detect_anomalies(field_data, parameters.get('sensitivity', 'medium'))
+        with admission_gates['analyze_field'].admit(request_lane()):
+            response, cache_status = run_field_analysis(field_id, data)
 
-        # Generuj podstawowe rekomendacje
-        basic_recommendations = generate_basic_recommendations(vegetation_analysis, moisture_analysis, anomalies)
+        if data.get('parameters', {}).get('include_timings'):
+            response = dict(response, timings=timing_block())
 
-        # Przygotuj podstawową odpowiedź
-        response = {
-            'field_id': field_id,
-            'analysis_date': datetime.now().strftime('%Y-%m-%d'),
-            'vegetation_health': vegetation_analysis,
-            'soil_moisture': moisture_analysis,
-            'anomalies': anomalies,
-            'recommendations': basic_recommendations
-        }
+        json_response = jsonify(response)
+        json_response.headers['X-Cache'] = cache_status
+        return json_response
 
-        # Dodaj predykcję wzrostu jeśli jest wymagana
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.error(f"Analysis error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status zadania asynchronicznego (queued / running / done / failed) i wynik po zakończeniu"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job)
+
+
+@app.route('/analyze/fields:batch', methods=['POST'])
+@admitted('analyze_batch')
+def analyze_fields_batch():
+    """Analiza wielu pól w jednym żądaniu - analityki liczone wektorowo dla całej paczki"""
+    try:
+        data = json_object_body()
+        if data is None:
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        fields = data.get('fields', [])
+        parameters = data.get('parameters', {})
+        if not isinstance(fields, list) or not all(isinstance(field, dict) for field in fields):
+            return jsonify({"error": "fields must be a list of objects"}), 400
+
+        field_ids = [field.get('field_id') for field in fields]
+
+        # Wyniki kluczowane po field_id - brak lub powtórzenie id przypisałoby wynik złemu polu
+        if any(field_id is None for field_id in field_ids):
+            return jsonify({"error": "Every field requires a field_id"}), 400
+        duplicates = sorted(field_id for field_id, count in Counter(str(field_id) for field_id in field_ids).items() if count > 1)
+        if duplicates:
+            return jsonify({"error": f"Duplicate field_id values: {', '.join(duplicates)}"}), 400
+
+        # Dekodowanie danych każdego pola raz (grupowanie po typach, sortowanie po dacie)
+        with stage_timer('decode'):
+            decoded = [load_field_data(field_id, field) for field_id, field in zip(field_ids, fields)]
+        ndvi_by_field = {field_id: field_data.series('ndvi') for field_id, field_data in zip(field_ids, decoded)}
+        moisture_by_field = {field_id: field_data.series('soil_moisture') for field_id, field_data in zip(field_ids, decoded)}
+
+        with stage_timer('vegetation_health'):
+            vegetation_results = analyze_ndvi_batch(ndvi_by_field)
+        with stage_timer('soil_moisture'):
+            moisture_results = predict_moisture_batch(moisture_by_field)
+
+        growth_results = None
         if parameters.get('include_growth_prediction', False):
-            logger.info("Including growth prediction in analysis...")
+            with stage_timer('growth_prediction'):
+                growth_results = growth_predictor.predict_growth_batch(
+                    [(field_data, field.get('field_info', {})) for field_data, field in zip(decoded, fields)],
+                    parameters.get('prediction_days', 7),
+                    parameters.get('seed')
+                )
+
+        analysis_date = datetime.now().strftime('%Y-%m-%d')
+        results = {}
 
+        for i, (field_id, field_data) in enumerate(zip(field_ids, decoded)):
             try:
-                prediction_days = parameters.get('prediction_days', 7)
-                growth_prediction = growth_predictor.predict_growth(
-                    field_data, field_info, prediction_days
-                )
+                vegetation_analysis = vegetation_results[field_id]
+                moisture_analysis = moisture_results[field_id]
+                with stage_timer('anomalies'):
+                    anomalies = detect_anomalies(field_data, parameters.get('sensitivity', 'medium'), field_id=field_id)
+
+                with stage_timer('recommendations'):
+                    basic_recommendations = generate_basic_recommendations(vegetation_analysis, moisture_analysis, anomalies)
 
-                if 'error' not in growth_prediction:
-                    response['growth_prediction'] = growth_prediction
+                response = {
+                    'field_id': field_id,
+                    'analysis_date': analysis_date,
+                    'vegetation_health': vegetation_analysis,
+                    'soil_moisture': moisture_analysis,
+                    'anomalies': anomalies,
+                    'recommendations': basic_recommendations
+                }
 
-                    # Połącz rekomendacje z podstawowych analiz i predykcji
-                    growth_recommendations = growth_prediction.get('recommendations', [])
-                    response['recommendations'] = merge_recommendations(basic_recommendations, growth_recommendations)
+                if growth_results is not None:
+                    attach_growth_prediction(response, growth_results[i], basic_recommendations)
 
-                    logger.info("Growth prediction completed successfully")
-                else:
-                    logger.warning(f"Growth prediction error: {growth_prediction['error']}")
-                    response['growth_prediction'] = {'error': growth_prediction['error']}
+                results[str(field_id)] = response
 
             except Exception as e:
-                logger.error(f"Growth prediction failed: {str(e)}")
-                response['growth_prediction'] = {'error': f'Prediction failed: {str(e)}'}
+                logger.error(f"Batch analysis error for field {field_id}: {str(e)}")
+                results[str(field_id)] = {'field_id': field_id, 'error': str(e)}
 
-        return jsonify(response)
+        batch_response = {
+            'analysis_date': analysis_date,
+            'field_count': len(fields),
+            'results': results
+        }
+        if parameters.get('include_timings'):
+            batch_response['timings'] = timing_block()
+
+        return jsonify(batch_response)
 
     except Exception as e:
-        logger.error(f"Analysis error: {str(e)}")
+        logger.error(f"Batch analysis error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/analyze/ndvi/raster', methods=['POST'])
+@admitted('analyze_raster')
+def analyze_ndvi_raster():
+    """Analiza dużego rastra NDVI z pliku pod DATA_PATH - przetwarzanie kafelkami"""
+    try:
+        data = json_object_body() or {}
+        if not data.get('path'):
+            return jsonify({"error": "Missing raster path"}), 400
+
+        result = ndvi_analyzer.analyze_ndvi_raster(
+            data['path'],
+            rows=data.get('rows'),
+            cols=data.get('cols'),
+            dtype=data.get('dtype', 'float32'),
+            tile_size=int(data.get('tile_size', 1024))
+        )
+
+        return jsonify(result)
+
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        # Ścieżka spoza DATA_PATH, brak rows/cols, zły kształt lub brak poprawnych wartości
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Raster analysis error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/anomalies/stream/<int:field_id>', methods=['POST'])
+def ingest_stream_readings(field_id):
+    """Odczyty z czujników przesyłane na bieżąco - anomalie wykrywane od razu, bez historii"""
+    try:
+        data = json_object_body()
+        if data is None:
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        readings = data.get('readings', [data] if data.get('data_type') else [])
+        if not readings:
+            return jsonify({"error": "No readings provided"}), 400
+
+        anomalies = stream_detector.ingest(field_id, readings, data.get('parameters', {}).get('sensitivity', 'medium'))
+
+        return jsonify({
+            'field_id': field_id,
+            'ingested': len(readings),
+            'anomalies': anomalies,
+            'series': stream_detector.get_state(field_id)
+        })
+
+    except Exception as e:
+        logger.error(f"Stream ingest error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/features/<int:field_id>/ingest', methods=['POST'])
+def ingest_field_features(field_id):
+    """Dołącz nowe odczyty pola do magazynu cech - wystarczy przesłać tylko nowe wiersze"""
+    try:
+        data = json_object_body()
+        if data is None:
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        result = feature_store.ingest(field_id, data.get('field_data', []), data.get('field_info'))
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Feature ingest error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/predict/growth/<int:field_id>', methods=['POST'])
+@admitted('predict_growth')
+def predict_growth_from_store(field_id):
+    """Predykcja wzrostu z cech zapisanych w magazynie - bez przesyłania historii pola"""
+    try:
+        data = json_object_body() or {}
+        stored = feature_store.get_features(field_id)
+        if stored is None:
+            return jsonify({"error": f"No stored features for field {field_id}"}), 404
+
+        field_info = data.get('field_info') or stored['field_info']
+        current_features = growth_predictor.prepare_stored_features(stored['features'], field_info)
+        growth_prediction = growth_predictor.predict_from_features(
+            current_features, data.get('prediction_days', 7), data.get('seed')
+        )
+
+        if 'error' in growth_prediction:
+            return jsonify(growth_prediction), 503 if growth_prediction.get('model_status') in ('loading', 'training') else 500
+
+        if data.get('scenarios'):
+            growth_prediction['scenarios'] = growth_predictor.predict_scenarios_from_features(
+                current_features, data.get('prediction_days', 7), int(data['scenarios']), data.get('seed')
+            )
+
+        growth_prediction['features_updated_at'] = stored['updated_at']
+        return jsonify({'field_id': field_id, 'growth_prediction': growth_prediction})
+
+    except Exception as e:
+        logger.error(f"Stored feature prediction error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Statystyki cache wyników (trafienia/chybienia)"""
+    return jsonify(result_cache.stats())
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Metryki serwisu (wszystkie procesy robocze) w formacie tekstowym Prometheusa"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    """Stan bramek kontroli przyjęć tego procesu (aktywne analizy, kolejki pasów, odrzucenia)"""
+    return jsonify({
+        'gates': {name: gate.stats() for name, gate in admission_gates.items()},
+        'thread_budget': admission_budget.stats(),
+        'jobs_pending': job_queue.pending()
+    })
+
+
+def admin_auth_error():
+    """Odpowiedź 403 gdy token administracyjny nie jest skonfigurowany (endpointy wyłączone), 401 przy złym tokenie"""
+    if not Config.ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled (AI_ADMIN_TOKEN not set)"}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), Config.ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Unauthorized"}), 401
+    return None
+
+
+def load_then_swap(name, version, swap):
+    """
+    Wersja wczytywana w tym procesie przed podmianą wskaźnika w rejestrze (swap): błąd wczytania nie zmienia
+    aktywnej wersji, błąd podmiany przywraca w procesie poprzednio obsługiwaną wersję.
+    Zwraca nowy wskaźnik aktywnej wersji lub None, gdy wersji nie udało się wczytać.
+    """
+    predictor = served_models.get(name)
+    previous_bundle = predictor.bundle if predictor else None
+    if predictor and not predictor.load_model(version):
+        return None
+
+    try:
+        return swap()
+    except Exception:
+        if predictor:
+            predictor.bundle = previous_bundle
+        raise
+
+
+@app.route('/admin/models/<name>', methods=['GET'])
+def list_model_versions(name):
+    """Wersje modelu w rejestrze wraz z manifestami i aktywną wersją"""
+    auth_error = admin_auth_error()
+    if auth_error:
+        return auth_error
+    if name not in model_registries:
+        return jsonify({"error": f"Unknown model: {name}"}), 404
+
+    registry = model_registries[name]
+    return jsonify({
+        'name': name,
+        'active_version': registry.active_version(),
+        'versions': registry.list_versions()
+    })
+
+
+@app.route('/admin/models/<name>/promote', methods=['POST'])
+def promote_model_version(name):
+    """Aktywuj wersję modelu bez restartu - trwające żądania kończą się na poprzedniej wersji"""
+    auth_error = admin_auth_error()
+    if auth_error:
+        return auth_error
+    if name not in model_registries:
+        return jsonify({"error": f"Unknown model: {name}"}), 404
+
+    try:
+        version = (json_object_body() or {}).get('version')
+        if not version:
+            return jsonify({"error": "Missing version"}), 400
+
+        registry = model_registries[name]
+        if version not in [manifest['version'] for manifest in registry.list_versions()]:
+            return jsonify({"error": f"Unknown model version: {version}"}), 400
+
+        active = load_then_swap(name, version, lambda: registry.promote(version))
+        if active is None:
+            return jsonify({"error": f"Model version {version} could not be loaded"}), 400
+
+        return jsonify(active)
+
+    except Exception as e:
+        logger.error(f"Model promote error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/admin/models/<name>/rollback', methods=['POST'])
+def rollback_model_version(name):
+    """Przywróć poprzednio aktywną wersję modelu"""
+    auth_error = admin_auth_error()
+    if auth_error:
+        return auth_error
+    if name not in model_registries:
+        return jsonify({"error": f"Unknown model: {name}"}), 404
+
+    try:
+        registry = model_registries[name]
+        version = registry.previous_version()
+
+        active = load_then_swap(name, version, lambda: registry.rollback(expected=version))
+        if active is None:
+            return jsonify({"error": f"Model version {version} could not be loaded"}), 500
+
+        return jsonify(active)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Model rollback error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+# parameters sterujące tylko wykonaniem analizy, nie jej wynikiem
+EXECUTION_PARAMETERS = ('include_timings', 'concurrent_stages', 'stage_timeout')
+
+
+def run_field_analysis(field_id, data):
+    """Pełna analiza pola (żądanie synchroniczne lub zadanie w tle) - zwraca (odpowiedź, 'HIT' / 'MISS')"""
+    field_info = data.get('field_info', {})
+    parameters = data.get('parameters', {})
+
+    # Dekodowanie danych pola raz - wszystkie analizy korzystają z tych samych serii
+    with stage_timer('decode'):
+        field_data = load_field_data(field_id, data)
+
+    # Powtórzona analiza tych samych danych serwowana z cache.
+    # Predykcja wzrostu jest deterministyczna (seed z danych lub parameters.seed) - też cache'owana.
+    # Parametry wykonania (timings, tryb i limit czasu etapów) nie zmieniają pełnego wyniku - poza kluczem
+    result_parameters = {name: value for name, value in parameters.items() if name not in EXECUTION_PARAMETERS}
+    key = cache_key('analyze_field', field_id, datetime.now().strftime('%Y-%m-%d'), field_data.normalized(),
+                    field_info, result_parameters, growth_predictor.model_version)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached, 'HIT'
+
+    # Niezależne etapy na wspólnej puli wątków (lub kolejno: parameters.concurrent_stages = false).
+    # Etap przekraczający limit czasu lub zakończony błędem - odpowiedź częściowa zamiast 500.
+    ndvi_data = field_data.series('ndvi')
+    moisture_data = field_data.series('soil_moisture')
+    include_growth = parameters.get('include_growth_prediction', False)
+
+    stages = {
+        'vegetation_health': lambda: analyze_ndvi(ndvi_data) if ndvi_data else None,
+        'soil_moisture': lambda: predict_moisture(moisture_data) if moisture_data else None,
+        'anomalies': lambda: detect_anomalies(field_data, parameters.get('sensitivity', 'medium'), field_id=field_id)
+    }
+    if include_growth:
+        logger.info("Including growth prediction in analysis...")
+        stages['growth_prediction'] = lambda: predict_growth_stage(field_data, field_info, parameters)
+
+    results, stage_errors = stage_runner.run(
+        stages,
+        concurrent=parameters.get('concurrent_stages', Config.CONCURRENT_STAGES),
+        timeout=parameters.get('stage_timeout', Config.STAGE_TIMEOUT)
+    )
+
+    vegetation_analysis = results['vegetation_health']
+    moisture_analysis = results['soil_moisture']
+    anomalies = results['anomalies']
+
+    # Generuj podstawowe rekomendacje
+    with stage_timer('recommendations'):
+        basic_recommendations = generate_basic_recommendations(vegetation_analysis, moisture_analysis, anomalies)
+
+    # Przygotuj podstawową odpowiedź
+    response = {
+        'field_id': field_id,
+        'analysis_date': datetime.now().strftime('%Y-%m-%d'),
+        'vegetation_health': vegetation_analysis,
+        'soil_moisture': moisture_analysis,
+        'anomalies': anomalies,
+        'recommendations': basic_recommendations
+    }
+
+    # Dodaj predykcję wzrostu jeśli jest wymagana
+    if include_growth:
+        if 'growth_prediction' in stage_errors:
+            response['growth_prediction'] = {'error': f"Prediction failed: {stage_errors['growth_prediction']}"}
+        else:
+            growth_prediction, scenarios = results['growth_prediction']
+            attach_growth_prediction(response, growth_prediction, basic_recommendations)
+            if scenarios is not None:
+                response['growth_prediction']['scenarios'] = scenarios
+
+    # Odpowiedź częściowa nie trafia do cache - kolejne żądanie liczy analizę ponownie
+    if stage_errors:
+        response['partial'] = True
+        response['stage_errors'] = stage_errors
+        return response, 'MISS'
+
+    result_cache.set(key, response)
+    return response, 'MISS'
+
+
+def predict_growth_stage(field_data, field_info, parameters):
+    """Etap predykcji wzrostu: (predykcja, pasma scenariuszy lub None)"""
+    prediction_days = parameters.get('prediction_days', 7)
+    growth_prediction = growth_predictor.predict_growth(field_data, field_info, prediction_days, parameters.get('seed'))
+
+    # Opcjonalnie pasma niepewności z N scenariuszy (parameters.scenarios = N)
+    scenarios = None
+    if parameters.get('scenarios') and 'error' not in growth_prediction:
+        scenarios = growth_predictor.predict_growth_scenarios(
+            field_data, field_info, prediction_days, int(parameters['scenarios']), parameters.get('seed')
+        )
+    return growth_prediction, scenarios
+
+
+def load_field_data(field_id, payload):
+    """
+    Dane pola z payloadu, a gdy payload nie zawiera field_data - bezpośrednio z bazy
+    (opcjonalny zakres start_date/end_date)
+    """
+    if 'field_data' in payload:
+        return decode_field_data(payload['field_data'])
+
+    return field_data_reader.read_field_data(field_id, payload.get('start_date'), payload.get('end_date'))
+
+
+def attach_growth_prediction(response, growth_prediction, basic_recommendations):
+    """Dołącz wynik predykcji wzrostu do odpowiedzi i połącz rekomendacje"""
+    if 'error' not in growth_prediction:
+        response['growth_prediction'] = growth_prediction
+
+        # Połącz rekomendacje z podstawowych analiz i predykcji
+        growth_recommendations = growth_prediction.get('recommendations', [])
+        response['recommendations'] = merge_recommendations(basic_recommendations, growth_recommendations)
+
+        logger.info("Growth prediction completed successfully")
+    else:
+        logger.warning(f"Growth prediction error: {growth_prediction['error']}")
+        response['growth_prediction'] = {key: growth_prediction[key] for key in ('error', 'model_status') if key in growth_prediction}
+
+
 def generate_basic_recommendations(vegetation, moisture, anomalies):
     """Generuj podstawowe rekomendacje z analiz NDVI i wilgotności"""
     recommendations = []
@@ -126,7 +694,7 @@ def generate_basic_recommendations(vegetation, moisture, anomalies):
             })
 
     # Rekomendacje na podstawie anomalii
-    for anomaly in anomalies:
+    for anomaly in anomalies or []:
         if anomaly.get('severity') == 'high':
             recommendations.append({
                 'type': 'urgent',
@@ -175,5 +743,7 @@ def merge_recommendations(basic_recs, growth_recs):
 
 if __name__ == '__main__':
     logger.info("Starting Precision Agriculture AI API...")
+    job_queue.fail_unfinished()
+    start_background_tasks()
     logger.info(f"Growth prediction model status: {'loaded' if growth_predictor.model else 'not loaded'}")
     app.run(host='0.0.0.0', port=int(os.environ.get('AI_PORT', 5000)))
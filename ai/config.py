@@ -7,11 +7,66 @@ class Config:
     DB_USER = os.environ.get('DB_USER', 'root')
     DB_PASSWORD = os.environ.get('DB_PASSWORD', 'l3tm31n')
     DB_NAME = os.environ.get('DB_NAME', 'laravel')
+    DB_PORT = int(os.environ.get('DB_PORT', 3306))
 
-    MODEL_PATH = '/app/models'
+    MODEL_PATH = os.environ.get('MODEL_PATH', '/app/models')
 
     TENSORFLOW_DEVICE = os.environ.get('TENSORFLOW_DEVICE', 'cpu')
 
     API_URL = os.environ.get('AI_SERVICE_URL', 'http://localhost:5000')
 
-    DATA_PATH = '/app/data'
+    DATA_PATH = os.environ.get('DATA_PATH', '/app/data')
+
+    # Cache wyników analiz (TTL w sekundach, liczba wpisów w pamięci, warstwa dyskowa pod DATA_PATH)
+    RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', 600))
+    RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 256))
+    RESULT_CACHE_DISK = os.environ.get('RESULT_CACHE_DISK', '1') == '1'
+
+    # Token dla endpointów administracyjnych (/admin/...) - pusty wyłącza te endpointy (403)
+    ADMIN_TOKEN = os.environ.get('AI_ADMIN_TOKEN', '')
+
+    # Trening modelu wzrostu w procesie API gdy rejestr jest pusty ('0' - tylko modele z 'python -m train')
+    TRAIN_ON_STARTUP = os.environ.get('AI_TRAIN_ON_STARTUP', '1') == '1'
+
+    # Co ile sekund procesy robocze sprawdzają aktywne wersje modeli w rejestrze
+    MODEL_REFRESH_INTERVAL = int(os.environ.get('MODEL_REFRESH_INTERVAL', 30))
+
+    # Trening modeli: procesy walidacji krzyżowej (domyślnie wszystkie rdzenie), liczba podziałów, budżet czasu (s)
+    TRAINING_WORKERS = int(os.environ.get('TRAINING_WORKERS', 0)) or None
+    TRAINING_CV_FOLDS = int(os.environ.get('TRAINING_CV_FOLDS', 3))
+    TRAINING_TIME_BUDGET = int(os.environ.get('TRAINING_TIME_BUDGET', 600))
+
+    # Zadania asynchroniczne (?async=1): wątki w procesie roboczym, czas przechowywania wyników (s), limit callbacku (s)
+    JOB_WORKERS = int(os.environ.get('AI_JOB_WORKERS', 2))
+    JOB_TTL = int(os.environ.get('AI_JOB_TTL', 86400))
+    JOB_CALLBACK_TIMEOUT = int(os.environ.get('AI_JOB_CALLBACK_TIMEOUT', 10))
+    # Dozwolone hosty callback_url (lista po przecinku, np. 'laravel,app.example.com') - także w sieci wewnętrznej;
+    # pozostałe hosty tylko gdy rozwiązują się wyłącznie na publiczne adresy IP
+    JOB_CALLBACK_HOSTS = [host.strip().lower() for host in os.environ.get('AI_JOB_CALLBACK_HOSTS', '').split(',') if host.strip()]
+    JOB_MAX_PENDING = int(os.environ.get('AI_JOB_MAX_PENDING', 64))
+    # Zadanie 'queued' / 'running' starsze niż JOB_STALE_AFTER (s) uznawane za utracone (status 'failed')
+    JOB_STALE_AFTER = int(os.environ.get('AI_JOB_STALE_AFTER', 3600))
+
+    # Kontrola przyjęć (na proces roboczy): równoczesne analizy per endpoint, długość kolejek pasów
+    # interactive / background, maksymalne oczekiwanie (s) - po przekroczeniu 429 z Retry-After
+    ANALYZE_CONCURRENCY = int(os.environ.get('AI_ANALYZE_CONCURRENCY', 2))
+    BATCH_CONCURRENCY = int(os.environ.get('AI_BATCH_CONCURRENCY', 1))
+    PREDICT_CONCURRENCY = int(os.environ.get('AI_PREDICT_CONCURRENCY', 4))
+    RASTER_CONCURRENCY = int(os.environ.get('AI_RASTER_CONCURRENCY', 1))
+    ADMISSION_QUEUE = int(os.environ.get('AI_ADMISSION_QUEUE', 8))
+    ADMISSION_BACKGROUND_QUEUE = int(os.environ.get('AI_ADMISSION_BACKGROUND_QUEUE', 4))
+    ADMISSION_MAX_WAIT = int(os.environ.get('AI_ADMISSION_MAX_WAIT', 30))
+    # Wątki procesu roboczego gunicorna (gthread); bramki razem zajmują (analizy + kolejki) najwyżej
+    # THREADS - ADMISSION_HEADROOM wątków - reszta zawsze wolna dla /health, /jobs, /metrics i odpowiedzi 429
+    THREADS = int(os.environ.get('AI_THREADS', 16))
+    ADMISSION_HEADROOM = int(os.environ.get('AI_ADMISSION_HEADROOM', 4))
+    ADMISSION_THREADS = max(1, THREADS - ADMISSION_HEADROOM)
+
+    # Etapy analizy pola (NDVI, wilgotność, anomalie, predykcja) równolegle na wspólnej puli wątków,
+    # limit czasu etapu (s) - po przekroczeniu odpowiedź częściowa
+    CONCURRENT_STAGES = os.environ.get('AI_CONCURRENT_STAGES', '1') == '1'
+    STAGE_WORKERS = int(os.environ.get('AI_STAGE_WORKERS', 8))
+    STAGE_TIMEOUT = float(os.environ.get('AI_STAGE_TIMEOUT', 30))
+
+    # Metryki Prometheusa (/metrics): co ile sekund proces roboczy zapisuje migawkę pod DATA_PATH/metrics
+    METRICS_FLUSH_INTERVAL = int(os.environ.get('AI_METRICS_FLUSH_INTERVAL', 5))
@@ -0,0 +1,61 @@
+"""
+Konfiguracja gunicorna dla serwisu AI (produkcja): gunicorn -c gunicorn.conf.py app:app
+
+preload_app - app.py importowany raz w procesie głównym: modele z rejestru wczytane przed fork
+są współdzielone przez procesy robocze (copy-on-write). Wątki (trening, obserwacja rejestru)
+nie przetrwają fork, dlatego każdy proces roboczy uruchamia je w post_fork.
+
+Budżet wątków procesu roboczego (AI_THREADS): bramki kontroli przyjęć łącznie - analizy w toku
+i żądania czekające w kolejkach wszystkich bramek - zajmują najwyżej AI_THREADS - AI_ADMISSION_HEADROOM
+wątków (Config.ADMISSION_THREADS). Pozostałe AI_ADMISSION_HEADROOM wątków (domyślnie 4) zawsze obsługują
+/health, /jobs, /metrics i szybkie odpowiedzi 429, niezależnie od AI_*_CONCURRENCY i AI_ADMISSION_*QUEUE.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('AI_PORT', 5000)}"
+
+workers = int(os.environ.get('AI_WORKERS', 0)) or multiprocessing.cpu_count()
+# Wątki obsługują też żądania czekające w kolejkach kontroli przyjęć - w granicach budżetu opisanego wyżej
+# (ta sama zmienna i wartość domyślna co Config.THREADS)
+threads = int(os.environ.get('AI_THREADS', 16))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Długie analizy (predykcja wzrostu, scenariusze) - limit czasu żądania w sekundach
+timeout = int(os.environ.get('AI_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('AI_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('AI_KEEPALIVE', 5))
+
+# Okresowy restart procesów roboczych (0 - wyłączony)
+max_requests = int(os.environ.get('AI_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('AI_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # Liczniki /metrics od zera przy każdym starcie serwisu - migawki z poprzedniego uruchomienia usuwane,
+    # pomiary procesu głównego (wczytanie modeli z preload_app) zapisywane raz w jego migawce
+    from analytics.metrics import metrics
+    metrics.clear()
+    metrics.flush()
+    # Zadania niezakończone przed restartem nie mają już wykonawcy (pule wątków procesów roboczych)
+    import app
+    app.job_queue.fail_unfinished()
+
+
+def pre_fork(server, worker):
+    # Obiekty wczytane w procesie głównym poza GC - zliczanie referencji nie kopiuje ich stron w procesach roboczych
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import app
+    app.metrics.reset()
+    app.start_background_tasks()
+    server.log.info(f"Worker {worker.pid} started (growth model: {app.growth_predictor.status})")
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import logging
+
+from config import Config
+from .field_data import FieldData
+
+try:
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.engine import URL
+except ImportError:  # sqlalchemy/pymysql są w obrazie Dockera, lokalnie mogą nie być zainstalowane
+    create_engine = None
+
+logger = logging.getLogger(__name__)
+
+FIELD_DATA_QUERY = """
+    SELECT id, field_id, collection_date, data_type, data, latitude, longitude, metadata
+    FROM field_data
+    WHERE field_id = :field_id{date_filters}
+    ORDER BY collection_date, id
+"""
+
+
+def _decode_json(value):
+    if value is None or isinstance(value, dict):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    try:
+        return json.loads(value)
+    except ValueError:
+        return {}
+
+
+class FieldDataReader:
+    """
+    Odczyt historii pola bezpośrednio z tabeli field_data (baza Laravela, ustawienia z Config).
+    Pula połączeń tworzona leniwie w każdym procesie; wiersze czytane kursorem
+    po stronie serwera partiami po chunk_size, bez ładowania całego wyniku naraz.
+    """
+
+    def __init__(self, chunk_size=5000, pool_size=5):
+        self.chunk_size = chunk_size
+        self.pool_size = pool_size
+        self._engine = None
+        self._engine_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return create_engine is not None
+
+    def _get_engine(self):
+        # Pula nie może być współdzielona między procesami po fork
+        with self._lock:
+            if self._engine is None or self._engine_pid != os.getpid():
+                if create_engine is None:
+                    raise RuntimeError("sqlalchemy is not installed - database reader unavailable")
+
+                url = URL.create(
+                    'mysql+pymysql',
+                    username=Config.DB_USER,
+                    password=Config.DB_PASSWORD,
+                    host=Config.DB_HOST,
+                    port=Config.DB_PORT,
+                    database=Config.DB_NAME,
+                    query={'charset': 'utf8mb4'}
+                )
+                self._engine = create_engine(url, pool_size=self.pool_size, pool_pre_ping=True, pool_recycle=3600)
+                self._engine_pid = os.getpid()
+            return self._engine
+
+    def iter_rows(self, field_id, date_from=None, date_to=None):
+        """Odczyty pola w formacie payloadu z Laravela, od najstarszego, strumieniowo"""
+        # Warunki dat tylko gdy podane - zakres po indeksie (field_id, collection_date, data_type)
+        params = {'field_id': field_id}
+        date_filters = ''
+        if date_from:
+            params['date_from'] = date_from
+            date_filters += ' AND collection_date >= :date_from'
+        if date_to:
+            params['date_to'] = date_to
+            date_filters += ' AND collection_date <= :date_to'
+
+        query = text(FIELD_DATA_QUERY.format(date_filters=date_filters))
+
+        with self._get_engine().connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(query, params)
+            while True:
+                rows = result.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+
+                for row in rows:
+                    yield {
+                        'id': row.id,
+                        'field_id': row.field_id,
+                        'collection_date': str(row.collection_date)[:10] if row.collection_date else None,
+                        'data_type': row.data_type,
+                        'data': _decode_json(row.data) or {},
+                        'latitude': float(row.latitude) if row.latitude is not None else None,
+                        'longitude': float(row.longitude) if row.longitude is not None else None,
+                        'metadata': _decode_json(row.metadata)
+                    }
+
+    def read_field_data(self, field_id, date_from=None, date_to=None):
+        """Historia pola jako FieldData (serie per data_type z tablicami NumPy)"""
+        field_data = FieldData(list(self.iter_rows(field_id, date_from, date_to)))
+        logger.info(f"Read {len(field_data)} field_data rows for field {field_id} from database")
+        return field_data
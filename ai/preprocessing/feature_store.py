@@ -0,0 +1,244 @@
+import sqlite3
+import hashlib
+import json
+import os
+from contextlib import closing
+from datetime import datetime
+import logging
+
+from config import Config
+from .field_data import decode_field_data
+
+logger = logging.getLogger(__name__)
+
+# Okna (liczba ostatnich odczytów) dla cech liczonych jak w PlantGrowthPredictor.prepare_features
+WINDOWS = {
+    'ndvi': 7,
+    'soil_moisture': 7,
+    'weather': 3,
+    'sunlight': 3,
+    'soil_temperature': 1,
+    'biomass_measurement': 1
+}
+
+# data_type -> klucz listy wartości (statystyki count/sum/min/max per odczyt)
+VALUE_LISTS = {
+    'ndvi': 'ndvi_values',
+    'soil_moisture': 'moisture_values'
+}
+
+# data_type -> pola skalarne zachowywane z odczytu
+SCALARS = {
+    'weather': ('temperature_avg', 'rainfall'),
+    'sunlight': ('sunshine_hours',),
+    'soil_temperature': ('avg_temperature',),
+    'biomass_measurement': ('plant_height_cm', 'plant_density_per_m2')
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    field_id INTEGER NOT NULL,
+    data_type TEXT NOT NULL,
+    reading_key TEXT NOT NULL,
+    collection_date TEXT,
+    value_count INTEGER,
+    value_sum REAL,
+    value_min REAL,
+    value_max REAL,
+    scalars TEXT,
+    PRIMARY KEY (field_id, data_type, reading_key)
+);
+CREATE INDEX IF NOT EXISTS readings_recent ON readings (field_id, data_type, collection_date);
+CREATE TABLE IF NOT EXISTS fields (
+    field_id INTEGER PRIMARY KEY,
+    field_info TEXT,
+    fertilizer_nitrogen REAL NOT NULL DEFAULT 0,
+    fertilizer_phosphorus REAL NOT NULL DEFAULT 0,
+    fertilizer_potassium REAL NOT NULL DEFAULT 0,
+    features TEXT,
+    updated_at TEXT
+);
+"""
+
+
+class FeatureStore:
+    """
+    Magazyn cech pól w SQLite pod Config.DATA_PATH.
+    Nowe odczyty zapisywane są jako podsumowania (count/sum/min/max lub pola skalarne),
+    dla każdego typu trzymane jest tylko okno ostatnich odczytów, nawozy sumowane narastająco.
+    Po każdym zapisie cechy pola są przeliczane z okien i zapisywane - odczyt to jeden wiersz.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(Config.DATA_PATH, 'feature_store.sqlite3')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Połączenie per operacja - bezpieczne dla wątków i procesów roboczych
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def ingest(self, field_id, field_data, field_info=None):
+        """Dołącz nowe odczyty pola (duplikaty pomijane) i przelicz jego cechy"""
+        field_data = decode_field_data(field_data)
+        inserted = 0
+
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('INSERT OR IGNORE INTO fields (field_id) VALUES (?)', (field_id,))
+                if field_info:
+                    conn.execute('UPDATE fields SET field_info = ? WHERE field_id = ?', (json.dumps(field_info), field_id))
+
+                for data_type in field_data.data_types():
+                    series = field_data.series(data_type)
+                    if data_type == 'fertilizer_application':
+                        inserted += self._ingest_fertilizer(conn, field_id, series)
+                    elif data_type in WINDOWS:
+                        inserted += self._ingest_window(conn, field_id, data_type, series)
+
+                features = self._compute_features(conn, field_id)
+                conn.execute('UPDATE fields SET features = ?, updated_at = ? WHERE field_id = ?',
+                             (json.dumps(features), datetime.now().isoformat(), field_id))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        logger.info(f"Feature store: field {field_id} ingested {inserted} new readings")
+        return {'field_id': field_id, 'ingested': inserted, 'features': features}
+
+    def _reading_key(self, item, data):
+        if item.get('id') is not None:
+            return str(item['id'])
+        payload = json.dumps(data, sort_keys=True, default=str)
+        return f"{item.get('collection_date')}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+    def _ingest_window(self, conn, field_id, data_type, series):
+        rows = []
+        if data_type in VALUE_LISTS:
+            values, offsets = series.values(VALUE_LISTS[data_type])
+            for i, (item, data) in enumerate(zip(series.items, series.data)):
+                chunk = values[offsets[i]:offsets[i + 1]]
+                stats = (int(chunk.size), float(chunk.sum()), float(chunk.min()), float(chunk.max())) if chunk.size else (0, 0.0, None, None)
+                rows.append((field_id, data_type, self._reading_key(item, data), item.get('collection_date'), *stats, None))
+        else:
+            for item, data in zip(series.items, series.data):
+                scalars = {key: data[key] for key in SCALARS[data_type] if key in data}
+                rows.append((field_id, data_type, self._reading_key(item, data), item.get('collection_date'),
+                             None, None, None, None, json.dumps(scalars)))
+
+        # Odczyty starsze niż pełne okno i tak by do niego nie weszły (np. ponownie przesłana historia)
+        window = conn.execute(
+            'SELECT COUNT(*), MIN(collection_date) FROM readings WHERE field_id = ? AND data_type = ?', (field_id, data_type)
+        ).fetchone()
+        if window[0] >= WINDOWS[data_type] and window[1] is not None:
+            rows = [row for row in rows if (row[3] or '') >= window[1]]
+
+        before = conn.total_changes
+        conn.executemany('INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        inserted = conn.total_changes - before
+
+        # Okno - zostaw tylko ostatnie odczyty danego typu
+        conn.execute("""
+            DELETE FROM readings WHERE field_id = ? AND data_type = ? AND rowid NOT IN (
+                SELECT rowid FROM readings WHERE field_id = ? AND data_type = ?
+                ORDER BY collection_date DESC, rowid DESC LIMIT ?
+            )
+        """, (field_id, data_type, field_id, data_type, WINDOWS[data_type]))
+
+        return inserted
+
+    def _ingest_fertilizer(self, conn, field_id, series):
+        """Nawozy - suma narastająca; klucze odczytów trzymane dla pominięcia duplikatów"""
+        inserted = 0
+        totals = {'fertilizer_nitrogen': 0.0, 'fertilizer_phosphorus': 0.0, 'fertilizer_potassium': 0.0}
+
+        for item, data in zip(series.items, series.data):
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO readings (field_id, data_type, reading_key, collection_date) VALUES (?, 'fertilizer_application', ?, ?)",
+                (field_id, self._reading_key(item, data), item.get('collection_date'))
+            )
+            if not cursor.rowcount:
+                continue
+            inserted += 1
+
+            fert_type = data.get('fertilizer_type', '').lower()
+            amount = data.get('amount_per_hectare', 0)
+
+            if 'nitrogen' in fert_type or 'n' in fert_type:
+                totals['fertilizer_nitrogen'] += amount
+            elif 'phosphorus' in fert_type or 'p' in fert_type:
+                totals['fertilizer_phosphorus'] += amount
+            elif 'potassium' in fert_type or 'k' in fert_type:
+                totals['fertilizer_potassium'] += amount
+
+        conn.execute("""
+            UPDATE fields SET fertilizer_nitrogen = fertilizer_nitrogen + ?,
+                fertilizer_phosphorus = fertilizer_phosphorus + ?, fertilizer_potassium = fertilizer_potassium + ?
+            WHERE field_id = ?
+        """, (totals['fertilizer_nitrogen'], totals['fertilizer_phosphorus'], totals['fertilizer_potassium'], field_id))
+
+        return inserted
+
+    def _window(self, conn, field_id, data_type):
+        """Odczyty okna od najstarszego do najnowszego"""
+        rows = conn.execute("""
+            SELECT value_count, value_sum, value_min, value_max, scalars FROM readings
+            WHERE field_id = ? AND data_type = ? ORDER BY collection_date DESC, rowid DESC LIMIT ?
+        """, (field_id, data_type, WINDOWS[data_type])).fetchall()
+        return rows[::-1]
+
+    def _compute_features(self, conn, field_id):
+        """Cechy zależne od danych (bez cech czasowych i pola) - te same wartości co prepare_features"""
+        features = {}
+
+        for data_type, prefix, defaults in (('ndvi', 'ndvi', (0.5, 0.3, 0.7)), ('soil_moisture', 'moisture', (0.45, 0.25, 0.65))):
+            rows = [row for row in self._window(conn, field_id, data_type) if row[0]]
+            count = sum(row[0] for row in rows)
+            if count:
+                features[f'avg_{prefix}'] = sum(row[1] for row in rows) / count
+                features[f'min_{prefix}'] = min(row[2] for row in rows)
+                features[f'max_{prefix}'] = max(row[3] for row in rows)
+            else:
+                features.update(dict(zip((f'avg_{prefix}', f'min_{prefix}', f'max_{prefix}'), defaults)))
+
+        weather = [json.loads(row[4]) for row in self._window(conn, field_id, 'weather')]
+        features['avg_temperature'] = sum(w.get('temperature_avg', 20) for w in weather) / len(weather) if weather else 20
+        features['rainfall'] = sum(w.get('rainfall', 0) for w in weather)
+
+        soil_temperature = [json.loads(row[4]) for row in self._window(conn, field_id, 'soil_temperature')]
+        features['soil_temperature'] = soil_temperature[-1].get('avg_temperature', 16) if soil_temperature else 16
+
+        sunlight = [json.loads(row[4]) for row in self._window(conn, field_id, 'sunlight')]
+        features['sunshine_hours'] = sum(s.get('sunshine_hours', 8) for s in sunlight) / len(sunlight) if sunlight else 8
+
+        features.update(dict(zip(
+            ('fertilizer_nitrogen', 'fertilizer_phosphorus', 'fertilizer_potassium'),
+            conn.execute('SELECT fertilizer_nitrogen, fertilizer_phosphorus, fertilizer_potassium FROM fields WHERE field_id = ?',
+                         (field_id,)).fetchone()
+        )))
+
+        # Wysokość bez pomiaru biomasy szacowana później z dni od sadzenia
+        biomass = [json.loads(row[4]) for row in self._window(conn, field_id, 'biomass_measurement')]
+        features['plant_height'] = biomass[-1].get('plant_height_cm', 50) if biomass else None
+        features['plant_density'] = biomass[-1].get('plant_density_per_m2', 225) if biomass else 225
+
+        return features
+
+    def get_features(self, field_id):
+        """Zapisane cechy pola i field_info (lub None jeśli pole nie ma danych w magazynie)"""
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT features, field_info, updated_at FROM fields WHERE field_id = ?', (field_id,)).fetchone()
+
+        if row is None or row[0] is None:
+            return None
+
+        return {
+            'features': json.loads(row[0]),
+            'field_info': json.loads(row[1]) if row[1] else {},
+            'updated_at': row[2]
+        }
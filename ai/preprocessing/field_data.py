@@ -0,0 +1,119 @@
+import numpy as np
+import json
+from itertools import chain
+
+
+def _decode(data):
+    """Pole data jako dict - JSON w stringu dekodowany raz, niepoprawne dane jako pusty dict"""
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return {}
+    return data if isinstance(data, dict) else {}
+
+
+class FieldSeries:
+    """
+    Odczyty jednego data_type posortowane po collection_date.
+    Listy wartości (np. ndvi_values) materializowane raz jako jedna tablica NumPy
+    z offsetami odczytów: odczyt i to values[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, items):
+        self.items = sorted(items, key=lambda item: item.get('collection_date') or '')
+        self.data = [_decode(item.get('data')) for item in self.items]
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def dates(self):
+        return [item.get('collection_date') for item in self.items]
+
+    def values(self, key):
+        """(values, offsets) dla list `key` wszystkich odczytów"""
+        if ('values', key) not in self._cache:
+            lists = [data.get(key) or [] for data in self.data]
+            offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+            np.cumsum(np.fromiter(map(len, lists), dtype=np.int64, count=len(lists)), out=offsets[1:])
+            values = np.fromiter(chain.from_iterable(lists), dtype=float, count=int(offsets[-1]))
+            self._cache[('values', key)] = (values, offsets)
+        return self._cache[('values', key)]
+
+    def tail(self, key, readings):
+        """Wartości `key` z ostatnich `readings` odczytów"""
+        values, offsets = self.values(key)
+        return values[offsets[max(0, len(self.items) - readings)]:]
+
+    def means(self, key):
+        """Średnia listy `key` dla każdego odczytu (NaN dla odczytów bez wartości)"""
+        if ('means', key) not in self._cache:
+            values, offsets = self.values(key)
+            lengths = np.diff(offsets)
+            nonempty = lengths > 0
+            means = np.full(len(self.items), np.nan)
+            if values.size:
+                means[nonempty] = np.add.reduceat(values, offsets[:-1][nonempty]) / lengths[nonempty]
+            self._cache[('means', key)] = means
+        return self._cache[('means', key)]
+
+    def scalars(self, key, default):
+        """Wartość skalarna `key` każdego odczytu (default gdy brak)"""
+        if ('scalars', key, default) not in self._cache:
+            self._cache[('scalars', key, default)] = np.fromiter(
+                (data.get(key, default) for data in self.data), dtype=float, count=len(self.data)
+            )
+        return self._cache[('scalars', key, default)]
+
+    def latest(self):
+        """Dane (dict) najnowszego odczytu"""
+        return self.data[-1] if self.data else {}
+
+
+class FieldData:
+    """Dane pola pogrupowane po data_type w jednym przejściu po payloadzie"""
+
+    def __init__(self, field_data):
+        grouped = {}
+        for item in field_data or []:
+            grouped.setdefault(item.get('data_type'), []).append(item)
+
+        self.count = len(field_data or [])
+        self._series = {data_type: FieldSeries(items) for data_type, items in grouped.items()}
+        self._empty = FieldSeries([])
+
+    def __len__(self):
+        return self.count
+
+    def series(self, data_type):
+        return self._series.get(data_type, self._empty)
+
+    def data_types(self):
+        return list(self._series)
+
+    def normalized(self):
+        """Znormalizowana postać odczytów (typ, data, id, dane) - podstawa kluczy cache"""
+        return [
+            (data_type, item.get('collection_date'), item.get('id'), data)
+            for data_type in sorted(self._series, key=str)
+            for item, data in zip(self._series[data_type].items, self._series[data_type].data)
+        ]
+
+
+def decode_field_data(field_data):
+    """Surowa lista field_data -> FieldData (już zdekodowane dane zwracane bez zmian)"""
+    if isinstance(field_data, FieldData):
+        return field_data
+    return FieldData(field_data)
+
+
+def as_series(items):
+    """Lista odczytów jednego typu -> FieldSeries (FieldSeries zwracane bez zmian)"""
+    if isinstance(items, FieldSeries):
+        return items
+    return FieldSeries(items or [])
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Moduły serwisu importowane jak w app.py (analytics.*, config) - katalog ai/ na ścieżce
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Config czyta środowisko przy imporcie - dane i modele testów w katalogu tymczasowym, bez treningu przy starcie
+_test_root = tempfile.mkdtemp(prefix='ai-tests-')
+os.environ.setdefault('DATA_PATH', os.path.join(_test_root, 'data'))
+os.environ.setdefault('MODEL_PATH', os.path.join(_test_root, 'models'))
+os.environ.setdefault('AI_TRAIN_ON_STARTUP', '0')
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+# Mała siatka kandydatów - model wzrostu trenowany raz na sesję testów (kilka sekund)
+TEST_CANDIDATES = [
+    {'estimator': 'RandomForest', 'params': {'n_estimators': 30, 'max_depth': 10}},
+    {'estimator': 'GradientBoosting', 'params': {'n_estimators': 50, 'max_depth': 3}}
+]
+
+
+@pytest.fixture(scope='session')
+def trained_predictor(tmp_path_factory):
+    from analytics.model_registry import ModelRegistry
+    from analytics.plant_growth_prediction import PlantGrowthPredictor
+
+    predictor = PlantGrowthPredictor(registry=ModelRegistry('growth_model', str(tmp_path_factory.mktemp('registry'))),
+                                     auto_init=False)
+    assert predictor.create_and_train_model(TEST_CANDIDATES, n_fields=1)
+    return predictor
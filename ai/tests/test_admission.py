@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from analytics.admission import AdmissionGate, Overloaded, ThreadBudget
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_released_slots_admit_several_queued_waiters():
+    """Dwa miejsca zwolnione naraz - wejść muszą dwaj pierwsi oczekujący, nie tylko czoło kolejki"""
+    gate = AdmissionGate('test', limit=2, max_wait=10)
+    gate._acquire('interactive', bounded=True)
+    gate._acquire('interactive', bounded=True)
+
+    admitted = []
+    finish = threading.Event()
+
+    def waiter(i):
+        with gate.admit('interactive'):
+            admitted.append(i)
+            finish.wait()
+
+    threads = [threading.Thread(target=waiter, args=(i,), daemon=True) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    assert wait_until(lambda: gate.stats()['waiting']['interactive'] == 4)
+
+    # Oba zwolnienia zanim którykolwiek oczekujący się obudzi
+    with gate._condition:
+        gate._release(0)
+        gate._release(0)
+
+    assert wait_until(lambda: len(admitted) == 2)
+    assert sorted(admitted) == [0, 1]
+    assert gate.stats()['active'] == 2
+
+    finish.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert sorted(admitted) == [0, 1, 2, 3]
+    assert gate.stats()['active'] == 0
+
+
+def test_background_lane_waits_for_interactive():
+    gate = AdmissionGate('test', limit=1, max_wait=10)
+    gate._acquire('interactive', bounded=True)
+
+    admitted = []
+    finish = threading.Event()
+
+    def waiter(lane):
+        with gate.admit(lane):
+            admitted.append(lane)
+            finish.wait()
+
+    background = threading.Thread(target=waiter, args=('background',), daemon=True)
+    background.start()
+    assert wait_until(lambda: gate.stats()['waiting']['background'] == 1)
+    interactive = threading.Thread(target=waiter, args=('interactive',), daemon=True)
+    interactive.start()
+    assert wait_until(lambda: gate.stats()['waiting']['interactive'] == 1)
+
+    gate._release(0)
+    assert wait_until(lambda: admitted == ['interactive'])
+
+    finish.set()
+    for thread in (background, interactive):
+        thread.join(timeout=5)
+    assert admitted == ['interactive', 'background']
+
+
+def test_shared_thread_budget_rejects_beyond_capacity():
+    """Analizy i kolejki wszystkich bramek razem nie przekraczają budżetu wątków"""
+    budget = ThreadBudget(3)
+    gates = [AdmissionGate(name, limit=1, max_wait=10, budget=budget) for name in ('first', 'second')]
+
+    finish = threading.Event()
+    entered = []
+
+    def worker(gate):
+        with gate.admit('interactive'):
+            entered.append(gate.name)
+            finish.wait()
+
+    threads = [threading.Thread(target=worker, args=(gate,), daemon=True) for gate in (gates[0], gates[1], gates[0])]
+    for thread in threads:
+        thread.start()
+    assert wait_until(lambda: budget.stats()['used'] == 3 and gates[0].stats()['waiting']['interactive'] == 1)
+
+    # Kolejka bramki ma miejsce, ale budżet wątków jest wyczerpany - odrzucenie bez czekania
+    started = time.time()
+    with pytest.raises(Overloaded):
+        with gates[1].admit('interactive'):
+            pass
+    assert time.time() - started < 1
+    assert budget.stats()['rejected'] == 1
+
+    finish.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert sorted(entered) == ['first', 'first', 'second']
+    assert budget.stats()['used'] == 0
@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+from analytics.advanced_ndvi_analyzer import AdvancedNDVIAnalyzer
+
+
+def dense_weight_matrix(rows, cols):
+    """Macierz wag jak w pierwotnej implementacji (pętle po parach komórek), dla dowolnego kształtu"""
+    n = rows * cols
+    W = np.zeros((n, n))
+    for i in range(rows):
+        for j in range(cols):
+            for ii in range(rows):
+                for jj in range(cols):
+                    dist = abs(i - ii) + abs(j - jj)
+                    if dist == 1:
+                        W[i * cols + j, ii * cols + jj] = 1.0
+                    elif dist == 2:
+                        W[i * cols + j, ii * cols + jj] = 0.5
+                    elif 2 < dist <= 4:
+                        W[i * cols + j, ii * cols + jj] = 0.2
+    row_sums = W.sum(axis=1)
+    return np.divide(W, row_sums[:, np.newaxis], out=np.zeros_like(W), where=row_sums[:, np.newaxis] != 0)
+
+
+def dense_moran_i(grid):
+    """Moran's I pierwotnego algorytmu: podwójna pętla po parach komórek"""
+    values = grid.ravel()
+    n = len(values)
+    W = dense_weight_matrix(*grid.shape)
+    z = values - values.mean()
+    numerator = sum(W[i, j] * z[i] * z[j] for i in range(n) for j in range(n) if i != j)
+    return (n / W.sum()) * (numerator / (z @ z))
+
+
+def smooth_grid(rows, cols, seed):
+    rng = np.random.default_rng(seed)
+    r, c = np.indices((rows, cols))
+    return 0.6 + 0.2 * np.sin(r / 3.0) * np.cos(c / 4.0) + rng.normal(0, 0.05, (rows, cols))
+
+
+@pytest.fixture
+def analyzer():
+    return AdvancedNDVIAnalyzer()
+
+
+@pytest.mark.parametrize('shape, seed', [((10, 10), 0), ((7, 13), 1), ((3, 4), 2), ((12, 5), 3)])
+def test_sparse_moran_matches_dense_baseline(analyzer, shape, seed):
+    grid = smooth_grid(*shape, seed)
+    result = analyzer._calculate_spatial_autocorrelation(grid)
+    assert result['moran_i'] == pytest.approx(dense_moran_i(grid), rel=1e-10)
+
+
+def test_random_grid_has_no_clustering(analyzer):
+    grid = np.random.default_rng(4).uniform(0.2, 0.9, (10, 10))
+    result = analyzer._calculate_spatial_autocorrelation(grid)
+    assert result['moran_i'] == pytest.approx(dense_moran_i(grid), rel=1e-10)
+    assert result['interpretation'] == 'moderate_pattern'
+
+
+def test_cached_weight_matrix_matches_dense(analyzer):
+    W = analyzer._create_agricultural_weight_matrix((9, 11))
+    np.testing.assert_allclose(W.toarray(), dense_weight_matrix(9, 11))
+    assert analyzer._create_agricultural_weight_matrix((9, 11)) is W
+
+
+@pytest.mark.parametrize('shape', [(10, 10), (7, 13), (40, 25)])
+def test_stencil_moran_matches_sparse_matrix(analyzer, shape):
+    """Duże gridy liczone przesunięciami tablic - ten sam wynik co macierz CSR"""
+    grid = smooth_grid(*shape, seed=5)
+    sparse_result = analyzer._calculate_spatial_autocorrelation(grid)
+
+    analyzer.MAX_SPARSE_CELLS = 0
+    stencil_result = analyzer._calculate_spatial_autocorrelation(grid)
+    assert stencil_result['moran_i'] == pytest.approx(sparse_result['moran_i'], rel=1e-10)
+    if grid.size <= 100:
+        assert stencil_result['moran_i'] == pytest.approx(dense_moran_i(grid), rel=1e-10)
+
+
+def test_grid_shape_from_payload(analyzer):
+    values = smooth_grid(6, 15, seed=6)
+    reading = {'collection_date': '2026-05-01', 'data': {'ndvi_values': values.ravel().tolist(), 'rows': 6, 'cols': 15}}
+    np.testing.assert_array_equal(analyzer._build_ndvi_grid([reading]), values)
+
+    # Metadane, argument i kwadrat jako domyślny kształt
+    reading = {'collection_date': '2026-05-02', 'data': {'ndvi_values': values.ravel().tolist()}, 'metadata': {'rows': 15, 'cols': 6}}
+    assert analyzer._build_ndvi_grid([reading]).shape == (15, 6)
+    assert analyzer._build_ndvi_grid([reading], grid_shape=(9, 10)).shape == (9, 10)
+    assert analyzer._build_ndvi_grid([{'data': {'ndvi_values': [0.5] * 49}}]).shape == (7, 7)
+
+    # Kształt niezgodny z liczbą punktów - bez analizy przestrzennej
+    assert analyzer._build_ndvi_grid([reading], grid_shape=(8, 8)) is None
+    assert analyzer._build_ndvi_grid([{'data': {'ndvi_values': [0.5] * 50}}]) is None
+
+
+def test_non_square_field_gets_spatial_analysis(analyzer):
+    values = smooth_grid(12, 30, seed=7)
+    result = analyzer.analyze_advanced_ndvi([{'collection_date': '2026-05-01',
+                                              'data': {'ndvi_values': values.ravel().tolist(), 'rows': 12, 'cols': 30}}])
+    spatial = result['spatial_analysis']
+    assert spatial['spatial_autocorrelation']['moran_i'] == pytest.approx(
+        analyzer._calculate_spatial_autocorrelation(values)['moran_i'])
+    assert spatial['spatial_autocorrelation']['interpretation'] == 'high_clustering'
+
+
+def cluster_summary(clusters):
+    return sorted((c['size'], round(c['center'][0], 9), round(c['center'][1], 9), c['severity']) for c in clusters)
+
+
+@pytest.mark.parametrize('shape, density, seed', [((10, 10), 0.3, 8), ((25, 40), 0.15, 9), ((30, 30), 0.45, 10), ((1, 20), 0.5, 11)])
+def test_label_clusters_match_dbscan(analyzer, shape, density, seed):
+    """Spójne składowe (8-sąsiedztwo) dają te same klastry co DBSCAN(eps=1.5, min_samples=2)"""
+    rng = np.random.default_rng(seed)
+    grid = rng.uniform(0.1, 0.9, shape)
+    mask = rng.random(shape) < density
+
+    labelled = analyzer._label_clusters(mask, grid)
+    assert labelled
+    assert cluster_summary(labelled) == cluster_summary(analyzer._dbscan_clusters(mask, grid))
+
+
+def test_problem_cluster_report_is_method_independent(analyzer):
+    grid = smooth_grid(20, 20, seed=12)
+    label_report = analyzer._detect_problem_clusters(grid)
+    dbscan_report = analyzer._detect_problem_clusters(grid, method='dbscan')
+
+    assert label_report['cluster_count'] == dbscan_report['cluster_count'] > 0
+    assert label_report['total_problem_area'] == dbscan_report['total_problem_area']
+    assert label_report['clusters'] == dbscan_report['clusters']
+    assert [c['cluster_id'] for c in label_report['clusters']] == list(range(len(label_report['clusters'])))
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from analytics.anomaly_detection import AnomalyModelStore
+
+
+def readings(count, start=0, seed=0):
+    rng = np.random.default_rng(seed)
+    keys = list(range(start, start + count))
+    dates = [f"2026-{1 + i // 28:02d}-{1 + i % 28:02d}" for i in keys]
+    return keys, rng.normal(0.5, 0.1, count).tolist(), dates
+
+
+def count_fits(store):
+    fits = []
+    fit = store._fit
+    store._fit = lambda entry: (fits.append(len(entry['history'])), fit(entry))
+    return fits
+
+
+def test_capped_history_is_fitted_once_for_repeated_requests():
+    store = AnomalyModelStore(max_history=100)
+    fits = count_fits(store)
+    keys, values, dates = readings(150)
+
+    windows = []
+    for _ in range(6):
+        store.score(1, 'ndvi', keys, values, 0.05, dates)
+        windows.append(sorted(store._entries[(1, 'ndvi')]['history']))
+
+    # Okno to 100 najnowszych odczytów wg daty, starsze są tylko oceniane
+    assert fits == [100]
+    assert all(window == keys[50:] for window in windows)
+
+
+def test_window_stats_follow_dates_not_arrival_order():
+    store = AnomalyModelStore(max_history=100)
+    keys, values, dates = readings(300)
+
+    # Nowsze odczyty przychodzą przed starszymi
+    for chunk in (slice(200, 300), slice(0, 100), slice(100, 200)):
+        is_anomaly, mean_value, std_value = store.score(1, 'ndvi', keys[chunk], values[chunk], 0.05, dates[chunk])
+        assert len(is_anomaly) == 100
+
+    window = np.array(values[200:])
+    assert sorted(store._entries[(1, 'ndvi')]['history']) == keys[200:]
+    assert mean_value == pytest.approx(window.mean())
+    assert std_value == pytest.approx(window.std(ddof=1))
+
+
+def test_new_readings_keep_refitting_after_cap():
+    store = AnomalyModelStore(max_history=100)
+    fits = count_fits(store)
+    for start in range(0, 300, 30):
+        store.score(1, 'ndvi', *readings(30, start)[:2], 0.05, readings(30, start)[2])
+
+    assert len(fits) > 3
+    assert max(fits) == 100
+
+
+def test_workers_sharing_path_match_single_store(tmp_path):
+    single = AnomalyModelStore(max_history=100)
+    workers = [AnomalyModelStore(max_history=100, path=str(tmp_path)) for _ in range(2)]
+
+    for i, start in enumerate(range(0, 200, 20)):
+        keys, values, dates = readings(20, start, seed=i)
+        expected = single.score(7, 'ndvi', keys, values, 0.05, dates)
+        result = workers[i % 2].score(7, 'ndvi', keys, values, 0.05, dates)
+        assert (expected[0] == result[0]).all()
+        assert result[1:] == pytest.approx(expected[1:])
+
+
+def test_prune_removes_entry_files_and_locks(tmp_path):
+    store = AnomalyModelStore(max_entries=2, path=str(tmp_path))
+    for field_id in range(5):
+        store.score(field_id, 'ndvi', *readings(20)[:2], 0.05, readings(20)[2])
+    store._prune()
+
+    names = os.listdir(tmp_path)
+    assert len([name for name in names if name.endswith('.state.joblib')]) == 2
+    assert len([name for name in names if name.endswith('.lock')]) == 2
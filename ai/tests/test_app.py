@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from config import Config
+
+
+def test_raster_route_maps_request_errors(client):
+    assert client.post('/analyze/ndvi/raster', json={}).status_code == 400
+    assert client.post('/analyze/ndvi/raster', data='not json', content_type='text/plain').status_code == 400
+
+    missing = client.post('/analyze/ndvi/raster', json={'path': 'missing.npy'})
+    assert missing.status_code == 404
+
+    outside = client.post('/analyze/ndvi/raster', json={'path': '../etc/passwd'})
+    assert outside.status_code == 400
+    assert 'outside data directory' in outside.json['error']
+
+
+def test_raster_route_analyses_file_behind_gate(client, app_module):
+    np.save(f"{Config.DATA_PATH}/route.npy", np.random.default_rng(0).uniform(0.2, 0.8, (40, 40)))
+
+    response = client.post('/analyze/ndvi/raster', json={'path': 'route.npy', 'tile_size': 16})
+    assert response.status_code == 200
+    assert response.json['raster'] == {'rows': 40, 'cols': 40, 'tile_size': 16}
+    assert app_module.admission_gates['analyze_raster'].stats()['admitted'] >= 1
+
+
+def test_admin_endpoints_fail_closed_without_token(client, monkeypatch):
+    monkeypatch.setattr(Config, 'ADMIN_TOKEN', '')
+    assert client.get('/admin/models/growth_model').status_code == 403
+    assert client.post('/admin/models/growth_model/promote', json={'version': 'x'}).status_code == 403
+    assert client.post('/admin/models/growth_model/rollback').status_code == 403
+
+
+def test_admin_endpoints_check_token(client, monkeypatch):
+    monkeypatch.setattr(Config, 'ADMIN_TOKEN', 'secret')
+    assert client.post('/admin/models/growth_model/rollback', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+    assert client.get('/admin/models/growth_model', headers={'X-Admin-Token': 'secret'}).status_code == 200
+    assert client.get('/admin/models/growth_ensemble', headers={'X-Admin-Token': 'secret'}).status_code == 404
+
+
+class _FakePredictor:
+    def __init__(self, loadable=True):
+        self.bundle = {'model_version': 'old'}
+        self.loadable = loadable
+
+    def load_model(self, version=None):
+        if self.loadable:
+            self.bundle = {'model_version': version}
+        return self.loadable
+
+
+def test_failed_swap_restores_served_version(app_module, monkeypatch):
+    predictor = _FakePredictor()
+    monkeypatch.setitem(app_module.served_models, 'fake', predictor)
+
+    def failing_swap():
+        raise ValueError('active version changed')
+
+    with pytest.raises(ValueError):
+        app_module.load_then_swap('fake', 'new', failing_swap)
+    assert predictor.bundle == {'model_version': 'old'}
+
+    assert app_module.load_then_swap('fake', 'new', lambda: {'version': 'new'}) == {'version': 'new'}
+    assert predictor.bundle == {'model_version': 'new'}
+
+
+def test_unloadable_version_is_not_swapped(app_module, monkeypatch):
+    monkeypatch.setitem(app_module.served_models, 'fake', _FakePredictor(loadable=False))
+    swapped = []
+    assert app_module.load_then_swap('fake', 'new', lambda: swapped.append(True)) is None
+    assert swapped == []
+
+
+def test_execution_parameters_share_cached_analysis(client):
+    field_data = [
+        {'id': day + 1, 'data_type': 'ndvi', 'collection_date': f'2026-05-{day + 1:02d}',
+         'data': {'ndvi_values': [0.4 + day / 100, 0.5, 0.6]}}
+        for day in range(5)
+    ]
+    first = client.post('/analyze/field/31', json={'field_data': field_data, 'parameters': {'concurrent_stages': False}})
+    assert first.status_code == 200 and first.headers['X-Cache'] == 'MISS'
+
+    second = client.post('/analyze/field/31', json={'field_data': field_data, 'parameters': {'include_timings': True}})
+    assert second.headers['X-Cache'] == 'HIT'
+    assert 'timings' in second.json
+
+    other = client.post('/analyze/field/31', json={'field_data': field_data, 'parameters': {'sensitivity': 'high'}})
+    assert other.headers['X-Cache'] == 'MISS'
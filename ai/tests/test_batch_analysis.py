@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from analytics.soil_moisture import predict_moisture, predict_moisture_batch
+from analytics.vegetation_health import analyze_ndvi, analyze_ndvi_batch
+from preprocessing.field_data import decode_field_data
+
+
+def field_readings(seed, days=12):
+    rng = np.random.default_rng(seed)
+    readings = []
+    for day in range(days):
+        date = f'2026-05-{day + 1:02d}'
+        readings.append({'id': 2 * day + 1, 'data_type': 'ndvi', 'collection_date': date,
+                         'data': {'ndvi_values': rng.uniform(0.3, 0.8, 4).round(3).tolist()}})
+        readings.append({'id': 2 * day + 2, 'data_type': 'soil_moisture', 'collection_date': date,
+                         'data': {'moisture_values': rng.uniform(0.2, 0.5, 3).round(3).tolist()}})
+    return readings
+
+
+def test_vectorised_batch_matches_single_field_analytics():
+    fields = {field_id: decode_field_data(field_readings(field_id, days=field_id + 2)) for field_id in range(1, 6)}
+    # Pole bez odczytów w partii nie wpływa na pozostałe
+    fields[6] = decode_field_data([])
+
+    vegetation = analyze_ndvi_batch({field_id: data.series('ndvi') for field_id, data in fields.items()})
+    moisture = predict_moisture_batch({field_id: data.series('soil_moisture') for field_id, data in fields.items()})
+
+    for field_id, data in fields.items():
+        assert vegetation[field_id] == pytest.approx(analyze_ndvi(data.series('ndvi')))
+        assert moisture[field_id] == pytest.approx(predict_moisture(data.series('soil_moisture')))
+
+
+def test_batch_growth_prediction_matches_single_field(trained_predictor):
+    fields = [(field_readings(seed), {'planting_date': '2026-04-01', 'size': 3 + seed}) for seed in range(3)]
+    batch = trained_predictor.predict_growth_batch(fields, days_ahead=5, seed=7)
+
+    for (field_data, field_info), result in zip(fields, batch):
+        single = trained_predictor.predict_growth(field_data, field_info, days_ahead=5, seed=7)
+        assert [p['predicted_biomass'] for p in result['predictions']] == \
+            pytest.approx([p['predicted_biomass'] for p in single['predictions']])
+        assert result['current_biomass'] == pytest.approx(single['current_biomass'])
+
+
+def test_batch_endpoint_results_by_field_id(client):
+    fields = [{'field_id': field_id, 'field_data': field_readings(field_id)} for field_id in (11, 12)]
+    response = client.post('/analyze/fields:batch', json={'fields': fields})
+    assert response.status_code == 200
+    assert response.json['field_count'] == 2
+    assert set(response.json['results']) == {'11', '12'}
+
+    single = client.post('/analyze/field/12', json={'field_data': fields[1]['field_data']}).json
+    assert response.json['results']['12']['vegetation_health'] == pytest.approx(single['vegetation_health'])
+
+
+@pytest.mark.parametrize('body', [
+    {'fields': [{'field_data': []}]},
+    {'fields': [{'field_id': 1}, {'field_id': '1'}]},
+    {'fields': ['not an object']},
+    {'fields': {'field_id': 1}}
+])
+def test_batch_endpoint_rejects_invalid_fields(client, body):
+    assert client.post('/analyze/fields:batch', json=body).status_code == 400
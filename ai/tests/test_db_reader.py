@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from preprocessing.db_reader import FieldDataReader
+
+ROWS = [
+    (3, 7, '2024-05-10 08:00:00', 'ndvi', json.dumps({'ndvi_values': [0.5, 0.7]}), '52.1', '21.0', None),
+    (1, 7, '2024-05-01 08:00:00', 'ndvi', json.dumps({'ndvi_values': [0.2, 0.4]}), None, None, '{"source": "drone"}'),
+    (2, 7, '2024-05-01 09:00:00', 'weather', 'broken', None, None, None),
+    (4, 8, '2024-05-02 08:00:00', 'ndvi', json.dumps({'ndvi_values': [0.9]}), None, None, None)
+]
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    # Tabela field_data jak w bazie Laravela, w SQLite w pamięci zamiast MySQL
+    engine = sqlalchemy.create_engine('sqlite://', poolclass=sqlalchemy.pool.StaticPool)
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(
+            'CREATE TABLE field_data (id INTEGER PRIMARY KEY, field_id INTEGER, collection_date TEXT, data_type TEXT, '
+            'data TEXT, latitude TEXT, longitude TEXT, metadata TEXT)'
+        ))
+        conn.execute(sqlalchemy.text('INSERT INTO field_data VALUES (:id, :field_id, :date, :type, :data, :lat, :lon, :meta)'), [
+            dict(zip(('id', 'field_id', 'date', 'type', 'data', 'lat', 'lon', 'meta'), row)) for row in ROWS
+        ])
+
+    reader = FieldDataReader(chunk_size=1)
+    monkeypatch.setattr(reader, '_get_engine', lambda: engine)
+    return reader
+
+
+def test_rows_converted_to_laravel_payload_in_date_order(reader):
+    rows = list(reader.iter_rows(7))
+
+    assert [row['id'] for row in rows] == [1, 2, 3]
+    assert rows[0] == {
+        'id': 1, 'field_id': 7, 'collection_date': '2024-05-01', 'data_type': 'ndvi',
+        'data': {'ndvi_values': [0.2, 0.4]}, 'latitude': None, 'longitude': None, 'metadata': {'source': 'drone'}
+    }
+    assert rows[1]['data'] == {}
+    assert (rows[2]['latitude'], rows[2]['longitude']) == (52.1, 21.0)
+
+
+def test_date_range_and_field_data_decoding(reader):
+    assert [row['id'] for row in reader.iter_rows(7, date_from='2024-05-02')] == [3]
+    assert [row['id'] for row in reader.iter_rows(7, date_to='2024-05-01 23:59:59')] == [1, 2]
+
+    field_data = reader.read_field_data(7)
+    assert len(field_data) == 3
+    assert field_data.series('ndvi').values('ndvi_values')[0].tolist() == [0.2, 0.4, 0.5, 0.7]
+
+
+def test_load_field_data_prefers_payload(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.field_data_reader, 'read_field_data', lambda *args: pytest.fail('database read'))
+    field_data = app_module.load_field_data(7, {'field_data': [{'data_type': 'ndvi', 'data': {'ndvi_values': [0.3]}}]})
+    assert len(field_data) == 1
@@ -0,0 +1,86 @@
+import json
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from analytics.plant_growth_prediction import PlantGrowthPredictor
+from preprocessing.feature_store import FeatureStore
+
+FIELD_INFO = {'size': 12.0, 'planting_date': '2026-04-01'}
+
+
+def make_field_data(days=20, seed=0):
+    rng = np.random.default_rng(seed)
+    start = date(2026, 5, 1)
+    readings = []
+    for day in range(days):
+        collection_date = (start + timedelta(days=day)).isoformat()
+
+        def reading(data_type, data, encode=False):
+            readings.append({'id': len(readings) + 1, 'data_type': data_type, 'collection_date': collection_date,
+                             'data': json.dumps(data) if encode else data})
+
+        reading('ndvi', {'ndvi_values': rng.uniform(0.2, 0.9, int(rng.integers(1, 6))).round(4).tolist()})
+        reading('soil_moisture', {'moisture_values': rng.uniform(0.1, 0.6, 3).round(4).tolist()}, encode=True)
+        reading('weather', {'temperature_avg': round(float(rng.uniform(10, 30)), 2), 'rainfall': round(float(rng.uniform(0, 8)), 2)})
+        reading('sunlight', {'sunshine_hours': round(float(rng.uniform(2, 12)), 2)})
+        if day % 5 == 0:
+            reading('soil_temperature', {'avg_temperature': round(float(rng.uniform(8, 20)), 2)})
+            reading('biomass_measurement', {'plant_height_cm': 10 + day, 'plant_density_per_m2': 200 + day})
+        if day % 7 == 0:
+            reading('fertilizer_application', {'fertilizer_type': ('nitrogen', 'phosphorus', 'potassium')[day % 3],
+                                               'amount_per_hectare': 20 + day})
+    return readings
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FeatureStore(str(tmp_path / 'features.sqlite3'))
+
+
+def assert_matches_prepare_features(stored, field_data):
+    predictor = PlantGrowthPredictor(auto_init=False)
+    expected = predictor.prepare_features(field_data, FIELD_INFO)
+    actual = predictor.prepare_stored_features(stored['features'], stored['field_info'])
+    assert actual.keys() == expected.keys()
+    for key in expected:
+        assert actual[key] == pytest.approx(expected[key]), key
+
+
+def test_incremental_ingest_matches_full_history(store):
+    """Przyrostowe dołączanie odczytów (z ponownie przesłanymi) daje te same cechy co pełna historia"""
+    field_data = make_field_data()
+    store.ingest(1, field_data[:30], FIELD_INFO)
+    store.ingest(1, field_data[20:60])
+    store.ingest(1, field_data)
+
+    assert_matches_prepare_features(store.get_features(1), field_data)
+
+
+def test_duplicates_do_not_double_fertilizer(store):
+    field_data = make_field_data(days=15)
+    store.ingest(2, field_data, FIELD_INFO)
+    again = store.ingest(2, field_data)
+
+    assert again['ingested'] == 0
+    assert_matches_prepare_features(store.get_features(2), field_data)
+
+
+def test_unknown_field_has_no_features(store):
+    assert store.get_features(404) is None
+
+
+def test_ingest_route_requires_json_object(client):
+    assert client.post('/features/7/ingest').status_code == 400
+    assert client.post('/features/7/ingest', data='[]', content_type='application/json').status_code == 400
+    assert client.post('/features/7/ingest', data='{broken', content_type='application/json').status_code == 400
+
+    response = client.post('/features/7/ingest', json={'field_data': make_field_data(days=3), 'field_info': FIELD_INFO})
+    assert response.status_code == 200 and response.json['ingested'] > 0
+
+
+@pytest.mark.parametrize('path', ['/analyze/field/7', '/analyze/fields:batch', '/anomalies/stream/7'])
+def test_routes_reject_missing_body(client, path):
+    assert client.post(path).status_code == 400
+    assert client.post(path, data='not json', content_type='text/plain').status_code == 400
@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+import pytest
+
+from preprocessing.field_data import FieldData, decode_field_data, as_series
+
+READINGS = [
+    {'id': 2, 'data_type': 'ndvi', 'collection_date': '2024-05-10', 'data': json.dumps({'ndvi_values': [0.5, 0.7]})},
+    {'id': 1, 'data_type': 'ndvi', 'collection_date': '2024-05-01', 'data': {'ndvi_values': [0.2, 0.4, 0.6]}},
+    {'id': 3, 'data_type': 'ndvi', 'collection_date': '2024-05-20', 'data': {'ndvi_values': []}},
+    {'id': 4, 'data_type': 'weather', 'collection_date': '2024-05-02', 'data': {'temperature': 18.5}},
+    {'id': 5, 'data_type': 'weather', 'collection_date': '2024-05-03', 'data': 'not json'}
+]
+
+
+def test_readings_grouped_sorted_and_decoded():
+    field_data = FieldData(READINGS)
+    ndvi = field_data.series('ndvi')
+
+    assert len(field_data) == 5
+    assert sorted(field_data.data_types()) == ['ndvi', 'weather']
+    assert ndvi.dates == ['2024-05-01', '2024-05-10', '2024-05-20']
+    assert ndvi.latest() == {'ndvi_values': []}
+    assert field_data.series('weather').data[1] == {}
+    assert len(field_data.series('soil')) == 0
+
+
+def test_values_offsets_tail_and_means_match_per_reading_lists():
+    ndvi = FieldData(READINGS).series('ndvi')
+    values, offsets = ndvi.values('ndvi_values')
+
+    assert values.tolist() == [0.2, 0.4, 0.6, 0.5, 0.7]
+    assert offsets.tolist() == [0, 3, 5, 5]
+    assert ndvi.tail('ndvi_values', 2).tolist() == [0.5, 0.7]
+    assert ndvi.tail('ndvi_values', 10).tolist() == values.tolist()
+
+    means = ndvi.means('ndvi_values')
+    assert means[:2] == pytest.approx([0.4, 0.6])
+    assert np.isnan(means[2])
+
+
+def test_scalars_use_default_for_missing_keys():
+    weather = FieldData(READINGS).series('weather')
+    assert weather.scalars('temperature', 15.0).tolist() == [18.5, 15.0]
+
+
+def test_decoded_inputs_are_passed_through():
+    field_data = decode_field_data(READINGS)
+    series = field_data.series('ndvi')
+
+    assert decode_field_data(field_data) is field_data
+    assert as_series(series) is series
+    assert len(as_series(None)) == 0
@@ -0,0 +1,104 @@
+import threading
+
+import numpy as np
+import pytest
+
+FIELD_INFO = {'planting_date': '2026-04-01', 'size': 8.0}
+
+
+def field_readings(days=10):
+    return [
+        {'id': day + 1, 'data_type': data_type, 'collection_date': f'2026-05-{day + 1:02d}', 'data': data}
+        for day in range(days)
+        for data_type, data in (('ndvi', {'ndvi_values': [0.55 + day / 100, 0.6]}),
+                                ('soil_moisture', {'moisture_values': [0.35, 0.4]}),
+                                ('weather', {'temperature_avg': 18 + day % 4, 'rainfall': day % 3}))
+    ]
+
+
+def biomass(result):
+    return [p['predicted_biomass'] for p in result['predictions']]
+
+
+def test_single_call_horizon_matches_per_day_scoring(trained_predictor):
+    """Cały horyzont jednym wywołaniem modelu - te same wartości co ocena dzień po dniu"""
+    features = trained_predictor.prepare_features(field_readings(), FIELD_INFO)
+    result = trained_predictor.predict_from_features(features, days_ahead=9, seed=3)
+
+    horizon = trained_predictor._simulate_horizon(features, 9, np.random.default_rng(3))
+    bundle = trained_predictor.bundle
+    current = max(100, bundle['model'].predict(bundle['scaler'].transform([trained_predictor._feature_row(features)]))[0])
+    expected = []
+    for i in range(9):
+        day_features = dict(features, **{name: values[i] for name, values in horizon.items()})
+        row = bundle['scaler'].transform([trained_predictor._feature_row(day_features)])
+        expected.append(max(current, bundle['model'].predict(row)[0]))
+
+    assert result['current_biomass'] == pytest.approx(current)
+    assert biomass(result) == pytest.approx(expected)
+    assert [p['day'] for p in result['predictions']] == list(range(1, 10))
+    for prediction in result['predictions']:
+        interval = prediction['prediction_interval']
+        assert interval['lower'] <= prediction['predicted_biomass'] <= interval['upper']
+
+
+def test_forecast_is_deterministic_and_seedable(trained_predictor):
+    readings = field_readings()
+    first = trained_predictor.predict_growth(readings, FIELD_INFO, days_ahead=7)
+    assert biomass(trained_predictor.predict_growth(readings, FIELD_INFO, days_ahead=7)) == biomass(first)
+
+    seeded = trained_predictor.predict_growth(readings, FIELD_INFO, days_ahead=7, seed=1)
+    assert biomass(trained_predictor.predict_growth(readings, FIELD_INFO, days_ahead=7, seed=1)) == biomass(seeded)
+
+    # Różny seed - inna symulowana pogoda horyzontu
+    features = trained_predictor.prepare_features(readings, FIELD_INFO)
+    weather = [trained_predictor._simulate_horizon(features, 7, np.random.default_rng(seed))['avg_temperature'] for seed in (1, 2)]
+    assert not np.array_equal(*weather)
+
+
+def test_concurrent_forecasts_do_not_share_random_state(trained_predictor):
+    readings = field_readings()
+    expected = {seed: biomass(trained_predictor.predict_growth(readings, FIELD_INFO, days_ahead=7, seed=seed)) for seed in range(4)}
+    results = {}
+
+    def forecast(seed):
+        results[seed] = biomass(trained_predictor.predict_growth(readings, FIELD_INFO, days_ahead=7, seed=seed))
+
+    threads = [threading.Thread(target=forecast, args=(seed,)) for seed in range(4) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == expected
+
+
+def test_vectorised_scenarios_match_per_scenario_scoring(trained_predictor):
+    """Wszystkie trajektorie jednym wywołaniem modelu - pasma jak przy ocenie każdej trajektorii osobno"""
+    features = trained_predictor.prepare_features(field_readings(), FIELD_INFO)
+    result = trained_predictor.predict_scenarios_from_features(features, days_ahead=6, n_scenarios=40, seed=5)
+
+    bundle = trained_predictor.bundle
+    horizon = trained_predictor._simulate_horizon(features, 6, np.random.default_rng(5), 40)
+    current = result['current_biomass']
+    trajectories = []
+    for scenario in range(40):
+        matrix = trained_predictor._horizon_matrix(features, {name: np.broadcast_to(values, (40, 6))[scenario]
+                                                              for name, values in horizon.items()})
+        trajectories.append(np.maximum(current, bundle['model'].predict(bundle['scaler'].transform(matrix))[1:]))
+    expected = np.percentile(trajectories, trained_predictor.SCENARIO_PERCENTILES, axis=0)
+
+    assert result['scenarios'] == 40 and len(result['bands']) == 6
+    for i, band in enumerate(result['bands']):
+        assert [band['biomass'][f'p{p}'] for p in trained_predictor.SCENARIO_PERCENTILES] == pytest.approx(expected[:, i])
+        assert band['biomass']['p10'] <= band['biomass']['p50'] <= band['biomass']['p90']
+        assert band['growth_rate']['p10'] <= band['growth_rate']['p90']
+
+
+def test_scenario_count_is_bounded_and_reproducible(trained_predictor):
+    readings = field_readings()
+    capped = trained_predictor.predict_growth_scenarios(readings, FIELD_INFO, days_ahead=2, n_scenarios=10 ** 6, seed=1)
+    assert capped['scenarios'] == trained_predictor.MAX_SCENARIOS
+    assert trained_predictor.predict_growth_scenarios(readings, FIELD_INFO, days_ahead=2, n_scenarios=0)['scenarios'] == 1
+
+    first = trained_predictor.predict_growth_scenarios(readings, FIELD_INFO, days_ahead=4, n_scenarios=200, seed=9)
+    assert trained_predictor.predict_growth_scenarios(readings, FIELD_INFO, days_ahead=4, n_scenarios=200, seed=9)['bands'] == first['bands']
@@ -0,0 +1,50 @@
+import gc
+import os
+import runpy
+import types
+
+from config import Config
+
+CONF_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+
+
+def load_conf(monkeypatch, **env):
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return runpy.run_path(CONF_PATH)
+
+
+def test_settings_from_environment(monkeypatch):
+    conf = load_conf(monkeypatch, AI_WORKERS='3', AI_THREADS='8', AI_PORT='6000', AI_MAX_REQUESTS='500')
+
+    assert conf['preload_app'] is True
+    assert (conf['workers'], conf['threads'], conf['worker_class']) == (3, 8, 'gthread')
+    assert conf['bind'] == '0.0.0.0:6000'
+    assert conf['max_requests_jitter'] == 50
+    assert load_conf(monkeypatch, AI_THREADS='1')['worker_class'] == 'sync'
+
+
+def test_admission_leaves_headroom_in_worker_threads(monkeypatch):
+    monkeypatch.delenv('AI_THREADS', raising=False)
+    conf = load_conf(monkeypatch)
+    assert conf['threads'] == Config.THREADS
+    assert Config.ADMISSION_THREADS == conf['threads'] - Config.ADMISSION_HEADROOM
+
+
+def test_fork_hooks_freeze_preloaded_objects_and_start_worker_threads(app_module, monkeypatch):
+    conf = load_conf(monkeypatch)
+    started = []
+    monkeypatch.setattr(app_module, 'start_background_tasks', lambda: started.append(os.getpid()))
+    messages = []
+    server = types.SimpleNamespace(log=types.SimpleNamespace(info=messages.append))
+    worker = types.SimpleNamespace(pid=os.getpid())
+
+    try:
+        conf['pre_fork'](server, worker)
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+
+    conf['post_fork'](server, worker)
+    assert started == [os.getpid()]
+    assert str(worker.pid) in messages[0]
@@ -0,0 +1,83 @@
+import json
+import os
+import threading
+
+import pytest
+
+from analytics.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path), max_workers=1, callback_hosts=['laravel'])
+
+
+@pytest.mark.parametrize('url', [
+    'http://127.0.0.1/hook',
+    'http://localhost:8080/hook',
+    'http://10.0.0.5/hook',
+    'http://192.168.1.10/hook',
+    'http://169.254.169.254/latest/meta-data/',
+    'http://[::1]/hook',
+    'ftp://example.com/hook',
+    'not a url'
+])
+def test_callback_url_rejects_internal_addresses(queue, url):
+    with pytest.raises(ValueError):
+        queue.check_callback_url(url)
+
+
+def test_callback_url_allows_listed_and_public_hosts(queue):
+    # Host z listy może być w sieci wewnętrznej (np. kontener Laravela) - bez rozwiązywania adresu
+    queue.check_callback_url('http://laravel/api/ai/jobs')
+    queue.check_callback_url('https://8.8.8.8/hook')
+    queue.check_callback_url(None)
+
+
+def test_submit_rejects_internal_callback(queue):
+    with pytest.raises(ValueError):
+        queue.submit('test', lambda: 1, callback_url='http://127.0.0.1:5000/admin/models/growth_model/rollback')
+    assert os.listdir(queue.path) == []
+
+
+def test_job_runs_and_is_readable(queue):
+    done = threading.Event()
+    job = queue.submit('test', lambda: done.set() or {'value': 1})
+    assert done.wait(5)
+    queue._get_executor().shutdown(wait=True)
+
+    stored = queue.get(job['id'])
+    assert stored['status'] == 'done' and stored['result'] == {'value': 1}
+    assert queue.get('../etc/passwd') is None
+
+
+def _write_job(queue, **fields):
+    job = dict({'id': 'a' * 32, 'kind': 'test', 'status': 'queued', 'created_at': '2026-01-01T00:00:00'}, **fields)
+    queue._write(job)
+    return job
+
+
+def test_job_of_exited_worker_is_failed_on_lookup(queue):
+    # pid nieistniejącego procesu - pula wątków, która miała wykonać zadanie, już nie istnieje
+    _write_job(queue, worker_pid=2 ** 22 + 1)
+    job = queue.get('a' * 32)
+    assert job['status'] == 'failed' and 'lost' in job['error']
+    with open(queue._job_file('a' * 32)) as f:
+        assert json.load(f)['status'] == 'failed'
+
+
+def test_job_older_than_stale_after_is_failed(queue):
+    _write_job(queue, worker_pid=os.getpid(), status='running')
+    assert queue.get('a' * 32)['status'] == 'failed'
+
+    queue.stale_after = 0
+    _write_job(queue, worker_pid=os.getpid(), status='running')
+    assert queue.get('a' * 32)['status'] == 'running'
+
+
+def test_fail_unfinished_on_startup(queue):
+    _write_job(queue, worker_pid=os.getpid())
+    _write_job(queue, id='b' * 32, status='done', worker_pid=os.getpid())
+    assert queue.fail_unfinished() == 1
+    assert queue.get('a' * 32)['status'] == 'failed'
+    assert queue.get('b' * 32)['status'] == 'done'
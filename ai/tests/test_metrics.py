@@ -0,0 +1,71 @@
+import multiprocessing
+
+from analytics.metrics import Metrics, request_timings, stage_timer
+
+
+def parse(text):
+    """Linie próbek ekspozycji Prometheusa -> {nazwa{etykiety}: wartość}"""
+    return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if not line.startswith('#')}
+
+
+def worker_process(path, requests, seconds):
+    metrics = Metrics(path)
+    for _ in range(requests):
+        metrics.inc('ai_requests_total', route='/analyze', method='POST', status=200)
+        metrics.observe('ai_request_duration_seconds', seconds, route='/analyze')
+    metrics.flush()
+
+
+def test_render_sums_snapshots_of_all_worker_processes(tmp_path):
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=worker_process, args=(str(tmp_path), requests, seconds))
+               for requests, seconds in ((3, 0.02), (5, 2.0))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=10)
+        assert worker.exitcode == 0
+
+    own = Metrics(str(tmp_path))
+    own.inc('ai_requests_total', route='/analyze', method='POST', status=200)
+    samples = parse(own.render())
+
+    assert samples['ai_requests_total{method="POST",route="/analyze",status="200"}'] == 9
+    assert samples['ai_request_duration_seconds_count{route="/analyze"}'] == 8
+    assert samples['ai_request_duration_seconds_sum{route="/analyze"}'] == 3 * 0.02 + 5 * 2.0
+    assert samples['ai_request_duration_seconds_bucket{route="/analyze",le="0.025"}'] == 3
+    assert samples['ai_request_duration_seconds_bucket{route="/analyze",le="2.5"}'] == 8
+    assert samples['ai_request_duration_seconds_bucket{route="/analyze",le="+Inf"}'] == 8
+
+
+def test_reset_and_clear(tmp_path):
+    metrics = Metrics(str(tmp_path))
+    metrics.inc('ai_result_cache_requests_total', result='miss')
+    metrics.flush()
+    metrics.reset()
+    assert metrics.snapshot() == {'counters': [], 'histograms': []}
+
+    metrics.clear()
+    assert list(tmp_path.iterdir()) == []
+    assert metrics.render() == '\n'
+
+
+def test_stage_timer_records_request_timings():
+    timings = {}
+    token = request_timings.set(timings)
+    try:
+        with stage_timer('decode'):
+            pass
+        with stage_timer('decode'):
+            pass
+    finally:
+        request_timings.reset(token)
+    assert set(timings) == {'decode'} and timings['decode'] >= 0
+
+
+def test_metrics_endpoint(client):
+    client.get('/')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype.startswith('text/plain')
+    assert '# TYPE ai_requests_total counter' in response.get_data(as_text=True)
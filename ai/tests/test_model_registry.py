@@ -0,0 +1,56 @@
+import pytest
+
+from analytics.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry('test_model', str(tmp_path))
+
+
+def test_publish_promote_and_rollback(registry):
+    first = registry.publish({'model': [1]}, {'metrics': {}})
+    second = registry.publish({'model': [2]}, {'metrics': {}})
+    assert registry.active_version() == second
+    assert registry.previous_version() == first
+
+    manifest, artifacts = registry.load()
+    assert manifest['version'] == second and artifacts['model'] == [2]
+
+    registry.rollback(expected=first)
+    assert registry.active_version() == first
+    assert registry.load()[1]['model'] == [1]
+
+    registry.promote(second)
+    assert registry.active_version() == second
+
+
+def test_publish_without_activation_keeps_active_version(registry):
+    first = registry.publish({'model': [1]}, {})
+    second = registry.publish({'model': [2]}, {}, activate=False)
+    assert registry.active_version() == first
+    assert {m['version'] for m in registry.list_versions()} == {first, second}
+
+
+def test_rollback_rejects_stale_expected_version(registry):
+    registry.publish({'model': [1]}, {})
+    registry.publish({'model': [2]}, {})
+    registry.publish({'model': [3]}, {})
+
+    # Ktoś inny cofnął wersję w międzyczasie - oczekiwany cel już nieaktualny
+    expected = registry.previous_version()
+    registry.rollback()
+    with pytest.raises(ValueError):
+        registry.rollback(expected=expected)
+    assert registry.active_version() == expected
+
+    with pytest.raises(ValueError):
+        registry.promote('missing')
+
+
+def test_rollback_without_history_raises(registry):
+    registry.publish({'model': [1]}, {})
+    with pytest.raises(ValueError):
+        registry.previous_version()
+    with pytest.raises(ValueError):
+        registry.rollback()
@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+import pytest
+
+from analytics.model_selection import candidate_name, evaluate_candidate, select_model
+
+CANDIDATES = [
+    {'estimator': 'RandomForest', 'params': {'n_estimators': 20, 'max_depth': 2}},
+    {'estimator': 'RandomForest', 'params': {'n_estimators': 20, 'max_depth': 8}},
+    {'estimator': 'GradientBoosting', 'params': {'n_estimators': 40, 'max_depth': 3}}
+]
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1, (300, 4))
+    y = 10 * X[:, 0] + 5 * np.sin(6 * X[:, 1]) + rng.normal(0, 0.3, 300)
+    return X, y
+
+
+def test_parallel_leaderboard_matches_sequential_evaluation(data):
+    X, y = data
+    leaderboard = select_model(X, y, CANDIDATES, cv=3, max_workers=2)
+
+    expected = {candidate_name(candidate): evaluate_candidate(candidate, X, y, cv=3)['r2'] for candidate in CANDIDATES}
+    assert {result['name']: result['r2'] for result in leaderboard} == pytest.approx(expected)
+    assert [result['r2'] for result in leaderboard] == sorted(expected.values(), reverse=True)
+    assert all(result['status'] == 'done' for result in leaderboard)
+
+
+def test_failed_candidate_is_ranked_last(data):
+    X, y = data
+    broken = {'estimator': 'RandomForest', 'params': {'n_estimators': -1}}
+    leaderboard = select_model(X, y, [broken, CANDIDATES[0]], cv=2, max_workers=2)
+
+    assert [result['status'] for result in leaderboard] == ['done', 'failed']
+    assert leaderboard[1]['name'] == candidate_name(broken) and leaderboard[1]['error']
+
+
+def test_time_budget_stops_slow_candidates(data):
+    X, y = data
+    slow = {'estimator': 'GradientBoosting', 'params': {'n_estimators': 200000, 'max_depth': 6}}
+    started = time.time()
+    leaderboard = select_model(np.tile(X, (20, 1)), np.tile(y, 20), [slow, slow, CANDIDATES[0]],
+                               cv=2, time_budget=1, max_workers=1)
+
+    assert time.time() - started < 30
+    assert [result['status'] for result in leaderboard] == ['timeout'] * 3
+
+
+def test_trained_version_keeps_leaderboard(trained_predictor):
+    manifest = trained_predictor.registry.manifest(trained_predictor.model_version)
+    assert manifest['leaderboard'][0]['status'] == 'done'
+    assert manifest['metrics']['cv_r2'] == manifest['leaderboard'][0]['r2']
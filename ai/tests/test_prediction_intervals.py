@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from analytics.plant_growth_prediction import PlantGrowthPredictor
+
+
+def heteroscedastic(n, rng):
+    X = rng.uniform(0, 10, (n, 3))
+    y = 50 * X[:, 0] + 10 * X[:, 1] + rng.normal(0, 1 + 8 * X[:, 2], n)
+    return X, y
+
+
+@pytest.fixture(scope='module')
+def calibrated():
+    rng = np.random.default_rng(0)
+    X_train, y_train = heteroscedastic(2000, rng)
+    X_test, y_test = heteroscedastic(4000, rng)
+    predictor = PlantGrowthPredictor(auto_init=False)
+    return predictor.train_quantile_models(X_train, y_train, X_test, y_test), (X_test, y_test)
+
+
+def test_cqr_reaches_nominal_coverage_on_held_out_data(calibrated):
+    (quantile_models, margin, coverage), (X_test, y_test) = calibrated
+    nominal = PlantGrowthPredictor.INTERVAL_QUANTILES[1] - PlantGrowthPredictor.INTERVAL_QUANTILES[0]
+
+    # Pokrycie skalibrowanego przedziału na danych niewidzianych przy kalibracji - blisko nominalnego
+    assert coverage >= nominal - 0.03
+    assert coverage <= nominal + 0.06
+
+    lower = quantile_models['quantile_low'].predict(X_test) - margin
+    upper = quantile_models['quantile_high'].predict(X_test) + margin
+    assert np.mean((y_test >= lower) & (y_test <= upper)) == pytest.approx(coverage)
+
+    # Przedział adaptacyjny - szerszy tam, gdzie szum jest większy
+    width = upper - lower
+    assert width[X_test[:, 2] > 8].mean() > 2 * width[X_test[:, 2] < 2].mean()
+
+
+def test_scored_intervals_use_margin_and_contain_prediction(calibrated):
+    (quantile_models, margin, _), (X_test, _) = calibrated
+    predictor = PlantGrowthPredictor(auto_init=False)
+    # Głowice wytrenowane na danych bez skalowania - skaler tożsamościowy
+    scaler = StandardScaler(with_mean=False, with_std=False).fit(X_test)
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X_test, 50 * X_test[:, 0])
+    bundle = {'scaler': scaler, 'model': model, 'quantile_models': quantile_models,
+              'metrics': {'interval_margin': margin}}
+    predicted, intervals = predictor._score_matrix(X_test[:50], bundle)
+    assert intervals.shape == (2, 50)
+    assert np.all(intervals[0] <= predicted) and np.all(predicted <= intervals[1])
+    assert np.all(intervals[0] <= quantile_models['quantile_low'].predict(X_test[:50]) - margin + 1e-9)
+
+    # Bez głowic kwantylowych - przedział z rozrzutu drzew lasu
+    bundle = dict(bundle, quantile_models={})
+    predicted, intervals = predictor._score_matrix(X_test[:50], bundle)
+    assert np.allclose(predicted, model.predict(X_test[:50]))
+    assert np.all(intervals[0] <= predicted) and np.all(predicted <= intervals[1])
+    assert predictor._interval_method(bundle) == 'forest_tree_spread'
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from config import Config
+from analytics.advanced_ndvi_analyzer import AdvancedNDVIAnalyzer
+from analytics.raster_tiles import HistogramQuantiles, RunningStats
+
+
+def tiled_quantiles(values, percentiles, chunk=50_000, **kwargs):
+    chunks = [values[i:i + chunk] for i in range(0, values.size, chunk)]
+    quantiles = HistogramQuantiles(kwargs.pop('lo', -1.0), kwargs.pop('hi', 1.0), **kwargs)
+    for values_chunk in chunks:
+        quantiles.add(values_chunk)
+    quantiles.prepare(percentiles)
+    for values_chunk in chunks:
+        quantiles.collect(values_chunk)
+    while not quantiles.resolve():
+        for values_chunk in chunks:
+            quantiles.collect(values_chunk)
+    return quantiles
+
+
+@pytest.mark.parametrize('kind', ['zeros', 'quantized', 'near_equal', 'nan_outliers'])
+def test_histogram_quantiles_match_numpy_with_bounded_windows(kind):
+    rng = np.random.default_rng(0)
+    if kind == 'zeros':
+        values = np.where(rng.random(400_000) < 0.6, 0.0, rng.random(400_000))
+    elif kind == 'quantized':
+        values = np.round(rng.normal(0.4, 0.2, 400_000), 2)
+    elif kind == 'near_equal':
+        values = 1e-3 + rng.integers(0, 5, 400_000) * np.spacing(1e-3)
+    else:
+        values = rng.random(400_000)
+        values[rng.random(400_000) < 0.3] = np.nan
+        values[:10], values[10:20] = 5.0, -7.0
+
+    # Okna ograniczone do 1000 wartości - liczne kubełki rozstrzygane drobniejszym histogramem
+    quantiles = tiled_quantiles(values, [25, 50, 75], max_collect=1000)
+
+    assert quantiles.quantiles() == list(np.nanpercentile(values, [25, 50, 75]))
+
+
+def test_count_above_matches_numpy_for_ties():
+    rng = np.random.default_rng(1)
+    gradient = np.abs(rng.normal(0, 0.1, 200_000))
+    gradient[:150_000] = 0.0
+    quantiles = tiled_quantiles(gradient, [90], lo=0.0, hi=gradient.max(), max_collect=1000)
+
+    p90 = quantiles.quantiles()[0]
+    assert p90 == np.percentile(gradient, 90)
+    assert quantiles.count_above(p90) == np.sum(gradient > p90)
+
+
+def test_running_stats_skip_nodata():
+    values = np.array([[0.2, np.nan], [0.4, 0.6]])
+    stats = RunningStats()
+    stats.update(values[:1])
+    stats.update(values[1:])
+    assert stats.count == 3
+    assert stats.mean == pytest.approx(0.4)
+    assert stats.std == pytest.approx(np.nanstd(values))
+
+
+def test_tiled_raster_matches_in_memory_grid(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DATA_PATH', str(tmp_path))
+    rng = np.random.default_rng(3)
+    grid = np.clip(rng.normal(0.55, 0.2, (130, 90)), -1, 1)
+    grid[40:70, 30:60] = 0.0
+    np.save(tmp_path / 'field.npy', grid)
+
+    analyzer = AdvancedNDVIAnalyzer()
+    tiled = analyzer.analyze_ndvi_raster('field.npy', tile_size=32)
+    in_memory = analyzer.analyze_advanced_ndvi([{
+        'collection_date': '2026-01-01',
+        'data': {'ndvi_values': grid.ravel().tolist(), 'rows': 130, 'cols': 90}
+    }])
+
+    for key, value in in_memory['basic_stats'].items():
+        assert tiled['basic_stats'][key] == pytest.approx(value, rel=1e-9, abs=1e-12)
+    for section in ('spatial_autocorrelation', 'gradient_analysis', 'problem_clusters'):
+        assert tiled['spatial_analysis'][section] == pytest.approx(in_memory['spatial_analysis'][section], rel=1e-9, abs=1e-12)
+    assert tiled['anomaly_analysis'] == pytest.approx(in_memory['anomaly_analysis'], rel=1e-9, abs=1e-12)
+
+
+def test_tiled_raster_masks_nodata(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DATA_PATH', str(tmp_path))
+    grid = np.random.default_rng(4).uniform(0.2, 0.8, (60, 60))
+    grid[:, :6] = np.nan
+    np.save(tmp_path / 'nodata.npy', grid)
+
+    stats = AdvancedNDVIAnalyzer().analyze_ndvi_raster('nodata.npy', tile_size=16)['basic_stats']
+    assert stats['mean'] == pytest.approx(np.nanmean(grid))
+    assert stats['median'] == pytest.approx(np.nanmedian(grid))
+    assert stats['min'] == pytest.approx(np.nanmin(grid))
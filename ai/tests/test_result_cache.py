@@ -0,0 +1,74 @@
+import time
+
+from analytics.result_cache import ResultCache, cache_key
+from preprocessing.field_data import decode_field_data
+
+
+def test_cache_key_ignores_dict_order_but_not_values():
+    assert cache_key('a', {'x': 1, 'y': [1, 2]}) == cache_key('a', {'y': [1, 2], 'x': 1})
+    assert cache_key('a', {'x': 1}) != cache_key('a', {'x': 2})
+    assert cache_key('a', 1) != cache_key('b', 1)
+
+
+def test_normalized_field_data_ignores_reading_order():
+    readings = [
+        {'id': 1, 'data_type': 'ndvi', 'collection_date': '2026-05-01', 'data': {'ndvi_values': [0.5]}},
+        {'id': 2, 'data_type': 'soil_moisture', 'collection_date': '2026-05-01', 'data': '{"moisture_values": [0.3]}'},
+        {'id': 3, 'data_type': 'ndvi', 'collection_date': '2026-05-02', 'data': {'ndvi_values': [0.6]}}
+    ]
+    reordered = [readings[2], readings[1], readings[0]]
+    # Ten sam odczyt jako dict i jako JSON w stringu
+    reencoded = [readings[0], dict(readings[1], data={'moisture_values': [0.3]}), readings[2]]
+
+    key = cache_key(decode_field_data(readings).normalized())
+    assert cache_key(decode_field_data(reordered).normalized()) == key
+    assert cache_key(decode_field_data(reencoded).normalized()) == key
+    assert cache_key(decode_field_data(readings[:2]).normalized()) != key
+
+
+def test_lru_eviction_and_copies():
+    cache = ResultCache(max_entries=2, ttl=60)
+    cache.set('a', {'value': [1]})
+    cache.set('b', {'value': [2]})
+    cache.get('a')['value'].append(99)
+    cache.set('c', {'value': [3]})
+
+    # 'a' użyty ostatnio - usunięty najdawniej używany 'b'; odczyt zwraca kopię
+    assert cache.get('a') == {'value': [1]}
+    assert cache.get('b') is None
+    assert cache.stats()['entries'] == 2
+
+
+def test_ttl_expiry():
+    cache = ResultCache(ttl=0.05)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.1)
+    assert cache.get('a') is None
+
+
+def test_disk_tier_is_shared_between_processes(tmp_path):
+    first = ResultCache(ttl=60, disk_path=str(tmp_path))
+    second = ResultCache(ttl=60, disk_path=str(tmp_path))
+    first.set('k' * 64, {'result': 1})
+
+    assert second.get('k' * 64) == {'result': 1}
+    assert second.stats()['disk_hits'] == 1
+    assert second.get('k' * 64) == {'result': 1}
+    assert second.stats()['memory_hits'] == 1
+
+
+def test_reordered_payload_is_served_from_cache(client):
+    field_data = [
+        {'id': day + 1, 'data_type': 'ndvi', 'collection_date': f'2026-06-{day + 1:02d}',
+         'data': {'ndvi_values': [0.5 + day / 50, 0.55]}}
+        for day in range(4)
+    ]
+    first = client.post('/analyze/field/41', json={'field_data': field_data})
+    assert first.headers['X-Cache'] == 'MISS'
+
+    second = client.post('/analyze/field/41', json={'field_data': field_data[::-1]})
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.json == first.json
+
+    assert client.post('/analyze/field/42', json={'field_data': field_data}).headers['X-Cache'] == 'MISS'
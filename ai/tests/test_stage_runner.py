@@ -0,0 +1,49 @@
+import threading
+import time
+
+from analytics.stage_runner import StageRunner
+
+
+def test_stages_run_concurrently_and_collect_errors():
+    runner = StageRunner(max_workers=4)
+    barrier = threading.Barrier(2, timeout=2)
+
+    def together(value):
+        # Oba etapy muszą działać równocześnie, inaczej bariera zgłasza BrokenBarrierError
+        barrier.wait()
+        return value
+
+    def fail():
+        raise RuntimeError('broken')
+
+    results, errors = runner.run({'a': lambda: together('a'), 'b': lambda: together('b'), 'c': fail})
+    assert results == {'a': 'a', 'b': 'b', 'c': None}
+    assert errors == {'c': 'broken'}
+    assert runner.in_flight() == 0
+
+
+def test_timed_out_stages_do_not_queue_later_requests():
+    """Etap po timeout nadal zajmuje wątek puli - kolejne etapy nie czekają za nim w kolejce"""
+    runner = StageRunner(max_workers=2)
+    release = threading.Event()
+
+    results, errors = runner.run({'slow': lambda: release.wait(5), 'fast': lambda: 1}, timeout=0.1)
+    assert results['fast'] == 1 and 'slow' in errors
+
+    results, errors = runner.run({'slow': lambda: release.wait(5)}, timeout=0.1)
+    assert 'slow' in errors
+    assert runner.in_flight() == 2
+
+    # Pula zajęta przez porzucone etapy - etapy żądania w jego wątku, bez limitu czasu i bez kolejki
+    main_thread = threading.get_ident()
+    started = time.time()
+    results, errors = runner.run({'x': threading.get_ident, 'y': threading.get_ident}, timeout=0.1)
+    assert errors == {}
+    assert results == {'x': main_thread, 'y': main_thread}
+    assert time.time() - started < 1
+
+    release.set()
+    deadline = time.time() + 5
+    while runner.in_flight() and time.time() < deadline:
+        time.sleep(0.01)
+    assert runner.in_flight() == 0
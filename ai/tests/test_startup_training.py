@@ -0,0 +1,39 @@
+import threading
+
+from config import Config
+from analytics.model_registry import ModelRegistry
+from analytics.plant_growth_prediction import PlantGrowthPredictor
+
+
+def test_empty_registry_without_startup_training_stays_not_loaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'TRAIN_ON_STARTUP', False)
+    predictor = PlantGrowthPredictor(registry=ModelRegistry('growth_model', str(tmp_path)))
+
+    assert predictor.status == 'not_loaded' and predictor.training_thread is None
+    assert predictor.predict_growth([], {}) == {'error': 'Prediction model not available', 'model_status': 'not_loaded'}
+
+
+def test_training_runs_in_background_and_requests_fail_fast(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'TRAIN_ON_STARTUP', True)
+    release = threading.Event()
+
+    def slow_training(self, *args, **kwargs):
+        release.wait(10)
+        return True
+
+    monkeypatch.setattr(PlantGrowthPredictor, 'create_and_train_model', slow_training)
+    registry = ModelRegistry('growth_model', str(tmp_path))
+    predictor = PlantGrowthPredictor(registry=registry)
+
+    # Konstruktor wraca od razu, żądania dostają szybką odpowiedź o stanie modelu
+    assert predictor.status == 'training' and predictor.training_thread.is_alive()
+    assert predictor.predict_growth([], {})['model_status'] == 'training'
+
+    # Drugi proces na tym samym rejestrze nie trenuje równolegle
+    other = PlantGrowthPredictor(registry=ModelRegistry('growth_model', str(tmp_path)))
+    assert other.training_thread is None
+
+    release.set()
+    predictor.training_thread.join(10)
+    assert predictor.status == 'loaded'
+    assert predictor.training_lock is None
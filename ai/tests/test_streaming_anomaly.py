@@ -0,0 +1,71 @@
+import json
+
+import numpy as np
+import pytest
+
+from analytics.streaming_anomaly import StreamingAnomalyDetector, Z_THRESHOLDS
+
+
+def ndvi_reading(value, day=1, encode=False):
+    data = {'ndvi_values': [value - 0.01, value, value + 0.01]}
+    return {'data_type': 'ndvi', 'collection_date': f'2026-05-{day:02d}', 'data': json.dumps(data) if encode else data}
+
+
+@pytest.fixture
+def detector(tmp_path):
+    return StreamingAnomalyDetector(path=str(tmp_path / 'stream.sqlite3'))
+
+
+def test_warmup_state_is_plain_mean_and_std(detector):
+    values = np.random.default_rng(0).normal(0.6, 0.03, 10)
+    anomalies = detector.ingest(1, [ndvi_reading(v, day) for day, v in enumerate(values, start=1)])
+
+    assert anomalies == []
+    state = detector.get_state(1)['ndvi']
+    assert state['count'] == 10 and state['warmed_up']
+    assert state['mean'] == pytest.approx(values.mean())
+    assert state['std'] == pytest.approx(values.std())
+
+
+def test_spike_detected_after_warmup_without_skewing_state(detector):
+    values = np.random.default_rng(1).normal(0.6, 0.02, 30)
+    # Skok w okresie rozgrzewki nie jest zgłaszany
+    assert detector.ingest(2, [ndvi_reading(0.1, 1)] + [ndvi_reading(v, day) for day, v in enumerate(values, start=2)][:5]) == []
+
+    detector.ingest(2, [ndvi_reading(v, day) for day, v in enumerate(values[5:], start=7)])
+    before = detector.get_state(2)['ndvi']
+
+    anomaly = detector.update(2, ndvi_reading(0.1, 31))
+    assert anomaly['type'] == 'ndvi_anomaly' and anomaly['severity'] == 'high'
+    assert anomaly['value'] == pytest.approx(0.1) and anomaly['expected'] == pytest.approx(before['mean'])
+
+    # Stan zaktualizowany wartością przyciętą do progu
+    after = detector.get_state(2)['ndvi']
+    limit = before['mean'] - Z_THRESHOLDS['medium'] * before['std']
+    assert after['mean'] == pytest.approx(before['mean'] + detector.alpha * (limit - before['mean']))
+    assert detector.update(2, ndvi_reading(before['mean'], 1)) is None
+
+
+def test_string_payload_and_shared_state(detector, tmp_path):
+    """Dane jako JSON w stringu; stan w SQLite wspólny dla instancji (procesów roboczych)"""
+    readings = [ndvi_reading(0.5 + 0.001 * day, day, encode=day % 2 == 0) for day in range(1, 21)]
+    for reading in readings[:10]:
+        detector.update(3, reading)
+
+    other = StreamingAnomalyDetector(path=detector.path)
+    other.ingest(3, readings[10:])
+
+    single = StreamingAnomalyDetector(path=str(tmp_path / 'single.sqlite3'))
+    single.ingest(3, readings)
+    shared, expected = detector.get_state(3)['ndvi'], single.get_state(3)['ndvi']
+    assert shared['count'] == expected['count'] == 20
+    assert shared['mean'] == pytest.approx(expected['mean'])
+    assert shared['std'] == pytest.approx(expected['std'])
+
+
+def test_unknown_readings_are_ignored(detector):
+    assert detector.ingest(4, [{'data_type': 'weather', 'data': {'temperature_avg': 20}},
+                               {'data_type': 'ndvi', 'data': 'not json'},
+                               {'data_type': 'soil_moisture', 'data': {'moisture_values': []}}]) == []
+    assert detector.get_state(4) == {}
+
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from analytics.enhanced_plant_predictor import EnhancedPlantGrowthPredictor
+from analytics.plant_growth_prediction import PlantGrowthPredictor
+from analytics.synthetic_data import CROPS, biomass_curve, ensemble_training_data, generate_samples, generate_seasons, growth_stage, ndvi_curve
+
+
+def scalar_growth_stage(progress):
+    """Faza wzrostu jak w pierwotnym generatorze (if/elif dla jednego dnia)"""
+    for stage, bound in enumerate((0.12, 0.25, 0.50, 0.75, 0.90)):
+        if progress < bound:
+            return stage
+    return 5
+
+
+def scalar_ndvi(progress, peak_ndvi):
+    if progress < 0.12:
+        return 0.20 + progress * 2
+    elif progress < 0.25:
+        return 0.44 + (progress - 0.12) * 1.5
+    elif progress < 0.65:
+        return 0.64 + (progress - 0.25) * (peak_ndvi - 0.64) / 0.4
+    elif progress < 0.85:
+        return peak_ndvi - (progress - 0.65) * 0.4
+    return 0.45 - (progress - 0.85) * 0.3
+
+
+def scalar_biomass(day, crop, ndvi, moisture, temperature, fertilizer_total, fertility):
+    """Biomasa bez szumu jak w pierwotnym calculate_realistic_biomass"""
+    base_biomass = crop['max_biomass'] / (1 + np.exp(-crop['growth_rate'] * (day - crop['peak_day'])))
+    ndvi_factor = max(0.3, min(1.5, ndvi * 1.2))
+    if 0.4 <= moisture <= 0.6:
+        moisture_factor = 1.0
+    elif moisture < 0.4:
+        moisture_factor = max(0.5, moisture / 0.4)
+    else:
+        moisture_factor = max(0.7, 1.0 - (moisture - 0.6) * 0.5)
+    if 18 <= temperature <= 25:
+        temp_factor = 1.0
+    elif temperature < 18:
+        temp_factor = max(0.6, 0.8 + (temperature - 15) * 0.04)
+    else:
+        temp_factor = max(0.5, 1.0 - (temperature - 25) * 0.02)
+    fertilizer_factor = 1.0 + np.log(1 + fertilizer_total / 100) * 0.1
+    return base_biomass * ndvi_factor * moisture_factor * temp_factor * fertilizer_factor * fertility
+
+
+def test_vectorised_curves_match_scalar_baseline():
+    rng = np.random.default_rng(0)
+    progress = np.concatenate([rng.random(500), [0.0, 0.12, 0.25, 0.5, 0.65, 0.75, 0.85, 0.9, 0.999]])
+
+    assert growth_stage(progress).tolist() == [scalar_growth_stage(p) for p in progress]
+    for crop in CROPS:
+        assert ndvi_curve(progress, crop['peak_ndvi']) == pytest.approx([scalar_ndvi(p, crop['peak_ndvi']) for p in progress])
+
+    n = 2000
+    day = rng.integers(0, 140, n)
+    ndvi, moisture = rng.uniform(0, 1, n), rng.uniform(0, 1, n)
+    temperature, fertilizer = rng.uniform(5, 35, n), rng.choice([0, 60, 80, 120, 200], n)
+    for crop in CROPS:
+        expected = [scalar_biomass(d, crop, v, m, t, f, 1.05) for d, v, m, t, f in zip(day, ndvi, moisture, temperature, fertilizer)]
+        assert biomass_curve(day, crop, ndvi, moisture, temperature, fertilizer, 1.05) == pytest.approx(expected)
+
+
+def test_seasons_have_expected_shape_and_ranges():
+    columns = generate_seasons(3, rng=np.random.default_rng(1))
+    predictor = PlantGrowthPredictor(auto_init=False)
+
+    rows = 3 * sum(crop['cycle'] for crop in CROPS)
+    assert set(columns) == set(predictor.feature_columns) | {'biomass_target'}
+    assert all(len(values) == rows for values in columns.values())
+    assert columns['avg_ndvi'].min() >= 0.07 and columns['avg_ndvi'].max() <= 0.95
+    assert columns['biomass_target'].min() >= 0.6 * 50
+    assert set(np.unique(columns['growth_stage_encoded'])) == set(range(6))
+
+    # Ten sam generator - te same dane
+    again = generate_seasons(3, rng=np.random.default_rng(1))
+    assert all(np.array_equal(columns[key], again[key]) for key in columns)
+
+
+def test_samples_and_ensemble_data():
+    samples = generate_samples(700, rng=np.random.default_rng(2))
+    assert all(len(values) == 700 for values in samples.values())
+
+    X, y = ensemble_training_data(300, rng=np.random.default_rng(3))
+    assert X.shape == (300, len(EnhancedPlantGrowthPredictor().feature_names)) and y.shape == (300,)
+    assert 0 <= y.min() and y.max() <= 15
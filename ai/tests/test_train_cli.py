@@ -0,0 +1,35 @@
+import json
+
+from conftest import TEST_CANDIDATES
+
+import train
+from analytics.model_registry import ModelRegistry
+
+
+def test_growth_cli_publishes_and_activates_version(tmp_path, capsys):
+    candidates = tmp_path / 'grid.json'
+    candidates.write_text(json.dumps(TEST_CANDIDATES))
+
+    assert train.main(['growth', '--model-path', str(tmp_path), '--fields', '1', '--candidates', str(candidates),
+                       '--workers', '1', '--cv', '2']) == 0
+
+    out = capsys.readouterr().out
+    summary = json.loads(out[out.index('{\n'):])
+    registry = ModelRegistry('growth_model', str(tmp_path))
+    assert summary['model'] == 'growth_model' and summary['active']
+    assert summary['version'] == registry.active_version()
+    assert summary['metrics'] == registry.manifest(summary['version'])['metrics']
+
+
+def test_no_activate_publishes_without_switching(tmp_path):
+    candidates = tmp_path / 'grid.json'
+    candidates.write_text(json.dumps(TEST_CANDIDATES[:1]))
+    args = ['growth', '--model-path', str(tmp_path), '--fields', '1', '--candidates', str(candidates), '--workers', '1']
+
+    assert train.main(args) == 0
+    registry = ModelRegistry('growth_model', str(tmp_path))
+    active = registry.active_version()
+
+    assert train.main(args + ['--no-activate']) == 0
+    assert registry.active_version() == active
+    assert len(registry.list_versions()) == 2
@@ -0,0 +1,108 @@
+"""
+Trening modeli poza serwisem API - zadanie wsadowe, np. na osobnym węźle.
+
+Uruchomienie z katalogu ai/:
+    python -m train growth [--fields 10] [--candidates grid.json] [--time-budget 600] [--workers N] [--cv 3]
+    python -m train ensemble [--samples 1000]
+
+Wspólne opcje: --model-path (domyślnie MODEL_PATH), --no-activate (publikacja bez aktywacji).
+Nowa wersja trafia do rejestru jako kompletny katalog <model-path>/<model>/versions/<version>/ -
+model obsługiwany przez serwis (growth_model) można skopiować do rejestru serwisu
+i aktywować przez POST /admin/models/growth_model/promote.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from config import Config
+from analytics.model_registry import ModelRegistry
+from analytics.plant_growth_prediction import PlantGrowthPredictor
+from analytics.enhanced_plant_predictor import EnhancedPlantGrowthPredictor
+
+logger = logging.getLogger('train')
+
+
+def train_growth(args):
+    """Model wzrostu: dane syntetyczne, ranking kandydatów, zwycięzca + głowice kwantylowe"""
+    if args.time_budget is not None:
+        Config.TRAINING_TIME_BUDGET = args.time_budget
+    if args.workers is not None:
+        Config.TRAINING_WORKERS = args.workers
+    if args.cv is not None:
+        Config.TRAINING_CV_FOLDS = args.cv
+
+    candidates = None
+    if args.candidates:
+        with open(args.candidates) as f:
+            candidates = json.load(f)
+        logger.info(f"📋 Loaded {len(candidates)} candidates from {args.candidates}")
+
+    predictor = PlantGrowthPredictor(registry=ModelRegistry('growth_model', args.model_path), auto_init=False)
+    if not predictor.create_and_train_model(candidates, args.fields, activate=not args.no_activate):
+        return None
+    return predictor.registry, predictor.model_version
+
+
+def train_ensemble(args):
+    """Modele zespołowe RF + GB z adaptacyjnymi wagami"""
+    predictor = EnhancedPlantGrowthPredictor(registry=ModelRegistry('growth_ensemble', args.model_path))
+    if not predictor.train(args.samples, activate=not args.no_activate) or not predictor.model_version:
+        return None
+    return predictor.registry, predictor.model_version
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m train', description='Offline training of the growth prediction models')
+    subparsers = parser.add_subparsers(dest='model', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--model-path', default=None, help='registry root (default: MODEL_PATH)')
+    common.add_argument('--no-activate', action='store_true', help='publish the version without making it active')
+
+    growth = subparsers.add_parser('growth', parents=[common], help='PlantGrowthPredictor model')
+    growth.add_argument('--fields', type=int, default=None,
+                        help=f'simulated fields, each a full season of every crop (default: {PlantGrowthPredictor.TRAINING_FIELDS})')
+    growth.add_argument('--candidates', default=None, help='JSON file with a candidate grid [{"estimator": ..., "params": {...}}]')
+    growth.add_argument('--time-budget', type=int, default=None, help='model selection time budget in seconds')
+    growth.add_argument('--workers', type=int, default=None, help='cross-validation processes (default: all cores)')
+    growth.add_argument('--cv', type=int, default=None, help='cross-validation folds')
+    growth.set_defaults(handler=train_growth)
+
+    ensemble = subparsers.add_parser('ensemble', parents=[common], help='EnhancedPlantGrowthPredictor ensemble')
+    ensemble.add_argument('--samples', type=int, default=1000, help='synthetic training samples')
+    ensemble.set_defaults(handler=train_ensemble)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s', stream=sys.stdout)
+
+    started = time.time()
+    logger.info(f"🏋️ Training {args.model} model...")
+    result = args.handler(args)
+
+    if result is None:
+        logger.error(f"❌ Training {args.model} failed after {time.time() - started:.1f}s")
+        return 1
+
+    registry, version = result
+    manifest = registry.manifest(version)
+    logger.info(f"✅ Published {registry.name} version {version} in {time.time() - started:.1f}s "
+                f"({'active' if registry.active_version() == version else 'not activated'})")
+    print(json.dumps({
+        'model': registry.name,
+        'version': version,
+        'path': os.path.join(registry.versions_path, version),
+        'active': registry.active_version() == version,
+        'metrics': manifest.get('metrics', {})
+    }, indent=2, default=str))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
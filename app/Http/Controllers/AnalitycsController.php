@@ -137,6 +137,10 @@ public function analyze(Request $request, Field $field)
 
             logger()->info("AI Response Status: " . $response->status());
 
+            if ($response->status() === 429) {
+                return redirect()->back()->with('error', 'AI service is busy, please try again in ' . ($response->header('Retry-After') ?: 30) . ' seconds.');
+            }
+
             if (!$response->successful()) {
                 logger()->error("AI Error Response: " . $response->body());
                 return redirect()->back()->with('error', 'AI analysis error: ' . $response->body());
@@ -23,12 +23,20 @@ public function __construct(
     public function handle(): void
     {
         try {
+            // Analiza w tle - serwis AI obsługuje najpierw żądania interaktywne
             $response = Http::timeout(300)
+                ->withHeaders(['X-Priority' => 'background'])
                 ->post('http://ai-service:5000/analyze/field/' . $this->fieldData->field_id, [
                     'field_data' => [$this->fieldData->toArray()],
                     'parameters' => ['sensitivity' => 'medium']
                 ]);
 
+            // Serwis przeciążony - ponów po czasie wskazanym w Retry-After
+            if ($response->status() === 429) {
+                $this->release((int) ($response->header('Retry-After') ?: 60));
+                return;
+            }
+
             if ($response->successful()) {
                 $results = $response->json();
 